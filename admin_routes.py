@@ -1,28 +1,52 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, Response, stream_with_context, send_file
 from flask_login import login_required, current_user
-from models import db, Subject, Quiz, User, Chapter, Question, Score # Import models
+from models import db, Subject, Quiz, User, Chapter, Question, Score, SubjectStat, Job # Import models
 from form import SubjectForm, QuizForm, ChapterForm, QuestionForm 
+from pagination import paginate, page_args
+import queries
+from submissions import submission_queue
+from instrumentation import instrumentation
+from extension import cache
+from user_cache import user_cache
+from catalog import catalog
+from http_cache import conditional, bump_on_write
+import question_bank
+import reporting
+from jobs import jobs, job_json
+import search
+import dedup
+import item_analysis
+from quiz_cache import invalidate_quiz, invalidate_quizzes
+import os
 from datetime import datetime
 from sqlalchemy.exc import IntegrityError
 
 admin = Blueprint("admin", __name__, url_prefix="/admin")
+admin.after_request(bump_on_write)  # any successful admin write may change the catalog
 
 # ======================== Dashboard ========================
 @admin.route('/dashboard')
 @login_required
 def dashboard():
-    quizzes = Quiz.query.all()
-    subjects = Subject.query.all()
-    Users = User.query.all()
+    cursor, per_page = page_args()
+    page = queries.admin_subjects(cursor, per_page)
     form = SubjectForm() 
-    return render_template("admin/dashboard.html", subjects=subjects, form=form, quizzes=quizzes, Users=Users)
+    return render_template(
+        "admin/dashboard.html",
+        subjects=page.items,
+        page=page,
+        form=form,
+        total_subjects=len(catalog.tree().subjects),
+        total_quizzes=len(catalog.tree().quizzes),
+        total_users=User.query.count(),
+    )
 
 # ======================== Manage Subjects ========================
 @admin.route('/subjects', methods=['GET', 'POST'])
 @login_required
 def manage_subjects():
     form = SubjectForm()
-    subjects = Subject.query.all()
+    subjects = catalog.tree().subjects
 
     if form.validate_on_submit():
         existing_subject = Subject.query.filter_by(name=form.name.data, description=form.description.data).first()
@@ -46,9 +70,10 @@ def manage_subjects():
 @login_required
 def delete_subject(subject_id):
     subject = Subject.query.get_or_404(subject_id)
-    db.session.delete(subject)
-    db.session.commit()
-    
+    # The job may delete the row before we flash (JOBS_RUN_INLINE, or a fast worker thread)
+    name = subject.name
+    job_id = jobs.enqueue("delete_subject", subject_id, f"Subject {name}", current_user.id).id
+    flash(f"Deleting subject {name!r} in the background (job #{job_id}, see Jobs).", "info")
     return redirect(url_for('admin.manage_subjects'))
 
 @admin.route('/subject/<int:subject_id>/edit', methods=['GET', 'POST'])
@@ -61,6 +86,7 @@ def edit_subject(subject_id):
         subject.name = form.name.data
         subject.description = form.description.data
         db.session.commit()
+        invalidate_quizzes([quiz.id for quiz in subject.quizzes.with_entities(Quiz.id)])
         
         return redirect(url_for('admin.manage_subjects'))
 
@@ -94,8 +120,10 @@ def manage_chapters(subject_id):
 def delete_chapter(chapter_id):
     chapter = Chapter.query.get_or_404(chapter_id)
     subject_id = chapter.subject_id
+    quiz_ids = [quiz.id for quiz in chapter.quizzes.with_entities(Quiz.id)]
     db.session.delete(chapter)
     db.session.commit()
+    invalidate_quizzes(quiz_ids)
     
     return redirect(url_for('admin.manage_chapters', subject_id=subject_id))
 
@@ -108,6 +136,7 @@ def edit_chapter(chapter_id):
         chapter.name = form.name.data
         chapter.description = form.description.data
         db.session.commit()
+        invalidate_quizzes([quiz.id for quiz in chapter.quizzes.with_entities(Quiz.id)])
         
         return redirect(url_for('admin.manage_chapters', subject_id=chapter.subject_id))
 
@@ -115,8 +144,9 @@ def edit_chapter(chapter_id):
 
 @admin.route('/get_chapters/<int:subject_id>')
 @login_required
+@conditional("chapters")
 def get_chapters(subject_id):
-    chapters = Chapter.query.filter_by(subject_id=subject_id).all()
+    chapters = catalog.tree().chapters_of(subject_id)
     chapters_data = [{"id": chapter.id, "name": chapter.name} for chapter in chapters]
     return jsonify({"chapters": chapters_data})
 
@@ -124,18 +154,10 @@ def get_chapters(subject_id):
 
 @admin.route('/manage_quizzes', methods=['GET', 'POST'])
 def manage_quizzes():
-    form = QuizForm()
-
-    # Fetch subjects and set dropdown choices
-    subjects = Subject.query.all()
-    quizzes= Quiz.query.all()
-    form.subject_id.choices = [(s.id, s.name) for s in subjects]
-
-    if form.subject_id.data:
-        chapters = Chapter.query.filter_by(subject_id=form.subject_id.data).all()
-        form.chapter_id.choices = [(c.id, c.name) for c in chapters]
-    else:
-        form.chapter_id.choices = []
+    form = QuizForm()  # subject and chapter choices come from the catalog tree
+    subjects = catalog.tree().subjects
+    cursor, per_page = page_args()
+    page = queries.admin_quizzes(cursor, per_page)
 
     if form.validate_on_submit():
         try:
@@ -143,7 +165,8 @@ def manage_quizzes():
                 subject_id=form.subject_id.data,
                 chapter_id=form.chapter_id.data,
                 date_of_quiz=form.date_of_quiz.data,
-                time_duration=form.time_duration.data
+                time_duration=form.time_duration.data,
+                sample_size=form.sample_size.data
             )
             db.session.add(new_quiz)
             db.session.commit()
@@ -156,22 +179,22 @@ def manage_quizzes():
    
         
 
-    return render_template('admin/manage_quizzes.html', form=form, subjects=subjects, quizzes= quizzes)
+    return render_template('admin/manage_quizzes.html', form=form, subjects=subjects, quizzes=page.items, page=page)
 
 @admin.route('/quiz/<int:quiz_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_quiz(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
     form = QuizForm(obj=quiz)
-    form.subject_id.choices = [(s.id, s.name) for s in Subject.query.all()]
-    form.chapter_id.choices = [(c.id, c.name) for c in Chapter.query.filter_by(subject_id=quiz.subject_id).all()]
 
     if form.validate_on_submit():
         quiz.subject_id = form.subject_id.data
         quiz.chapter_id = form.chapter_id.data
         quiz.date_of_quiz = form.date_of_quiz.data
         quiz.time_duration = form.time_duration.data
+        quiz.sample_size = form.sample_size.data
         db.session.commit()
+        invalidate_quiz(quiz.id)
 
         return redirect(url_for('admin.manage_quizzes'))
 
@@ -181,9 +204,10 @@ def edit_quiz(quiz_id):
 @login_required
 def delete_quiz(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
-    db.session.delete(quiz)
-    db.session.commit()
-    
+    # The job may delete the row before we flash (JOBS_RUN_INLINE, or a fast worker thread)
+    label = f"Quiz {quiz_id} ({quiz.date_of_quiz})"
+    job_id = jobs.enqueue("delete_quiz", quiz_id, label, current_user.id).id
+    flash(f"Deleting quiz {quiz_id} in the background (job #{job_id}, see Jobs).", "info")
     return redirect(url_for('admin.manage_quizzes'))
 
 # ======================== Manage Questions ========================
@@ -192,7 +216,19 @@ def delete_quiz(quiz_id):
 def view_quiz(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
     questions = Question.query.filter_by(quiz_id=quiz_id).all()
-    return render_template('admin/view_quiz.html', quiz=quiz, questions=questions)
+    items = item_analysis.quiz_items(quiz_id)
+    stats = {item.question_id: item for item in items.items} if items else {}
+    return render_template('admin/view_quiz.html', quiz=quiz, questions=questions,
+                           item_stats=stats, analyzed_attempts=items.attempts if items else 0)
+
+def flash_near_duplicates(question):
+    """Indexes a saved question for duplicate detection and warns about close matches."""
+    dedup.index_question(question)
+    db.session.commit()
+    for match in dedup.find_similar(question, limit=3):
+        flash(f"Possible duplicate: question #{match.question_id} in {match.subject} › {match.chapter} "
+              f"(quiz {match.quiz_id}) is {match.similarity:.0%} similar: {match.question_statement[:80]}",
+              "warning")
 
 @admin.route('/quiz/<int:quiz_id>/add_question', methods=['GET', 'POST'])
 @login_required
@@ -200,57 +236,163 @@ def add_question(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
 
     if request.method == 'POST':
-
-        statement = request.form['question_statement']
-        option1 = request.form.get('option1', '').strip()
-        option2 = request.form.get('option2', '').strip()
-        option3 = request.form.get('option3', '').strip()
-        option4 = request.form.get('option4', '').strip()
-        correct_option = request.form.get('correct_option', '').strip()
-
-        if not all([option1, option2, option3, option4, correct_option]):
-            flash("All fields are required!", "danger")
+        # Same rules as the bulk importer
+        data, error = question_bank.validate_question(request.form)
+        if error:
+            flash(error, "danger")
             return redirect(url_for('admin.add_question', quiz_id=quiz.id))
 
-        try:
-            correct_option = int(correct_option)
-            if correct_option not in [1, 2, 3, 4]:
-                raise ValueError("Invalid correct option")
-        except ValueError:
-            flash("Correct option must be between 1 and 4.", "danger")
-            return redirect(url_for('admin.add_question', quiz_id=quiz.id))
-                # Save to database
-        new_question = Question(
-            quiz_id=quiz.id, 
-            question_statement=statement,
-            option1=option1, option2=option2,
-            option3=option3, option4=option4,
-            correct_option=correct_option
-        )
+        # Save to database
+        new_question = Question(quiz_id=quiz.id, **data)
         db.session.add(new_question)
         db.session.commit()
-        
+        invalidate_quiz(quiz.id)
+        flash_near_duplicates(new_question)
 
-        
         return redirect(url_for('admin.view_quiz', quiz_id=quiz.id))
 
     return render_template('admin/questions.html', quiz=quiz)
 
+@admin.route('/quiz/<int:quiz_id>/questions/import', methods=['POST'])
+@login_required
+def import_questions(quiz_id):
+    if current_user.role != "admin":
+        return jsonify({"error": "Access denied"}), 403
+    quiz = Quiz.query.get_or_404(quiz_id)
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash("Choose a CSV or JSON Lines file to import.", "danger")
+        return redirect(url_for('admin.view_quiz', quiz_id=quiz.id))
+
+    fmt = request.form.get('format') or question_bank.format_for(upload.filename)
+    try:
+        report = question_bank.import_questions(quiz.id, question_bank.iter_rows(upload.stream, fmt))
+    except ValueError as e:
+        db.session.rollback()
+        flash(f"Import failed: {e}", "danger")
+        return redirect(url_for('admin.view_quiz', quiz_id=quiz.id))
+    finally:
+        invalidate_quiz(quiz.id)
+
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(report.as_dict())
+    flash(f"Imported {report.inserted} questions, {report.failed} rows rejected.",
+          "success" if not report.failed else "warning")
+    for line, message in report.errors[:10]:
+        flash(f"Line {line}: {message}", "danger")
+    if report.near_duplicates:
+        flash(f"{report.near_duplicates} imported questions look like near-duplicates of existing ones; "
+              f"see the subject's duplicates report.", "warning")
+    return redirect(url_for('admin.view_quiz', quiz_id=quiz.id))
+
+@admin.route('/quiz/<int:quiz_id>/questions/export')
+@login_required
+def export_questions(quiz_id):
+    if current_user.role != "admin":
+        return jsonify({"error": "Access denied"}), 403
+    quiz = Quiz.query.get_or_404(quiz_id)
+    fmt = request.args.get('format', 'csv')
+    if fmt not in question_bank.FORMATS:
+        return jsonify({"error": f"Unsupported format {fmt!r}"}), 400
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(question_bank.iter_export(quiz.id, fmt)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=quiz_{quiz.id}_questions.{fmt}"},
+    )
+
+# ======================== Question Search ========================
+@admin.route('/questions/search')
+@login_required
+def search_questions():
+    if current_user.role != "admin":
+        return jsonify({"error": "Access denied"}), 403
+    text = request.args.get('q', '').strip()
+    subject_id = request.args.get('subject_id', type=int)
+    chapter_id = request.args.get('chapter_id', type=int)
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    try:
+        hits = search.search(text, subject_id, chapter_id, limit, offset) if text else []
+    except search.SearchUnavailable as exc:
+        return jsonify({"error": str(exc)}), 501
+
+    if request.args.get('format') == 'json':
+        return jsonify({"query": text, "offset": offset, "items": [
+            {**hit._asdict(), "date_of_quiz": hit.date_of_quiz.isoformat()} for hit in hits
+        ]})
+    tree = catalog.tree()
+    return render_template(
+        'admin/search.html', hits=hits, text=text, subject_id=subject_id, chapter_id=chapter_id,
+        subjects=tree.subjects, chapters=tree.chapters_of(subject_id) if subject_id else (),
+        limit=limit, offset=offset,
+    )
+
+# ======================== Duplicate Questions ========================
+@admin.route('/subject/<int:subject_id>/duplicates')
+@login_required
+def duplicate_report(subject_id):
+    if current_user.role != "admin":
+        return jsonify({"error": "Access denied"}), 403
+    subject = Subject.query.get_or_404(subject_id)
+    min_similarity = request.args.get('threshold', type=float)
+    report = dedup.subject_report(subject.id, min_similarity)
+    if request.args.get('format') == 'json':
+        return jsonify({"subject_id": subject.id, "groups": report})
+    return render_template('admin/duplicates.html', subject=subject, report=report,
+                           threshold=min_similarity or dedup.threshold())
+
+# ======================== Reports ========================
+@admin.route('/reports/export')
+@login_required
+def export_report():
+    if current_user.role != "admin":
+        return jsonify({"error": "Access denied"}), 403
+    dataset = request.args.get('dataset', 'scores')
+    fmt = request.args.get('format', 'csv')
+    if dataset not in reporting.DATASETS:
+        return jsonify({"error": f"Unknown dataset {dataset!r}"}), 400
+    if fmt not in reporting.FORMATS:
+        return jsonify({"error": f"Unsupported format {fmt!r}"}), 400
+    try:
+        filters = reporting.ExportFilters.from_args(request.args)
+    except ValueError:
+        return jsonify({"error": "start/end must be YYYY-MM-DD and subject_id a number"}), 400
+
+    filename = f"{dataset}.{fmt}"
+    if fmt == 'parquet':
+        if not reporting.parquet_available():
+            return jsonify({"error": "Parquet export needs pyarrow installed on the server"}), 501
+        path = reporting.parquet_tempfile(dataset, filters)
+        response = send_file(path, mimetype='application/vnd.apache.parquet', as_attachment=True,
+                             download_name=filename)
+        response.call_on_close(lambda: os.remove(path))
+        return response
+    return Response(
+        stream_with_context(reporting.iter_csv(dataset, filters)),
+        mimetype='text/csv',
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
 @admin.route('/edit_question/<int:question_id>', methods=['GET', 'POST'])
 @login_required
 def edit_question(question_id):
     question = Question.query.get_or_404(question_id)
 
     if request.method == 'POST':
-        question.question_statement = request.form['question_statement']
-        question.option1 = request.form['option1']
-        question.option2 = request.form['option2']
-        question.option3 = request.form['option3']
-        question.option4 = request.form['option4']
-        question.correct_option = request.form['correct_option']
-
+        # Same rules as add_question and the bulk importer; a bad key would break grading
+        data, error = question_bank.validate_question(request.form)
+        if error:
+            flash(error, "danger")
+            return redirect(url_for('admin.edit_question', question_id=question.id))
+
+        for field, value in data.items():
+            setattr(question, field, value)
         db.session.commit()
-       
+        invalidate_quiz(question.quiz_id)
+        flash_near_duplicates(question)
+
         return redirect(url_for('admin.view_quiz', quiz_id=question.quiz_id))
 
     return render_template('admin/edit_question.html', question=question)
@@ -263,6 +405,7 @@ def delete_question(question_id):
     try:
         db.session.delete(question)  # Delete the question
         db.session.commit()  # Commit the deletion
+        invalidate_quiz(question.quiz_id)
         
     except Exception as e:
         db.session.rollback()  # Rollback in case of error
@@ -281,55 +424,89 @@ def manage_users():
         flash("Access denied!", "danger")
         return redirect(url_for('main.home'))
     
-    users = User.query.all()
-    return render_template('admin/manage_user.html', users=users)
+    cursor, per_page = page_args()
+    page = paginate(User.query, [User.id], cursor, per_page)
+    return render_template('admin/manage_user.html', users=page.items, page=page, total_users=User.query.count())
 
 
 @admin.route('/users/delete/<int:user_id>', methods=['POST'])
 @login_required
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
-    db.session.delete(user)
-    db.session.commit()
-    flash("User deleted successfully!", "success")
+    # The job may delete the row before we flash (JOBS_RUN_INLINE, or a fast worker thread)
+    email = user.email
+    job_id = jobs.enqueue("delete_user", user_id, f"User {email}", current_user.id).id
+    flash(f"Deleting user {email} in the background (job #{job_id}, see Jobs).", "info")
     return redirect(url_for('admin.manage_users'))
 
 
+# ======================== Jobs ========================
+@admin.route('/jobs')
+@login_required
+def manage_jobs():
+    if current_user.role != "admin":
+        return jsonify({"error": "Access denied"}), 403
+    recent = db.session.scalars(db.select(Job).order_by(Job.id.desc()).limit(50)).all()
+    if any(job.status in ("queued", "running") for job in recent):
+        jobs.ensure_worker()  # picks up jobs left behind by a restarted process
+    return render_template('admin/jobs.html', jobs=[job_json(job) for job in recent])
+
+@admin.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    if current_user.role != "admin":
+        return jsonify({"error": "Access denied"}), 403
+    return jsonify(job_json(db.get_or_404(Job, job_id)))
+
+
+# ======================== Metrics ========================
+@admin.route('/metrics')
+@login_required
+def metrics():
+    if current_user.role != "admin":
+        return jsonify({"error": "Access denied"}), 403
+    return jsonify({
+        "endpoints": instrumentation.metrics(),
+        "submissions": submission_queue.metrics(),
+        "cache": {"entries": len(cache.backend), "hits": cache.backend.hits, "misses": cache.backend.misses},
+        "users": user_cache.metrics(),
+    })
+
+@admin.route('/metrics/submissions')
+@login_required
+def submission_metrics():
+    if current_user.role != "admin":
+        return jsonify({"error": "Access denied"}), 403
+    return jsonify(submission_queue.metrics())
+
+
 # ======================== Summary ========================
 
 
 @admin.route("/summary")
 @login_required
 def summary():
-    total_subjects = Subject.query.count()
-    total_chapters = Chapter.query.count()
-    total_quizzes = Quiz.query.count()
+    tree = catalog.tree()
+    total_subjects = len(tree.subjects)
+    total_chapters = len(tree.chapters)
+    total_quizzes = len(tree.quizzes)
     total_users = User.query.count()
 
     recent_subjects = Subject.query.order_by(Subject.id.desc()).limit(5).all()
     recent_quizzes = Quiz.query.order_by(Quiz.id.desc()).limit(5).all()
 
-    # Fetch subject-wise top scores
-    top_scores = (
-        db.session.query(Subject.name, db.func.max(Score.total_scored))
-        .join(Quiz, Quiz.subject_id == Subject.id)
-        .join(Score, Score.quiz_id == Quiz.id)
-        .group_by(Subject.name)
-        .all()
-    )
-    subjects_top_scores = [row[0] for row in top_scores]
-    top_scores_values = [row[1] if row[1] is not None else 0 for row in top_scores]  # Handle None values
-
-    # Fetch subject-wise user attempts
-    user_attempts = (
-        db.session.query(Subject.name, db.func.count(Score.id))
-        .join(Quiz, Quiz.subject_id == Subject.id)
-        .join(Score, Score.quiz_id == Quiz.id)
-        .group_by(Subject.name)
+    # Subject-wise top scores and attempts, read from the rollup table
+    subject_stats = (
+        db.session.query(Subject.name, SubjectStat.max_score, SubjectStat.attempts)
+        .join(SubjectStat, SubjectStat.subject_id == Subject.id)
+        .filter(SubjectStat.attempts > 0)
+        .order_by(Subject.name)
         .all()
     )
-    subjects_attempts = [row[0] for row in user_attempts]
-    attempts_values = [row[1] if row[1] is not None else 0 for row in user_attempts]  # Handle None values
+    subjects_top_scores = [row.name for row in subject_stats]
+    top_scores_values = [row.max_score for row in subject_stats]
+    subjects_attempts = subjects_top_scores
+    attempts_values = [row.attempts for row in subject_stats]
 
     return render_template(
         "admin/summary.html",
@@ -0,0 +1,355 @@
+"""Versioned JSON API for exam clients (/api/v1).
+
+Catalog, quiz fetch, submission and score history as async views over an
+async SQLAlchemy session (aiosqlite for SQLite), so database waits don't hold
+a thread. The SQL is shared with the HTML pages: payload/answer-key
+statements, server-side attempts, rollup and leaderboard upserts, and keyset
+pagination all come from the same modules. The catalog is served
+conditionally from the catalog version (http_cache.py) out of the catalog
+tree (catalog.py).
+
+aiosqlite connections belong to the event loop that opened them, so
+AsyncDatabase keeps one pooled engine per loop and runs every async view on a
+long-lived loop instead of Flask's loop-per-request default. Under WSGI
+(gunicorn sync workers) that is a loop thread per process, which all the
+process's API requests share. Under ASGI (asgi.py) it is the server's own
+loop, and the views' database waits interleave with every other connection.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import json
+import os
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify, request, abort
+from flask_login import current_user, login_required
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import attempts
+import leaderboard
+import queries
+import stats
+from catalog import catalog as catalog_tree
+from db_profile import install_pragmas
+from extension import cache
+from grading import answer_key_key, answer_key_statements, build_answer_key, grade, read_answers
+from http_cache import catalog_version, conditional, mark_submission
+from instrumentation import instrumentation
+from leaderboard import leaderboards
+from models import Score
+from pagination import apply_keyset, make_page, page_args
+from quiz_cache import payload_key, payload_statements, build_payload, is_sampled, questions_statement, order_questions
+from submissions import Submission
+
+api_v1 = Blueprint("api_v1", __name__, url_prefix="/api/v1")
+
+
+class AsyncDatabase:
+    def __init__(self, app=None):
+        self.app = None
+        self._loop = None
+        self._pid = None
+        self._engines = weakref.WeakKeyDictionary()  # event loop -> (engine, sessionmaker)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        for loop, (engine, _) in list(self._engines.items()):
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(engine.dispose(), loop)  # the previous app's connections
+        self._engines = weakref.WeakKeyDictionary()
+        # Flask's default runs each async view in a new event loop; run them on ours
+        app.async_to_sync = self.async_to_sync
+        app.extensions["async_db"] = self
+
+    def async_uri(self):
+        uri = self.app.config.get("ASYNC_DATABASE_URI")
+        if uri:
+            return uri
+        url = make_url(self.app.config["SQLALCHEMY_DATABASE_URI"])
+        if url.get_backend_name() == "sqlite":
+            url = url.set(drivername="sqlite+aiosqlite")
+        return url
+
+    # -- the event loop ------------------------------------------------------
+
+    def use_loop(self, loop):
+        """Runs async views on `loop` (the ASGI server's) from now on."""
+        with self._lock:
+            self._loop, self._pid = loop, os.getpid()
+
+    def loop(self):
+        """The loop async views run on, started in a daemon thread if none is set."""
+        with self._lock:
+            # Threads don't survive fork, so each worker process starts its own
+            if self._loop is None or self._loop.is_closed() or self._pid != os.getpid():
+                if self._pid != os.getpid():
+                    self._engines = weakref.WeakKeyDictionary()  # the parent's connections aren't ours
+                self._loop = asyncio.new_event_loop()
+                self._pid = os.getpid()
+                threading.Thread(target=self._loop.run_forever, name="api-loop", daemon=True).start()
+            return self._loop
+
+    def run(self, coro):
+        """Runs `coro` on the views' loop from a request thread and returns its result.
+
+        The coroutine sees the caller's context variables, so the request and
+        app contexts (request, session, current_user) carry over.
+        """
+        loop = self.loop()
+        context = contextvars.copy_context()
+        done = concurrent.futures.Future()
+
+        def finished(task):
+            if task.cancelled():
+                done.cancel()
+            elif task.exception() is not None:
+                done.set_exception(task.exception())
+            else:
+                done.set_result(task.result())
+
+        def schedule():
+            loop.create_task(coro, context=context).add_done_callback(finished)
+
+        loop.call_soon_threadsafe(schedule)
+        return done.result()
+
+    def async_to_sync(self, func):
+        def view(*args, **kwargs):
+            return self.run(func(*args, **kwargs))
+        return view
+
+    # -- sessions ------------------------------------------------------------
+
+    def sessionmaker(self):
+        """The sessionmaker for the running loop, whose engine pools that loop's connections."""
+        loop = asyncio.get_running_loop()
+        entry = self._engines.get(loop)
+        if entry is None:
+            engine = create_async_engine(self.async_uri())
+            install_pragmas(engine.sync_engine, self.app.config.get("SQLITE_PRAGMAS") or {})
+            if instrumentation.enabled:
+                instrumentation.instrument_engine(engine.sync_engine)
+            # Objects stay readable after commit; lazy loads would need the loop
+            entry = (engine, async_sessionmaker(engine, expire_on_commit=False))
+            self._engines[loop] = entry
+        return entry[1]
+
+    @asynccontextmanager
+    async def session(self):
+        async with self.sessionmaker()() as session:
+            yield session
+
+    async def dispose(self):
+        """Closes the running loop's pooled connections (ASGI shutdown)."""
+        entry = self._engines.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[0].dispose()
+
+
+async_db = AsyncDatabase()
+
+
+# -- loaders sharing the sync caches ---------------------------------------
+
+async def get_payload(session, quiz_id):
+    key = payload_key(quiz_id, catalog_version.current())
+    payload = cache.get(key)
+    if payload is None:
+        quiz_stmt, questions_stmt = payload_statements(quiz_id)
+        row = (await session.execute(quiz_stmt)).first()
+        if row is None:
+            return None
+        questions = None if is_sampled(row) else (await session.execute(questions_stmt)).all()
+        payload = build_payload(row, questions)
+        cache.set(key, payload)
+    return payload
+
+
+async def get_questions(session, quiz, attempt, key):
+    """The questions dealt to `attempt`, in order (async twin of routes.attempt_questions)."""
+    if attempt.question_ids is None and quiz["questions"] is not None:
+        return quiz["questions"]
+    question_ids = list(key.question_ids)
+    return order_questions((await session.execute(questions_statement(question_ids))).all(), question_ids)
+
+
+async def get_key(session, quiz_id):
+    cache_key = answer_key_key(quiz_id, catalog_version.current())
+    key = cache.get(cache_key)
+    if key is None:
+        subject_stmt, rows_stmt = answer_key_statements(quiz_id)
+        subject_id = (await session.execute(subject_stmt)).scalar()
+        if subject_id is None:
+            return None
+        key = build_answer_key(quiz_id, subject_id, (await session.execute(rows_stmt)).all())
+        cache.set(cache_key, key)
+    return key
+
+
+# -- attempts ---------------------------------------------------------------
+
+async def open_attempt(session, user_id, quiz_id):
+    return (await session.scalars(attempts.open_attempt_statement(user_id, quiz_id))).first()
+
+
+async def start_attempt(session, user_id, quiz, key, now):
+    attempt = await open_attempt(session, user_id, quiz["id"])
+    if attempt is not None:
+        if not attempts.is_expired(attempt, now):
+            return attempt
+        dealt = attempts.attempt_key(attempt, key)
+        await finish_attempt(session, attempt, dealt, attempts.saved_answers(attempt, dealt), now)
+    attempt = attempts.new_attempt(user_id, quiz, key, now)
+    session.add(attempt)
+    await session.commit()
+    return attempt
+
+
+async def finish_attempt(session, attempt, key, answers, now):
+    """Async twin of attempts.finish(): the Score, rollups and leaderboard in one transaction."""
+    if not (await session.execute(attempts.claim(attempt, key, answers, now))).rowcount:
+        await session.rollback()
+        return None
+    result = grade(key, answers)
+    submission = Submission(attempt.user_id, attempt.quiz_id, key.subject_id, result.total, now,
+                            key.question_ids.tobytes(), answers)
+    session.add(Score(user_id=submission.user_id, quiz_id=submission.quiz_id,
+                      total_scored=submission.total_scored, timestamp=now,
+                      question_ids=submission.question_ids, answers=submission.answers))
+    for stmt in stats.attempt_statements(*submission[:5]) + leaderboard.attempt_statements(*submission[:4]):
+        await session.execute(stmt)
+    await session.commit()
+    leaderboards.record([submission])
+    mark_submission()
+    return result
+
+
+# -- views ------------------------------------------------------------------
+
+@api_v1.get("/catalog")
+@conditional("catalog")
+async def catalog():
+    """Subjects with their chapters and quizzes."""
+    # The tree is kept per process; on a version change it reloads with sync SQL, off the loop
+    tree = await asyncio.to_thread(catalog_tree.tree)
+    body = json.dumps({"subjects": [
+        {"id": subject.id, "name": subject.name, "chapters": [
+            {"id": chapter.id, "name": chapter.name, "quizzes": [
+                {
+                    "id": quiz.id,
+                    "date_of_quiz": quiz.date_of_quiz.isoformat(),
+                    "time_duration": quiz.time_duration,
+                    "question_count": quiz.question_count,
+                }
+                for quiz in chapter.quizzes
+            ]}
+            for chapter in subject.chapters
+        ]}
+        for subject in tree.subjects
+    ]}, separators=(",", ":"))
+    return current_app.response_class(body, mimetype="application/json")
+
+
+@api_v1.get("/quizzes/<int:quiz_id>")
+@login_required
+async def get_quiz(quiz_id):
+    """The quiz's questions, starting or resuming the caller's attempt."""
+    now = datetime.now()
+    async with async_db.session() as session:
+        quiz = await get_payload(session, quiz_id)
+        key = await get_key(session, quiz_id)
+        if quiz is None or key is None:
+            abort(404)
+        attempt = await start_attempt(session, current_user.id, quiz, key, now)
+        dealt = attempts.attempt_key(attempt, key)
+        questions = await get_questions(session, quiz, attempt, dealt)
+    saved = attempts.saved_answers(attempt, dealt)
+    return jsonify({
+        "id": quiz["id"],
+        "subject": quiz["subject"],
+        "chapter": quiz["chapter"],
+        "date_of_quiz": quiz["date_of_quiz"].isoformat(),
+        "time_duration": quiz["time_duration"],
+        "questions": [
+            {**question, "option_order": attempts.option_order(attempt, question["id"])} for question in questions
+        ],
+        "attempt": {
+            "id": attempt.id,
+            "deadline": attempt.deadline.isoformat(),
+            "remaining": attempts.remaining_seconds(attempt, now),
+            "answers": {str(qid): option for qid, option in zip(dealt.question_ids, saved) if option},
+        },
+    })
+
+
+@api_v1.post("/quizzes/<int:quiz_id>/submissions")
+@login_required
+async def submit_quiz(quiz_id):
+    """Grades the caller's open attempt.
+
+    Body: {"answers": {"<question id>": <option 1-4>, ...}}.
+    """
+    data = request.get_json(silent=True) or {}
+    posted = data.get("answers") if isinstance(data, dict) else None
+    if not isinstance(posted, dict):
+        return jsonify({"error": "Expected a JSON object with an 'answers' object"}), 400
+    form = {f"question_{qid}": str(option) for qid, option in posted.items()}
+
+    now = datetime.now()
+    async with async_db.session() as session:
+        key = await get_key(session, quiz_id)
+        if key is None:
+            abort(404)
+        attempt = await open_attempt(session, current_user.id, quiz_id)
+        if attempt is None:
+            return jsonify({"error": "No open attempt for this quiz"}), 409
+        dealt = attempts.attempt_key(attempt, key)
+        answers, late = attempts.final_answers(attempt, dealt, read_answers(form, dealt), now)
+        result = await finish_attempt(session, attempt, dealt, answers, now)
+    if result is None:
+        return jsonify({"error": "This attempt has already been submitted"}), 409
+    return jsonify({
+        "quiz_id": quiz_id,
+        "total_scored": result.total,
+        "question_count": len(dealt),
+        "late": late,
+        "results": [
+            {"question_id": qid, "answer": answer or None, "correct": bool(match)}
+            for qid, answer, match in zip(dealt.question_ids, result.answers, result.matches)
+        ],
+    }), 201
+
+
+@api_v1.get("/scores")
+@login_required
+async def scores():
+    """The caller's attempts, newest first, keyset-paginated."""
+    cursor, per_page = page_args()
+    columns = [Score.timestamp, Score.id]
+    query, values = apply_keyset(queries.score_rows(current_user.id), columns, cursor, descending=True)
+    async with async_db.session() as session:
+        rows = (await session.execute(query.limit(per_page + 1).statement)).all()
+    page = make_page(rows, columns, per_page, cursor if values is not None else None)
+    return jsonify({
+        "items": [
+            {
+                "id": row.id,
+                "quiz_id": row.quiz_id,
+                "subject": row.subject_name,
+                "chapter": row.chapter_name,
+                "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+                "total_scored": row.total_scored,
+                "question_count": row.question_count,
+            }
+            for row in page.items
+        ],
+        "next_cursor": page.next_cursor,
+    })
@@ -1,22 +1,45 @@
+import click
 from flask import Flask
+from flask.cli import with_appcontext
 from config import Config
 from models import db
+from extension import cache
+from submissions import submission_queue
+from leaderboard import leaderboards
+from instrumentation import instrumentation
+import db_profile
+import http_cache
+from catalog import catalog
 from routes import main
 from flask_login import LoginManager 
-from flask_migrate import Migrate  # Optional: For database migrations
-from werkzeug.security import generate_password_hash
+from security import passwords, login_throttle
+from user_cache import user_cache
 from datetime import datetime
 # Initialize Flask extensions
 login_manager = LoginManager()
 login_manager.login_view = "main.login"
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.config.update(config or {})  # overrides, e.g. from tests
 
     # Initialize database
+    db_profile.configure(app)
     db.init_app(app)
-    migrate = Migrate(app, db)  # Optional: Flask-Migrate for DB migrations
+    db_profile.init_app(app, db)
+    instrumentation.init_app(app, db)
+    cache.init_app(app)
+    submission_queue.init_app(app)
+    leaderboards.init_app(app)
+    passwords.init_app(app)
+    login_throttle.init_app(app)
+    user_cache.init_app(app)
+    http_cache.init_app(app)
+    catalog.init_app(app)
+    # Flask-Migrate (and alembic) load only when a `flask db` command runs
+    app.cli.add_command(LazyGroup("db", lambda: migrate_cli(app), help="Perform database migrations."))
+    app.cli.add_command(init_db_command)
 
     # Initialize Flask-Login
     login_manager.init_app(app)
@@ -28,14 +51,71 @@ def create_app():
     from admin_routes import admin
     app.register_blueprint(admin)
 
+    from api_v1 import api_v1, async_db
+    async_db.init_app(app)
+    app.register_blueprint(api_v1)
+
+    from stats import stats_cli
+    from query_plans import check_query_plans_command
+    from question_bank import questions_cli
+    from leaderboard import leaderboard_cli
+    from reporting import reports_cli
+    from jobs import jobs, jobs_cli
+    from search import search_cli
+    from dedup import dedup_cli
+    from item_analysis import items_cli
+    jobs.init_app(app)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(questions_cli)
+    app.cli.add_command(leaderboard_cli)
+    app.cli.add_command(reports_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(dedup_cli)
+    app.cli.add_command(items_cli)
+
     return app
 
+
+class LazyGroup(click.Group):
+    """A CLI group built on first use, so serving never imports what only the CLI needs."""
+
+    def __init__(self, name, load, **kwargs):
+        super().__init__(name, **kwargs)
+        self._load = load
+        self._loaded = None
+
+    def _real(self):
+        if self._loaded is None:
+            self._loaded = self._load()
+        return self._loaded
+
+    # Parsing and invocation go to the real group, so its options and callback apply
+    def make_context(self, info_name, args, parent=None, **extra):
+        return self._real().make_context(info_name, args, parent=parent, **extra)
+
+    def invoke(self, ctx):
+        return self._real().invoke(ctx)
+
+    def list_commands(self, ctx):
+        return self._real().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._real().get_command(ctx, name)
+
+
+def migrate_cli(app):
+    from flask_migrate import Migrate
+    Migrate(app, db)  # registers the real `db` group in place of the lazy one
+    return app.cli.commands["db"]
+
 # Define user loader function
 from models import User  # Import User model
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.load(user_id)
 
 def create_admin():
     admin_email = "admin@gmail.com"
@@ -49,7 +129,7 @@ def create_admin():
         admin = User(
             full_name="Admin",
             email=admin_email,
-            password=generate_password_hash("admin123", method='pbkdf2:sha256'),
+            password=passwords.hash("admin123"),
             qualification="BS",
             dob=dob_obj,  # Use the date object instead of a string
             role="admin"
@@ -59,9 +139,13 @@ def create_admin():
         print("✅ Default admin user created!")
 
 
-# Call the function when the app starts
+@click.command("init-db")
+@with_appcontext
+def init_db_command():
+    """Create missing tables and the default admin user."""
+    db.create_all()
+    create_admin()
 
-  
 
 if __name__ == "__main__":
     app = create_app()
@@ -0,0 +1,42 @@
+"""ASGI entry point: uvicorn asgi:app, or gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+
+The Flask app is served through asgiref's WSGI adapter, each request in a
+thread of its own, while the /api/v1 views run on the server's event loop
+(api_v1.AsyncDatabase), so their database waits interleave instead of each
+holding a worker. The pooled aiosqlite connections are closed on lifespan
+shutdown. uvicorn is not in requirements.txt; install it to use this module.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from api_v1 import async_db
+from app import create_app
+
+
+class Instance(WsgiToAsgiInstance):
+    # asgiref runs every WSGI call in one shared thread by default
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__["run_wsgi_app"].func, thread_sensitive=False)
+
+
+class Application(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        else:
+            await Instance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                async_db.use_loop(asyncio.get_running_loop())
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await async_db.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+app = Application(create_app())
@@ -0,0 +1,215 @@
+"""Server-side quiz attempts.
+
+Opening a quiz creates (or resumes) a QuizAttempt holding the start time, the
+deadline derived from Quiz.time_duration and the answers saved so far, packed
+one byte per question like grading.read_answers(). The quiz page autosaves
+changed answers to a small JSON endpoint, so a refresh or a dropped
+connection resumes where the student was, and submit grades against the
+deadline kept here rather than the browser's timer: anything posted after
+the deadline (plus ATTEMPT_GRACE_SECONDS) is ignored in favour of the last
+autosave.
+
+A quiz with a sample_size deals each attempt its own questions: that many ids
+are drawn from the quiz's cached answer key with a seed derived from the user,
+the quiz and the start time, and recorded on the attempt in the order shown.
+Options are shuffled per question from the same seed. The attempt's answer
+key (attempt_key()) is the quiz's key cut down to the drawn ids; it is the key
+every helper below expects, except start(), which takes the quiz's. Saving,
+resuming and grading therefore cover exactly the drawn questions and cost
+O(sample size) however large the pool is.
+"""
+import hashlib
+import random
+import re
+import zlib
+from array import array
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from grading import grade
+from http_cache import mark_submission
+from models import db, QuizAttempt
+from submissions import Submission, submission_queue
+
+
+def parse_duration(value):
+    """Quiz.time_duration ("HH:MM" or a number of minutes) as a timedelta, or None."""
+    value = (value or "").strip()
+    match = re.fullmatch(r"(\d{1,2}):(\d{2})", value)
+    if match:
+        minutes = int(match.group(1)) * 60 + int(match.group(2))
+    elif value.isdigit():
+        minutes = int(value)
+    else:
+        return None
+    return timedelta(minutes=minutes) if minutes > 0 else None
+
+
+def key_digest(key):
+    """Identifies the question set (and order) an answers string lines up with."""
+    return zlib.crc32(key.question_ids.tobytes())
+
+
+def draw_seed(user_id, quiz_id, now):
+    digest = hashlib.blake2b(f"{user_id}:{quiz_id}:{now.isoformat()}".encode(), digest_size=4).digest()
+    return int.from_bytes(digest, "big") >> 1  # fits the 32-bit column
+
+
+def draw(key, size, seed):
+    """`size` question ids drawn from the quiz's answer key, in an order fixed by `seed`."""
+    positions = random.Random(seed).sample(range(len(key)), min(size, len(key)))
+    return array("q", (key.question_ids[i] for i in positions))
+
+
+def dealt_count(quiz, key):
+    """How many questions an attempt at `quiz` gets."""
+    return min(quiz["sample_size"], len(key)) if quiz.get("sample_size") else len(key)
+
+
+def dealt_ids(attempt):
+    ids = array("q")
+    ids.frombytes(attempt.question_ids)
+    return ids
+
+
+def attempt_key(attempt, key):
+    """The answer key of the questions dealt to `attempt`: the quiz's `key`, or its drawn subset."""
+    if attempt.question_ids is None:
+        return key
+    return key.subset(dealt_ids(attempt))
+
+
+def option_order(attempt, question_id):
+    """The option numbers of a question in the order shown; shuffled for drawn attempts."""
+    if attempt.seed is None:
+        return (1, 2, 3, 4)
+    return tuple(random.Random(f"{attempt.seed}:{question_id}").sample((1, 2, 3, 4), 4))
+
+
+def dealt_questions(attempt, questions):
+    """Question dicts with an `options` list of (option number, text) pairs in display order."""
+    return [
+        {**question, "options": [(n, question[f"option{n}"]) for n in option_order(attempt, question["id"])]}
+        for question in questions
+    ]
+
+
+def grace_period():
+    return timedelta(seconds=current_app.config.get("ATTEMPT_GRACE_SECONDS", 30))
+
+
+def is_expired(attempt, now=None):
+    return (now or datetime.now()) > attempt.deadline + grace_period()
+
+
+def remaining_seconds(attempt, now=None):
+    return max(0, int((attempt.deadline - (now or datetime.now())).total_seconds()))
+
+
+def open_attempt_statement(user_id, quiz_id):
+    return (
+        db.select(QuizAttempt)
+        .filter_by(user_id=user_id, quiz_id=quiz_id, submitted_at=None)
+        .order_by(QuizAttempt.id.desc())
+        .limit(1)
+    )
+
+
+def current_attempt(user_id, quiz_id):
+    """The user's open attempt at a quiz, or None."""
+    return db.session.scalars(open_attempt_statement(user_id, quiz_id)).first()
+
+
+def saved_answers(attempt, key):
+    """The attempt's answers aligned with `key`; blank if the questions changed since."""
+    if attempt.key_digest != key_digest(key) or len(attempt.answers) != len(key):
+        return bytes(len(key))
+    return attempt.answers
+
+
+def merge(saved, posted):
+    """Posted answers win; questions left unanswered keep their saved option."""
+    return bytes(new or old for old, new in zip(saved, posted))
+
+
+def new_attempt(user_id, quiz, key, now):
+    duration = parse_duration(quiz["time_duration"]) or timedelta(
+        minutes=current_app.config.get("ATTEMPT_DEFAULT_MINUTES", 30))
+    attempt = QuizAttempt(user_id=user_id, quiz_id=quiz["id"], started_at=now, deadline=now + duration)
+    if quiz.get("sample_size"):
+        attempt.seed = draw_seed(user_id, quiz["id"], now)
+        attempt.question_ids = draw(key, quiz["sample_size"], attempt.seed).tobytes()
+    dealt = attempt_key(attempt, key)
+    attempt.answers = bytes(len(dealt))
+    attempt.key_digest = key_digest(dealt)
+    return attempt
+
+
+def final_answers(attempt, key, posted, now):
+    """The answers to grade and whether the submission is late.
+
+    A late submission keeps the last autosaved answers.
+    """
+    late = is_expired(attempt, now)
+    saved = saved_answers(attempt, key)
+    return (saved if late else merge(saved, posted)), late
+
+
+def claim(attempt, key, answers, now):
+    """Closes `attempt` only if still open, so concurrent submits grade it once."""
+    return (
+        db.update(QuizAttempt)
+        .where(QuizAttempt.id == attempt.id, QuizAttempt.submitted_at.is_(None))
+        .values(answers=answers, key_digest=key_digest(key), submitted_at=now)
+    )
+
+
+def start(user_id, quiz, key, now=None):
+    """Resumes the open attempt at `quiz` or starts a new one.
+
+    `key` is the quiz's answer key. An open attempt that has run out of time is
+    first submitted with whatever was autosaved, then a fresh attempt begins.
+    """
+    now = now or datetime.now()
+    attempt = current_attempt(user_id, quiz["id"])
+    if attempt is not None:
+        if not is_expired(attempt, now):
+            return attempt
+        dealt = attempt_key(attempt, key)
+        finish(attempt, dealt, saved_answers(attempt, dealt), now)
+
+    attempt = new_attempt(user_id, quiz, key, now)
+    db.session.add(attempt)
+    db.session.commit()
+    return attempt
+
+
+def autosave(attempt, key, answers, now=None):
+    attempt.answers = merge(saved_answers(attempt, key), answers)
+    attempt.key_digest = key_digest(key)
+    attempt.saved_at = now or datetime.now()
+    db.session.commit()
+
+
+def submit(attempt, key, answers, now=None):
+    """Grades and closes `attempt`; returns (GradeResult or None, late).
+
+    The result is None if the attempt was already closed, e.g. by a
+    double-clicked submit button.
+    """
+    now = now or datetime.now()
+    answers, late = final_answers(attempt, key, answers, now)
+    return finish(attempt, key, answers, now), late
+
+
+def finish(attempt, key, answers, now):
+    if not db.session.execute(claim(attempt, key, answers, now)).rowcount:
+        db.session.rollback()
+        return None
+    result = grade(key, answers)
+    queued = submission_queue.submit(Submission(attempt.user_id, attempt.quiz_id, key.subject_id, result.total, now,
+                                                key.question_ids.tobytes(), answers))
+    db.session.commit()
+    mark_submission(pending=(attempt.quiz_id, now) if queued else None)
+    return result
@@ -0,0 +1,302 @@
+"""Quiz-day load benchmark.
+
+Seeds a synthetic dataset, then replays the traffic shapes we see on exam
+days against the app and reports latency percentiles, throughput and SQL
+statements per request:
+
+* ``exam_opens``    - every student loads the same quiz (start_quiz burst)
+* ``autosave``      - students' quiz pages autosave answers while they work
+* ``exam_closes``   - every student submits that quiz (submit_quiz burst)
+* ``browse``        - students check their dashboard and scores
+* ``admin_summary`` - an admin reviews the summary and dashboard pages
+
+By default requests go through the Flask test client against a scratch
+SQLite database. ``--target http://host:port`` drives a running server (e.g.
+gunicorn) instead; that server must already hold data seeded by
+``--seed-only`` with the same sizes. Results can be written with
+``--output`` and compared against an earlier run with ``--baseline``:
+
+    python benchmarks/quiz_day.py --users 200 --concurrency 16 --output run.json
+    python benchmarks/quiz_day.py --users 200 --concurrency 16 --baseline run.json
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = "bench-password"
+SCENARIOS = ("exam_opens", "autosave", "exam_closes", "browse", "admin_summary")
+
+
+# -- dataset ----------------------------------------------------------------
+
+def seed(db, args):
+    """Bulk-inserts the synthetic dataset; returns the id of the "exam" quiz."""
+    from werkzeug.security import generate_password_hash
+    from models import User, Subject, Chapter, Quiz, Question, Score
+    import stats
+
+    rng = random.Random(args.seed)
+    password = generate_password_hash(PASSWORD, method="pbkdf2:sha256")
+    db.session.execute(db.insert(User), [
+        {"email": f"student{i}@bench.example.org", "password": password, "full_name": f"Student {i}", "role": "user"}
+        for i in range(args.users)
+    ] + [{"email": "admin@bench.example.org", "password": password, "full_name": "Admin", "role": "admin"}])
+
+    db.session.execute(db.insert(Subject), [
+        {"name": f"Subject {s}", "description": "benchmark"} for s in range(args.subjects)
+    ])
+    subject_ids = [row.id for row in db.session.query(Subject.id)]
+    db.session.execute(db.insert(Chapter), [
+        {"subject_id": sid, "name": f"Chapter {c}", "description": "benchmark"}
+        for sid in subject_ids for c in range(args.chapters)
+    ])
+    chapters = db.session.query(Chapter.id, Chapter.subject_id).all()
+    today = date.today()
+    db.session.execute(db.insert(Quiz), [
+        {"subject_id": ch.subject_id, "chapter_id": ch.id, "date_of_quiz": today - timedelta(days=rng.randint(0, 365)),
+         "time_duration": "30"}
+        for ch in chapters for _ in range(args.quizzes)
+    ])
+    quizzes = db.session.query(Quiz.id).all()
+    for start in range(0, len(quizzes), 200):
+        db.session.execute(db.insert(Question), [
+            {"quiz_id": quiz.id, "question_statement": f"Question {q} of quiz {quiz.id}?",
+             "option1": "A", "option2": "B", "option3": "C", "option4": "D", "correct_option": rng.randint(1, 4)}
+            for quiz in quizzes[start:start + 200] for q in range(args.questions)
+        ])
+    user_ids = [row.id for row in db.session.query(User.id).filter(User.role == "user")]
+    quiz_ids = [quiz.id for quiz in quizzes]
+    now = datetime.now()
+    scores = [
+        {"user_id": uid, "quiz_id": rng.choice(quiz_ids), "total_scored": rng.randint(0, args.questions),
+         "timestamp": now - timedelta(minutes=rng.randint(0, 525600))}
+        for uid in user_ids for _ in range(args.scores)
+    ]
+    for start in range(0, len(scores), 5000):
+        db.session.execute(db.insert(Score), scores[start:start + 5000])
+    stats.rebuild()
+    db.session.commit()
+    return quiz_ids[0]
+
+
+# -- clients ----------------------------------------------------------------
+
+class TestClient:
+    """Wraps a Flask test client; SQL counts come from the Server-Timing header."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code, response.headers.get("Server-Timing", "")
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req) as response:
+                self.last_body = response.read().decode(errors="replace")
+                return response.status, response.headers.get("Server-Timing", "")
+        except urllib.error.HTTPError as e:
+            self.last_body = ""
+            return e.code, e.headers.get("Server-Timing", "")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def login(client, email):
+    data = {"email": email, "password": PASSWORD}
+    if isinstance(client, HttpClient):
+        client.request("GET", "/login")
+        token = re.search(r'name="csrf_token"[^>]*value="([^"]+)"', client.last_body)
+        if token:
+            data["csrf_token"] = token.group(1)
+    status, _ = client.request("POST", "/login", data)
+    if status not in (302, 303):
+        raise RuntimeError(f"login failed for {email}: HTTP {status}")
+
+
+def sql_count(server_timing):
+    match = re.search(r'desc="(\d+) queries"', server_timing)
+    return int(match.group(1)) if match else None
+
+
+# -- scenarios ----------------------------------------------------------------
+
+def scenario_requests(name, quiz_id, questions, rng):
+    if name == "exam_opens":
+        return [("GET", f"/quiz/{quiz_id}/start", None)]
+    answers = {f"question_{qid}": str(rng.randint(1, 4)) for qid in questions}
+    if name == "autosave":
+        # Opening the quiz resumes the attempt started by exam_opens (or starts one)
+        partial = dict(list(answers.items())[:len(answers) // 2])
+        return [("GET", f"/quiz/{quiz_id}/start", None), ("POST", f"/quiz/{quiz_id}/autosave", partial)]
+    if name == "exam_closes":
+        # Submitting needs an open attempt, so each iteration opens one first
+        return [("GET", f"/quiz/{quiz_id}/start", None), ("POST", f"/submit_quiz/{quiz_id}", answers)]
+    if name == "browse":
+        return [("GET", "/dashboard", None), ("GET", "/scores", None)]
+    if name == "admin_summary":
+        return [("GET", "/admin/summary", None), ("GET", "/admin/dashboard", None)]
+    raise ValueError(name)
+
+
+def run_scenario(name, clients, quiz_id, questions, args):
+    samples, errors = [], 0
+    lock = threading.Lock()
+
+    def work(client, seed):
+        nonlocal errors
+        rng = random.Random(seed)
+        for _ in range(args.iterations):
+            for method, path, data in scenario_requests(name, quiz_id, questions, rng):
+                started = time.perf_counter()
+                status, timing = client.request(method, path, data)
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    samples.append((elapsed, sql_count(timing)))
+                    errors += status >= 400
+
+    threads = [threading.Thread(target=work, args=(client, i)) for i, client in enumerate(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies = sorted(sample[0] for sample in samples)
+    counts = [sample[1] for sample in samples if sample[1] is not None]
+
+    def pct(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 2) if latencies else 0.0
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / wall, 1) if wall else 0.0,
+        "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+        "avg_queries": round(sum(counts) / len(counts), 2) if counts else None,
+        "max_queries": max(counts) if counts else None,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Lists regressions beyond `tolerance` (a fraction) against a baseline run."""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        if before["p95_ms"] and current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {current['p95_ms']} ms")
+        if before["throughput_rps"] and current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if before.get("max_queries") is not None and current.get("max_queries") is not None \
+                and current["max_queries"] > before["max_queries"]:
+            regressions.append(f"{name}: max queries {before['max_queries']} -> {current['max_queries']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quiz-day load benchmark.")
+    parser.add_argument("--subjects", type=int, default=5)
+    parser.add_argument("--chapters", type=int, default=5, help="chapters per subject")
+    parser.add_argument("--quizzes", type=int, default=4, help="quizzes per chapter")
+    parser.add_argument("--questions", type=int, default=20, help="questions per quiz")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--scores", type=int, default=20, help="past attempts per user")
+    parser.add_argument("--concurrency", type=int, default=8, help="simultaneous virtual users")
+    parser.add_argument("--iterations", type=int, default=5, help="scenario repetitions per virtual user")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database", help="SQLite file to use (default: a fresh temp file)")
+    parser.add_argument("--seed-only", action="store_true", help="create and seed --database, then exit")
+    parser.add_argument("--target", help="base URL of a running server instead of the test client")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against a previous results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression vs baseline")
+    args = parser.parse_args()
+
+    database = args.database or os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = "sqlite:///" + database
+    os.environ.setdefault("SERVER_TIMING_HEADER", "1")
+    os.environ.setdefault("SLOW_REQUEST_MS", "1e9")
+    os.environ.setdefault("LOGIN_THROTTLE_ENABLED", "0")  # every virtual user logs in from one address
+
+    from app import create_app
+    from models import db, Question
+
+    app = create_app()
+    app.config["WTF_CSRF_ENABLED"] = False
+    with app.app_context():
+        fresh = not db.inspect(db.engine).has_table("user")
+        db.create_all()
+        if fresh:
+            started = time.perf_counter()
+            quiz_id = seed(db, args)
+            print(f"Seeded {database} in {time.perf_counter() - started:.1f}s")
+        else:
+            quiz_id = db.session.query(db.func.min(Question.quiz_id)).scalar()
+        questions = [row.id for row in db.session.query(Question.id).filter_by(quiz_id=quiz_id)]
+    if args.seed_only:
+        return
+
+    def make_client():
+        return HttpClient(args.target) if args.target else TestClient(app)
+
+    students, admins = [], [make_client()]
+    for i in range(args.concurrency):
+        client = make_client()
+        login(client, f"student{i % args.users}@bench.example.org")
+        students.append(client)
+    login(admins[0], "admin@bench.example.org")
+
+    results = {"params": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+               "scenarios": {}}
+    print(f"{'scenario':<15}{'reqs':>7}{'err':>5}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'sql avg':>9}{'sql max':>9}")
+    for name in args.scenarios:
+        clients = admins if name == "admin_summary" else students
+        r = run_scenario(name, clients, quiz_id, questions, args)
+        results["scenarios"][name] = r
+        print(f"{name:<15}{r['requests']:>7}{r['errors']:>5}{r['throughput_rps']:>9}{r['p50_ms']:>9}"
+              f"{r['p95_ms']:>9}{r['p99_ms']:>9}{str(r['avg_queries']):>9}{str(r['max_queries']):>9}")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
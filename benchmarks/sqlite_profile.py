@@ -0,0 +1,117 @@
+"""Concurrent read/write throughput of the SQLite tuning profiles.
+
+Spawns reader and writer processes (like gunicorn workers) against a scratch
+copy of the app schema and reports operations per second for each profile in
+db_profile.PROFILES:
+
+    python benchmarks/sqlite_profile.py --readers 4 --writers 2 --seconds 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+import db_profile  # noqa: E402
+from models import db, Score  # noqa: E402
+
+SCORES = Score.__table__
+
+
+def make_engine(path, profile):
+    settings = db_profile.PROFILES[profile]
+    options = {k: v for k, v in settings["engine"].items() if k in ("pool_pre_ping",)}
+    engine = create_engine(f"sqlite:///{path}", **options)
+    db_profile.install_pragmas(engine, settings["pragmas"])
+    return engine
+
+
+def seed(path, profile, users, rows):
+    engine = make_engine(path, profile)
+    db.metadata.create_all(engine, tables=[SCORES])
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(insert(SCORES), [
+            {"quiz_id": random.randint(1, 50), "user_id": random.randint(1, users),
+             "total_scored": random.randint(0, 10), "timestamp": now, "date_attempted": now.date()}
+            for _ in range(rows)
+        ])
+    engine.dispose()
+
+
+def worker(kind, path, profile, users, seconds, results):
+    engine = make_engine(path, profile)
+    done = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        user_id = random.randint(1, users)
+        try:
+            with engine.begin() as conn:
+                if kind == "read":
+                    conn.execute(
+                        select(SCORES).where(SCORES.c.user_id == user_id)
+                        .order_by(SCORES.c.timestamp.desc()).limit(25)
+                    ).all()
+                else:
+                    now = datetime.now()
+                    conn.execute(insert(SCORES).values(
+                        quiz_id=random.randint(1, 50), user_id=user_id,
+                        total_scored=random.randint(0, 10), timestamp=now, date_attempted=now.date(),
+                    ))
+            done += 1
+        except OperationalError:  # "database is locked"
+            errors += 1
+    engine.dispose()
+    results.put((kind, done, errors))
+
+
+def run(profile, args):
+    path = os.path.join(tempfile.mkdtemp(), f"{profile}.db")
+    seed(path, profile, args.users, args.rows)
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=worker, args=(kind, path, profile, args.users, args.seconds, results))
+        for kind in ["read"] * args.readers + ["write"] * args.writers
+    ]
+    for proc in procs:
+        proc.start()
+    totals = {"read": [0, 0], "write": [0, 0]}
+    for _ in procs:
+        kind, done, errors = results.get()
+        totals[kind][0] += done
+        totals[kind][1] += errors
+    for proc in procs:
+        proc.join()
+    return {
+        "reads_per_s": totals["read"][0] / args.seconds,
+        "writes_per_s": totals["write"][0] / args.seconds,
+        "lock_errors": totals["read"][1] + totals["write"][1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--profiles", nargs="+", default=sorted(db_profile.PROFILES))
+    args = parser.parse_args()
+
+    print(f"{'profile':<12}{'reads/s':>12}{'writes/s':>12}{'lock errors':>14}")
+    for profile in args.profiles:
+        result = run(profile, args)
+        print(f"{profile:<12}{result['reads_per_s']:>12.0f}{result['writes_per_s']:>12.0f}{result['lock_errors']:>14}")
+
+
+if __name__ == "__main__":
+    main()
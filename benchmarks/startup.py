@@ -0,0 +1,126 @@
+"""App startup benchmark.
+
+Measures what a fresh worker pays before it can serve: the wall time of
+``import wsgi`` (imports plus create_app()) in new interpreters, and an
+import-time breakdown by top-level package from ``python -X importtime``.
+It also lists modules that must stay off the serving import path (the
+migration tooling, Parquet support) if something imports them eagerly.
+
+    python benchmarks/startup.py --runs 10 --output startup.json
+    python benchmarks/startup.py --runs 10 --baseline startup.json
+
+With ``--baseline`` it exits non-zero when the median startup time regresses
+by more than ``--tolerance`` or a lazy module shows up on the import path.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only `flask db` / Parquet exports need these; serving must not import them
+LAZY_MODULES = ("flask_migrate", "alembic", "pyarrow")
+
+TIMED = """
+import sys, time
+started = time.perf_counter()
+import wsgi
+print(time.perf_counter() - started)
+print(",".join(name for name in {lazy!r} if name in sys.modules))
+"""
+
+
+def environment(database):
+    env = dict(os.environ)
+    env["DATABASE_URL"] = "sqlite:///" + database
+    env.setdefault("CATALOG_VERSION_FILE", database + ".catalog_version")
+    env.setdefault("PASSWORD_HASH_LOCK_DIR", database + ".locks")
+    return env
+
+
+def run_python(args, env):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+
+def time_startup(env):
+    """(seconds to import wsgi, lazy modules that got imported) in a fresh interpreter."""
+    out = run_python(["-c", TIMED.format(lazy=LAZY_MODULES)], env).stdout.split("\n")
+    return float(out[0]), [name for name in out[1].split(",") if name]
+
+
+def import_breakdown(env):
+    """Self import time in ms per top-level package, from -X importtime."""
+    totals = Counter()
+    for line in run_python(["-X", "importtime", "-c", "import wsgi"], env).stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.split(":", 1)[1].split("|")
+        totals[name.strip().split(".")[0]] += int(self_us)
+    return {name: round(us / 1000, 1) for name, us in totals.most_common()}
+
+
+def compare(results, baseline, tolerance):
+    """Lists regressions beyond `tolerance` (a fraction) against a baseline run."""
+    regressions = []
+    before, after = baseline.get("median_ms"), results["median_ms"]
+    if before and after > before * (1 + tolerance):
+        regressions.append(f"startup median {before} -> {after} ms")
+    for name in results["eager_lazy_modules"]:
+        if name not in baseline.get("eager_lazy_modules", []):
+            regressions.append(f"{name} is imported at startup")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="App startup benchmark.")
+    parser.add_argument("--runs", type=int, default=7, help="fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="packages to list in the breakdown")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against a previous results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression vs baseline")
+    args = parser.parse_args()
+
+    env = environment(os.path.join(tempfile.mkdtemp(), "startup.db"))
+    time_startup(env)  # warm the bytecode and OS file caches
+    samples, eager = [], set()
+    for _ in range(args.runs):
+        seconds, lazy = time_startup(env)
+        samples.append(seconds * 1000)
+        eager.update(lazy)
+    breakdown = import_breakdown(env)
+
+    results = {
+        "runs": args.runs,
+        "median_ms": round(statistics.median(samples), 1),
+        "min_ms": round(min(samples), 1),
+        "max_ms": round(max(samples), 1),
+        "eager_lazy_modules": sorted(eager),
+        "import_ms_by_package": breakdown,
+    }
+    print(f"import wsgi: median {results['median_ms']} ms, min {results['min_ms']}, max {results['max_ms']} "
+          f"({args.runs} runs)")
+    print(f"{'package':<24}{'self ms':>9}")
+    for name, ms in list(breakdown.items())[:args.top]:
+        print(f"{name:<24}{ms:>9}")
+    if eager:
+        print("Imported at startup but only needed lazily:", ", ".join(sorted(eager)))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
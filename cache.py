@@ -0,0 +1,168 @@
+"""Pluggable key/value cache used for hot read paths.
+
+Two backends share one interface:
+
+* ``memory`` - an in-process LRU with per-entry TTL (the default).
+* ``filesystem`` - pickled entries in a directory, so every worker process on
+  a host sees the same entries. It stands in for a shared cache server and,
+  like one, hands back copies rather than shared objects.
+
+``Cache`` is a Flask-style extension that picks the backend from config.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, max_entries=1024, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (entry[0] is not None and entry[0] < time.monotonic()):
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FileSystemCache:
+    def __init__(self, directory, default_ttl=300):
+        self.directory = directory
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key, default=None):
+        try:
+            with open(self._path(key), "rb") as fh:
+                expires, value = pickle.load(fh)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+        if expires is not None and expires < time.time():
+            self.delete(key)
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl else None
+        # Write then rename so readers in other workers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump((expires, value), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def __len__(self):
+        return len(os.listdir(self.directory))
+
+
+class Cache:
+    """Config-selected cache with single-flight loading for hot keys."""
+
+    def __init__(self, app=None):
+        self.backend = LRUCache()
+        self._key_locks = {}
+        self._locks_guard = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config.get("CACHE_BACKEND", "memory")
+        ttl = app.config.get("CACHE_DEFAULT_TTL", 300)
+        if kind == "memory":
+            self.backend = LRUCache(app.config.get("CACHE_MAX_ENTRIES", 1024), ttl)
+        elif kind == "filesystem":
+            directory = app.config.get("CACHE_DIR") or os.path.join(app.instance_path, "cache")
+            self.backend = FileSystemCache(directory, ttl)
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND {kind!r}")
+        app.extensions["cache"] = self
+
+    def get(self, key, default=None):
+        return self.backend.get(key, default)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl)
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_or_set(self, key, loader, ttl=None):
+        """Returns the cached value, calling `loader` once per process on a miss.
+
+        Concurrent misses for the same key wait for the first loader instead
+        of all hitting the database.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        with self._locks_guard:
+            lock = self._key_locks.setdefault(key, threading.Lock())
+        with lock:
+            value = self.get(key, missing)
+            if value is missing:
+                value = loader()
+                if value is not None:
+                    self.set(key, value, ttl)
+        with self._locks_guard:
+            self._key_locks.pop(key, None)
+        return value
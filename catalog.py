@@ -0,0 +1,110 @@
+"""In-process subject → chapter → quiz tree.
+
+Admin forms, the chapter dropdown endpoint and the catalog list endpoints all
+need the same small set of rows. The tree is loaded with three queries and
+kept per process until the catalog version (http_cache.py) changes, which
+every admin write bumps, so steady-state renders issue no catalog SQL.
+"""
+import threading
+from typing import NamedTuple
+
+from http_cache import catalog_version
+from models import db, Subject, Chapter, Quiz
+from queries import question_count_column
+
+
+class QuizNode(NamedTuple):
+    id: int
+    subject_id: int
+    chapter_id: int
+    date_of_quiz: object
+    time_duration: str
+    question_count: int  # questions an attempt is dealt
+
+
+class ChapterNode(NamedTuple):
+    id: int
+    subject_id: int
+    name: str
+    description: str
+    quizzes: tuple
+
+
+class SubjectNode(NamedTuple):
+    id: int
+    name: str
+    description: str
+    chapters: tuple
+
+
+class CatalogTree:
+    """An immutable snapshot; lists are ordered by id."""
+
+    def __init__(self, subjects, chapters, quizzes):
+        self.quizzes = tuple(QuizNode(*row) for row in quizzes)
+        by_chapter = {}
+        for quiz in self.quizzes:
+            by_chapter.setdefault(quiz.chapter_id, []).append(quiz)
+        self.chapters = tuple(ChapterNode(*row, tuple(by_chapter.get(row[0], ()))) for row in chapters)
+        by_subject = {}
+        for chapter in self.chapters:
+            by_subject.setdefault(chapter.subject_id, []).append(chapter)
+        self.subjects = tuple(SubjectNode(*row, tuple(by_subject.get(row[0], ()))) for row in subjects)
+
+        self.subject_by_id = {subject.id: subject for subject in self.subjects}
+        self.chapter_by_id = {chapter.id: chapter for chapter in self.chapters}
+
+    def chapters_of(self, subject_id):
+        subject = self.subject_by_id.get(subject_id)
+        return subject.chapters if subject else ()
+
+    def quizzes_of(self, chapter_id):
+        chapter = self.chapter_by_id.get(chapter_id)
+        return chapter.quizzes if chapter else ()
+
+    def subject_choices(self):
+        return [(subject.id, subject.name) for subject in self.subjects]
+
+    def chapter_choices(self, subject_id):
+        return [(chapter.id, chapter.name) for chapter in self.chapters_of(subject_id)]
+
+
+def load_tree():
+    return CatalogTree(
+        db.session.query(Subject.id, Subject.name, Subject.description).order_by(Subject.id).all(),
+        db.session.query(Chapter.id, Chapter.subject_id, Chapter.name, Chapter.description).order_by(Chapter.id).all(),
+        db.session.query(Quiz.id, Quiz.subject_id, Quiz.chapter_id, Quiz.date_of_quiz, Quiz.time_duration,
+                         question_count_column()).order_by(Quiz.id).all(),
+    )
+
+
+class Catalog:
+    def __init__(self, app=None):
+        self._loaded = (None, None)  # (version, tree), swapped as one reference
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.invalidate()
+        app.extensions["catalog"] = self
+
+    def tree(self):
+        """The current CatalogTree, reloaded when the catalog version has moved."""
+        version = catalog_version.current()
+        loaded_version, tree = self._loaded
+        if loaded_version != version:
+            with self._lock:
+                loaded_version, tree = self._loaded
+                if loaded_version != version:
+                    # Keyed on the version read before loading, so a bump during
+                    # the load makes the next call reload again
+                    tree = load_tree()
+                    self._loaded = (version, tree)
+        return tree
+
+    def invalidate(self):
+        self._loaded = (None, None)
+
+
+catalog = Catalog()
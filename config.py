@@ -2,7 +2,117 @@ import os
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_pragmas():
+    """SQLITE_<PRAGMA>=value environment overrides, e.g. SQLITE_SYNCHRONOUS=FULL."""
+    names = ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "temp_store")
+    return {name: os.environ[f"SQLITE_{name.upper()}"] for name in names if os.environ.get(f"SQLITE_{name.upper()}")}
+
+
+def env_engine_options():
+    options = {}
+    for name, key, cast in (
+        ("DB_POOL_SIZE", "pool_size", int),
+        ("DB_MAX_OVERFLOW", "max_overflow", int),
+        ("DB_POOL_TIMEOUT", "pool_timeout", float),
+        ("DB_POOL_RECYCLE", "pool_recycle", int),
+    ):
+        if os.environ.get(name):
+            options[key] = cast(os.environ[name])
+    if os.environ.get("DB_POOL_PRE_PING"):
+        options["pool_pre_ping"] = env_bool("DB_POOL_PRE_PING", True)
+    return options
+
+
 class Config:
     SECRET_KEY = 'your_secret_key_here'  # Change this to a strong secret key
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'quiz_master.db')
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", 'sqlite:///' + os.path.join(BASE_DIR, 'quiz_master.db'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    ASYNC_DATABASE_URI = os.environ.get("ASYNC_DATABASE_URI")  # /api/v1; derived (sqlite+aiosqlite) when unset
+
+    # Database tuning profile from db_profile.PROFILES ("production" = WAL + pool)
+    DB_PROFILE = os.environ.get("DB_PROFILE", "production")
+    SQLITE_PRAGMAS = env_pragmas()  # per-PRAGMA overrides on top of the profile
+    DB_ENGINE_OPTIONS = env_engine_options()  # pool overrides on top of the profile
+
+    ITEMS_PER_PAGE = 25  # Rows per page on list views and JSON endpoints
+    MAX_ITEMS_PER_PAGE = 100
+
+    # "memory" (per-process LRU) or "filesystem" (shared by all workers on a host)
+    CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+    CACHE_DEFAULT_TTL = env_int("CACHE_DEFAULT_TTL", 300)  # seconds
+    CACHE_MAX_ENTRIES = env_int("CACHE_MAX_ENTRIES", 1024)
+    CACHE_DIR = os.environ.get("CACHE_DIR", os.path.join(BASE_DIR, "instance", "cache"))
+    # Bumped on every admin write; ETags of catalog responses derive from it
+    CATALOG_VERSION_FILE = os.environ.get("CATALOG_VERSION_FILE", os.path.join(BASE_DIR, "instance", "catalog_version"))
+
+    # Write-behind score persistence (off = write each submission in the request)
+    SUBMISSION_QUEUE_ENABLED = env_bool("SUBMISSION_QUEUE_ENABLED", False)
+    SUBMISSION_QUEUE_MAXSIZE = env_int("SUBMISSION_QUEUE_MAXSIZE", 10000)
+    SUBMISSION_BATCH_SIZE = env_int("SUBMISSION_BATCH_SIZE", 50)
+    SUBMISSION_FLUSH_INTERVAL = env_float("SUBMISSION_FLUSH_INTERVAL", 0.5)  # seconds
+
+    # Password hashing, run on a bounded pool; users are rehashed on login when this changes
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "pbkdf2:sha256")  # werkzeug method string
+    PASSWORD_HASH_SALT_LENGTH = 16
+    # Concurrent hashes across all worker processes on the host (half the cores by default)
+    PASSWORD_HASH_WORKERS = env_int("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2))
+    # Callers across the host waiting for a hashing slot before sign-ins get "busy"; each one ties up a worker
+    PASSWORD_HASH_BACKLOG = env_int("PASSWORD_HASH_BACKLOG", max(1, (os.cpu_count() or 2) // 2))
+    PASSWORD_HASH_WAIT = env_float("PASSWORD_HASH_WAIT", 5.0)  # seconds to wait for a hashing slot
+    # Slot lock files; every process that should share the limit must use the same directory
+    PASSWORD_HASH_LOCK_DIR = os.environ.get("PASSWORD_HASH_LOCK_DIR", os.path.join(BASE_DIR, "instance", "locks"))
+
+    # Token-bucket throttling of login/register attempts
+    LOGIN_THROTTLE_ENABLED = env_bool("LOGIN_THROTTLE_ENABLED", True)
+    LOGIN_IP_BURST = env_int("LOGIN_IP_BURST", 60)  # a classroom behind one NAT signs in at once
+    LOGIN_IP_PER_MINUTE = env_int("LOGIN_IP_PER_MINUTE", 60)
+    LOGIN_ACCOUNT_BURST = env_int("LOGIN_ACCOUNT_BURST", 5)
+    LOGIN_ACCOUNT_PER_MINUTE = env_int("LOGIN_ACCOUNT_PER_MINUTE", 5)
+
+    # Per-process cache of logged-in users' identities (see user_cache.py)
+    USER_CACHE_TTL = env_int("USER_CACHE_TTL", 60)  # seconds; bounds staleness in other workers
+    USER_CACHE_MAX_ENTRIES = env_int("USER_CACHE_MAX_ENTRIES", 10000)
+
+    # Server-side quiz attempts (see attempts.py)
+    ATTEMPT_GRACE_SECONDS = env_int("ATTEMPT_GRACE_SECONDS", 30)  # accept submissions this long past the deadline
+    ATTEMPT_DEFAULT_MINUTES = env_int("ATTEMPT_DEFAULT_MINUTES", 30)  # when time_duration can't be parsed
+    ATTEMPT_AUTOSAVE_SECONDS = env_int("ATTEMPT_AUTOSAVE_SECONDS", 15)  # how often the quiz page saves answers
+
+    # Near-duplicate question detection (see dedup.py)
+    DEDUP_THRESHOLD = env_float("DEDUP_THRESHOLD", 0.6)  # shingle Jaccard similarity that counts as a duplicate
+
+    # Per-question item analysis (see item_analysis.py); also recomputed whenever a quiz gets new attempts
+    ITEM_ANALYSIS_CACHE_TTL = env_int("ITEM_ANALYSIS_CACHE_TTL", 86400)  # seconds
+
+    # Background jobs for bulk deletes (see jobs.py)
+    JOBS_CHUNK_SIZE = env_int("JOBS_CHUNK_SIZE", 1000)  # rows per DELETE transaction
+    JOBS_STALE_SECONDS = env_int("JOBS_STALE_SECONDS", 300)  # a running job without a heartbeat this long is retried
+    JOBS_RUN_INLINE = env_bool("JOBS_RUN_INLINE", False)  # run jobs in the request (tests, one-off scripts)
+
+    LEADERBOARD_MAX_BOARDS = env_int("LEADERBOARD_MAX_BOARDS", 256)  # ranked boards kept in memory per process
+    LEADERBOARD_TOP_N = 10  # default ?limit= on the leaderboard API
+
+    # Request instrumentation, served at /admin/metrics
+    INSTRUMENTATION_ENABLED = env_bool("INSTRUMENTATION_ENABLED", True)
+    SLOW_REQUEST_MS = env_float("SLOW_REQUEST_MS", 500)  # log requests slower than this
+    PROFILE_SAMPLE_RATE = env_float("PROFILE_SAMPLE_RATE", 0.0)  # fraction of requests run under cProfile
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, "instance", "profiles"))
+    SERVER_TIMING_HEADER = env_bool("SERVER_TIMING_HEADER", False)  # per-response app/sql/render timings
@@ -0,0 +1,117 @@
+"""SQLite tuning profiles.
+
+A profile is a set of PRAGMAs applied to every new connection plus pool
+settings for SQLALCHEMY_ENGINE_OPTIONS. ``production`` switches to WAL so
+readers no longer block the writer across gunicorn workers; ``default``
+leaves SQLite's stock behaviour. Every value can be overridden from the
+environment (see config.py). Forked workers start with an empty pool.
+"""
+import os
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+PROFILES = {
+    "default": {
+        "pragmas": {},
+        "engine": {},
+    },
+    "production": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,    # ms to wait on a locked database before failing
+            "cache_size": -64000,    # negative = KiB, so ~64 MB of page cache
+            "mmap_size": 268435456,  # 256 MB memory-mapped I/O
+            "temp_store": "MEMORY",
+        },
+        "engine": {
+            "pool_size": 10,
+            "max_overflow": 20,
+            "pool_timeout": 30,
+            "pool_recycle": 3600,
+            "pool_pre_ping": True,
+        },
+    },
+}
+
+POOL_OPTIONS = ("pool_size", "max_overflow", "pool_timeout", "pool_recycle")
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == "sqlite"
+
+
+def is_memory_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def resolve(app):
+    """Merges the selected profile with explicit config overrides."""
+    name = app.config.get("DB_PROFILE", "default")
+    if name not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE {name!r}; expected one of {sorted(PROFILES)}")
+    pragmas = dict(PROFILES[name]["pragmas"])
+    pragmas.update(app.config.get("SQLITE_PRAGMAS") or {})
+    engine = dict(PROFILES[name]["engine"])
+    engine.update(app.config.get("DB_ENGINE_OPTIONS") or {})
+    return pragmas, engine
+
+
+def configure(app):
+    """Fills SQLALCHEMY_ENGINE_OPTIONS; call before db.init_app()."""
+    uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    pragmas, engine = resolve(app)
+    if is_memory_sqlite(uri):
+        # In-memory databases use a single static connection; pool sizing doesn't apply
+        engine = {k: v for k, v in engine.items() if k not in POOL_OPTIONS}
+    options = dict(engine)
+    options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+    app.config["SQLITE_PRAGMAS"] = pragmas if is_sqlite(uri) else {}
+
+
+def pragma_statements(pragmas):
+    return [f"PRAGMA {name}={value}" for name, value in pragmas.items()]
+
+
+def install_pragmas(engine, pragmas):
+    """Runs the PRAGMAs on every new DBAPI connection of `engine`."""
+    statements = pragma_statements(pragmas)
+    if not statements:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _apply(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def dispose_after_fork(engine):
+    """Drops `engine`'s pooled connections in forked children.
+
+    With gunicorn --preload the app is built in the master and workers fork
+    from it; a connection the master opened must not be shared with them.
+    close=False leaves the parent's connections open for the parent.
+    """
+    ref = weakref.ref(engine)
+
+    def reset():
+        engine = ref()
+        if engine is not None:
+            engine.dispose(close=False)
+
+    os.register_at_fork(after_in_child=reset)
+
+
+def init_app(app, db):
+    """Applies the configured pragmas to the app's engine; call after db.init_app()."""
+    with app.app_context():
+        install_pragmas(db.engine, app.config.get("SQLITE_PRAGMAS") or {})
+        dispose_after_fork(db.engine)
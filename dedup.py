@@ -0,0 +1,280 @@
+"""Near-duplicate question detection with MinHash LSH.
+
+A question's statement and options (options sorted, so reordering them
+doesn't hide a copy) are normalised and cut into character 5-gram shingles.
+Each shingle is hashed once, and a 64-value MinHash is taken over those
+hashes under 64 fixed universal hash functions; the values are split into
+16 bands of 4 and each band is hashed to a bucket stored in `question_lsh`.
+Checking a new question is a lookup of its 16 (band, bucket) keys in that
+table's primary key, followed by an exact shingle Jaccard against the
+handful of candidates, so the cost does not grow with the size of the
+bank. With 16x4 bands, pairs above ~0.6 Jaccard are found with high
+probability and pairs below ~0.3 rarely become candidates.
+
+Questions are indexed when added or edited in the admin, after bulk
+imports, and by `flask dedup rebuild`; a trigger (SQLite) drops a deleted
+question's rows.
+"""
+import hashlib
+import re
+from collections import defaultdict, namedtuple
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from models import db, Question, QuestionLSH, Quiz, Subject, Chapter
+
+SHINGLE = 5
+HASHES = 64
+BANDS = 16
+ROWS = HASHES // BANDS
+MAX_BUCKET_PAIRS = 50  # members of a bucket compared pairwise in a report; larger buckets are chained
+
+DDL = [
+    "CREATE TRIGGER IF NOT EXISTS question_lsh_ad AFTER DELETE ON question BEGIN "
+    "DELETE FROM question_lsh WHERE question_id = old.id; END",
+]
+for statement in DDL:
+    db.event.listen(QuestionLSH.__table__, "after_create", db.DDL(statement).execute_if(dialect="sqlite"))
+
+Match = namedtuple("Match", "question_id quiz_id subject chapter question_statement similarity")
+
+
+def normalize(text):
+    return " ".join(re.findall(r"\w+", (text or "").lower()))
+
+
+def question_text(statement, options):
+    return " | ".join([normalize(statement), *sorted(normalize(option) for option in options)])
+
+
+def shingles(text):
+    if len(text) <= SHINGLE:
+        return {text}
+    return {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+# h -> (a*h + b) mod PRIME per MinHash value; derived, not random, so every process agrees on buckets
+PRIME = (1 << 61) - 1
+COEFFICIENTS = [(_hash(f"minhash:a:{i}") % (PRIME - 1) + 1, _hash(f"minhash:b:{i}") % PRIME) for i in range(HASHES)]
+
+
+def signature(shingle_set):
+    """MinHash: the smallest image of the shingle hashes under each of HASHES universal hash functions."""
+    hashes = [_hash(shingle) for shingle in shingle_set]
+    return [min((a * h + b) % PRIME for h in hashes) for a, b in COEFFICIENTS]
+
+
+def band_keys(shingle_set):
+    """The (band, bucket) keys of a shingle set."""
+    values = signature(shingle_set)
+    keys = []
+    for band in range(BANDS):
+        chunk = ",".join(str(v) for v in values[band * ROWS:(band + 1) * ROWS]).encode()
+        keys.append((band, int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "big", signed=True)))
+    return keys
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def threshold():
+    return current_app.config.get("DEDUP_THRESHOLD", 0.6)
+
+
+def _question_shingles(row):
+    return shingles(question_text(row.question_statement, (row.option1, row.option2, row.option3, row.option4)))
+
+
+def _lsh_rows(question):
+    return [{"band": band, "bucket": bucket, "question_id": question.id}
+            for band, bucket in band_keys(_question_shingles(question))]
+
+
+def index_question(question):
+    """(Re)writes the LSH rows of a Question; the caller commits."""
+    db.session.execute(db.delete(QuestionLSH).where(QuestionLSH.question_id == question.id))
+    db.session.execute(db.insert(QuestionLSH), _lsh_rows(question))
+
+
+def find_similar(question, limit=5, min_similarity=None):
+    """Questions whose text is near `question`'s (a Question or any object with its fields), best first."""
+    min_similarity = threshold() if min_similarity is None else min_similarity
+    own = _question_shingles(question)
+    keys = band_keys(own)
+    candidates = (
+        db.select(QuestionLSH.question_id)
+        # An OR of (band, bucket) pairs, each a primary-key lookup; SQLite scans the table for a row-value IN
+        .where(db.or_(*(db.and_(QuestionLSH.band == band, QuestionLSH.bucket == bucket) for band, bucket in keys)))
+    )
+    if getattr(question, "id", None) is not None:
+        candidates = candidates.where(QuestionLSH.question_id != question.id)
+    rows = db.session.execute(
+        db.select(Question.id, Question.quiz_id, Subject.name, Chapter.name, Question.question_statement,
+                  Question.option1, Question.option2, Question.option3, Question.option4)
+        .join(Quiz, Quiz.id == Question.quiz_id)
+        .join(Subject, Subject.id == Quiz.subject_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .where(Question.id.in_(candidates))
+    ).all()
+    matches = []
+    for row in rows:
+        similarity = jaccard(own, _question_shingles(row))
+        if similarity >= min_similarity:
+            matches.append(Match(row[0], row[1], row[2], row[3], row.question_statement, round(similarity, 3)))
+    matches.sort(key=lambda match: -match.similarity)
+    return matches[:limit]
+
+
+def unindexed_questions(quiz_id=None):
+    query = (
+        db.select(Question)
+        .outerjoin(QuestionLSH, db.and_(QuestionLSH.question_id == Question.id, QuestionLSH.band == 0))
+        .where(QuestionLSH.question_id.is_(None))
+        .order_by(Question.id)
+    )
+    if quiz_id is not None:
+        query = query.where(Question.quiz_id == quiz_id)
+    return query
+
+
+def _index_batches(query, batch_size):
+    """Indexes the questions of `query` (not yet indexed) in id order, one insert and commit per batch."""
+    last_id = 0
+    while True:
+        batch = db.session.scalars(query.where(Question.id > last_id).limit(batch_size)).all()
+        if not batch:
+            return
+        db.session.execute(db.insert(QuestionLSH), [row for question in batch for row in _lsh_rows(question)])
+        db.session.commit()
+        last_id = batch[-1].id
+        yield batch
+
+
+def index_missing(quiz_id=None, batch_size=1000):
+    """Indexes questions without LSH rows (e.g. after a bulk import); returns ids that have near-duplicates."""
+    flagged = []
+    for batch in _index_batches(unindexed_questions(quiz_id), batch_size):
+        flagged += [question.id for question in batch if find_similar(question, limit=1)]
+    return flagged
+
+
+def rebuild(batch_size=1000):
+    """Re-indexes every question, committing per batch; returns the number indexed."""
+    db.session.execute(db.delete(QuestionLSH))
+    db.session.commit()
+    return sum(len(batch) for batch in _index_batches(db.select(Question).order_by(Question.id), batch_size))
+
+
+class _Clusters:
+    """Union-find over question ids."""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        self.parent.setdefault(item, item)
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+
+def subject_report(subject_id, min_similarity=None):
+    """Groups of near-duplicate questions within a subject, largest first.
+
+    Returns a list of clusters, each a list of dicts (question id, quiz, chapter,
+    statement) with the cluster's highest pairwise similarity.
+    """
+    min_similarity = threshold() if min_similarity is None else min_similarity
+    in_subject = db.select(Question.id).join(Quiz, Quiz.id == Question.quiz_id).where(Quiz.subject_id == subject_id)
+    buckets = defaultdict(list)
+    for band, bucket, question_id in db.session.execute(
+        db.select(QuestionLSH.band, QuestionLSH.bucket, QuestionLSH.question_id)
+        .where(QuestionLSH.question_id.in_(in_subject))
+        .order_by(QuestionLSH.band, QuestionLSH.bucket, QuestionLSH.question_id)
+    ):
+        buckets[band, bucket].append(question_id)
+
+    pairs = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        if len(members) <= MAX_BUCKET_PAIRS:
+            pairs.update((a, b) for i, a in enumerate(members) for b in members[i + 1:])
+        else:
+            pairs.update(zip(members, members[1:]))
+    if not pairs:
+        return []
+
+    ids = sorted({question_id for pair in pairs for question_id in pair})
+    rows = {}
+    for start in range(0, len(ids), 500):
+        for row in db.session.execute(
+            db.select(Question.id, Question.quiz_id, Chapter.name.label("chapter"), Question.question_statement,
+                      Question.option1, Question.option2, Question.option3, Question.option4)
+            .join(Quiz, Quiz.id == Question.quiz_id)
+            .join(Chapter, Chapter.id == Quiz.chapter_id)
+            .where(Question.id.in_(ids[start:start + 500]))
+        ):
+            rows[row.id] = row
+    shingle_sets = {question_id: _question_shingles(row) for question_id, row in rows.items()}
+
+    clusters = _Clusters()
+    best = defaultdict(float)
+    for a, b in pairs:
+        if a not in rows or b not in rows:
+            continue
+        similarity = jaccard(shingle_sets[a], shingle_sets[b])
+        if similarity >= min_similarity:
+            clusters.union(a, b)
+            best[a] = max(best[a], similarity)
+            best[b] = max(best[b], similarity)
+
+    groups = defaultdict(list)
+    for question_id in best:
+        groups[clusters.find(question_id)].append(question_id)
+    report = []
+    for members in groups.values():
+        members.sort()
+        report.append({
+            "similarity": round(max(best[m] for m in members), 3),
+            "questions": [
+                {"id": m, "quiz_id": rows[m].quiz_id, "chapter": rows[m].chapter,
+                 "question_statement": rows[m].question_statement}
+                for m in members
+            ],
+        })
+    report.sort(key=lambda cluster: (-len(cluster["questions"]), -cluster["similarity"]))
+    return report
+
+
+dedup_cli = AppGroup("dedup", help="Near-duplicate question detection.")
+
+
+@dedup_cli.command("rebuild")
+def rebuild_command():
+    """Re-index every question's MinHash buckets."""
+    click.echo(f"Indexed {rebuild()} questions.")
+
+
+@dedup_cli.command("report")
+@click.argument("subject_id", type=int)
+@click.option("--threshold", "min_similarity", type=float, help="Minimum Jaccard similarity (default DEDUP_THRESHOLD).")
+def report_command(subject_id, min_similarity):
+    """List groups of near-duplicate questions in a subject."""
+    report = subject_report(subject_id, min_similarity)
+    for cluster in report:
+        click.echo(f"{len(cluster['questions'])} questions, up to {cluster['similarity']:.0%} similar:")
+        for q in cluster["questions"]:
+            click.echo(f"  #{q['id']} quiz {q['quiz_id']} ({q['chapter']}): {q['question_statement'][:80]}")
+    click.echo(f"{len(report)} groups of near-duplicates.")
@@ -1,3 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from cache import Cache
 
 db = SQLAlchemy()
+cache = Cache()
@@ -1,7 +1,7 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, DateField, IntegerField, TextAreaField, SelectField, HiddenField, TimeField
-from wtforms.validators import DataRequired, Email, EqualTo, Length
-from models import Subject, Chapter
+from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange, Optional
+from catalog import catalog
 
 class RegistrationForm(FlaskForm):
     email = StringField("Email", validators=[DataRequired(), Email()])
@@ -37,13 +37,17 @@ class QuizForm(FlaskForm):
     chapter_id = SelectField('Chapter', coerce=int, validators=[DataRequired()])
     date_of_quiz = DateField('Date of Quiz', format='%Y-%m-%d', validators=[DataRequired()])
     time_duration = StringField('Time Duration', validators=[DataRequired()])
+    # Blank = every question; otherwise each attempt draws this many at random
+    sample_size = IntegerField('Questions per Attempt', validators=[Optional(), NumberRange(min=1)])
 
     submit = SubmitField('Save Changes')
 
     def __init__(self, *args, **kwargs):
         super(QuizForm, self).__init__(*args, **kwargs)
-        self.subject_id.choices = [(s.id, s.name) for s in Subject.query.all()]
-        self.chapter_id.choices = []
+        tree = catalog.tree()
+        self.subject_id.choices = tree.subject_choices()
+        # Chapters of the posted (or edited) subject, so the choice validates
+        self.chapter_id.choices = tree.chapter_choices(self.subject_id.data) if self.subject_id.data else []
 
 
 class QuestionForm(FlaskForm):
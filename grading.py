@@ -0,0 +1,130 @@
+"""Answer-key grading shared by every quiz submission path.
+
+A quiz's answer key is packed once into parallel arrays (question ids and a
+bytes string of correct options) and cached under the catalog version
+(http_cache.py). Every admin write bumps that version for all worker
+processes on the host, so a fixed key is picked up everywhere, not only by
+the worker that handled the edit. A submission is packed the same way, and grading is one XOR over the two byte strings followed by C-level
+byte counting, so its cost stays flat as quizzes grow.
+"""
+from array import array
+from bisect import bisect_left
+
+from flask import current_app
+
+from extension import cache
+from http_cache import catalog_version
+from models import db, Quiz, Question
+
+# Maps an XOR byte to 1 when the answer matched (0) and 0 otherwise
+_MATCH_TABLE = bytes([1] + [0] * 255)
+_VALID_OPTIONS = {"1": 1, "2": 2, "3": 3, "4": 4}
+NO_OPTION = 255  # key byte for a question with no valid correct option; no answer byte matches it
+
+
+class AnswerKey:
+    __slots__ = ("quiz_id", "subject_id", "question_ids", "correct")
+
+    def __init__(self, quiz_id, subject_id, question_ids, correct):
+        self.quiz_id = quiz_id
+        self.subject_id = subject_id
+        self.question_ids = array("q", question_ids)
+        self.correct = bytes(correct)
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def subset(self, question_ids):
+        """The key for `question_ids` in that order (a drawn attempt); ids no longer in the quiz are dropped."""
+        ids, positions = self.question_ids, []
+        for question_id in question_ids:
+            index = bisect_left(ids, question_id)  # ids are in ascending order
+            if index < len(ids) and ids[index] == question_id:
+                positions.append(index)
+        return AnswerKey(self.quiz_id, self.subject_id, [ids[i] for i in positions],
+                         [self.correct[i] for i in positions])
+
+    def __getstate__(self):
+        return self.quiz_id, self.subject_id, self.question_ids, self.correct
+
+    def __setstate__(self, state):
+        self.quiz_id, self.subject_id, self.question_ids, self.correct = state
+
+
+class GradeResult:
+    __slots__ = ("total", "matches", "answers")
+
+    def __init__(self, total, matches, answers):
+        self.total = total
+        self.matches = matches  # one byte per question: 1 correct, 0 not
+        self.answers = answers  # one byte per question: chosen option, 0 unanswered
+
+    def is_correct(self, index):
+        return bool(self.matches[index])
+
+
+def answer_key_key(quiz_id, version):
+    return f"quiz:{quiz_id}:answer_key:{version}"
+
+
+def answer_key_statements(quiz_id):
+    """(subject id statement, (question id, correct option) rows statement) for a quiz."""
+    return (
+        db.select(Quiz.subject_id).where(Quiz.id == quiz_id),
+        db.select(Question.id, Question.correct_option).where(Question.quiz_id == quiz_id).order_by(Question.id),
+    )
+
+
+def key_option(value):
+    """A stored correct_option as 1-4, or None if it isn't one (rows saved before edits were validated)."""
+    try:
+        option = int(value)
+    except (TypeError, ValueError):
+        return None
+    return option if 1 <= option <= 4 else None
+
+
+def build_answer_key(quiz_id, subject_id, rows):
+    correct = []
+    for row in rows:
+        option = key_option(row.correct_option)
+        if option is None:
+            # Grade the rest of the quiz; this question can never be answered correctly until it is fixed
+            current_app.logger.warning("Question %s in quiz %s has an invalid correct_option %r", row.id, quiz_id,
+                           row.correct_option)
+            option = NO_OPTION
+        correct.append(option)
+    return AnswerKey(quiz_id, subject_id, [row.id for row in rows], correct)
+
+
+def load_answer_key(quiz_id):
+    subject_stmt, rows_stmt = answer_key_statements(quiz_id)
+    subject_id = db.session.execute(subject_stmt).scalar()
+    if subject_id is None:
+        return None
+    return build_answer_key(quiz_id, subject_id, db.session.execute(rows_stmt).all())
+
+
+def get_answer_key(quiz_id):
+    """The cached AnswerKey for a quiz, or None if the quiz doesn't exist."""
+    return cache.get_or_set(answer_key_key(quiz_id, catalog_version.current()), lambda: load_answer_key(quiz_id))
+
+
+def read_answers(form, key, prefix="question_"):
+    """Packs the submitted options into bytes aligned with `key`."""
+    get = form.get
+    return bytes(_VALID_OPTIONS.get((get(f"{prefix}{qid}") or "").strip(), 0) for qid in key.question_ids)
+
+
+def grade(key, answers):
+    if len(answers) != len(key.correct):
+        raise ValueError("answers do not line up with the answer key")
+    size = len(answers)
+    if not size:
+        return GradeResult(0, b"", answers)
+    diff = (int.from_bytes(answers, "big") ^ int.from_bytes(key.correct, "big")).to_bytes(size, "big")
+    return GradeResult(diff.count(0), diff.translate(_MATCH_TABLE), answers)
+
+
+def grade_form(form, key, prefix="question_"):
+    return grade(key, read_answers(form, key, prefix))
@@ -0,0 +1,27 @@
+"""gunicorn settings: gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is imported and built once in the master (preload_app) and workers
+fork from it, so a worker recycled after max_requests starts serving
+immediately instead of re-importing everything. db_profile drops pooled
+connections in each forked worker; background threads (submission writer,
+job runner) start per process on first use.
+
+Sync workers (threads=1) handle one request each, so per-process limits
+don't bound the server: password hashing takes slots shared by all workers
+on the host (lock files in PASSWORD_HASH_LOCK_DIR). A sign-in burst holds at
+most PASSWORD_HASH_WORKERS + PASSWORD_HASH_BACKLOG workers, hashing or
+waiting (by default the core count, against 2 * cores + 1 workers here);
+other sign-ins are told the server is busy instead of queueing.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+
+preload_app = True
+# Recycle workers to bound memory growth; the jitter keeps them from restarting together
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
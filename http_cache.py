@@ -0,0 +1,199 @@
+"""Conditional GETs for catalog data and fingerprinted static files.
+
+The catalog (subjects, chapters, quizzes, questions) only changes through the
+admin blueprint, so every successful admin write bumps a catalog version kept
+in a small file under the instance folder, which all worker processes on the
+host share. Catalog responses carry an ETag derived from that version, the
+URL and, for per-user pages, the user and their last submission; a matching
+If-None-Match is answered with 304 before the view runs, without touching
+the database. While a user's submission is still queued for the background
+writer (submissions.py), their per-user pages instead look up its Score row
+and are sent without an ETag until it has been written, so a page rendered
+before the write can't be revalidated afterwards.
+
+Static URLs built with url_for('static', ...) get a ?v=<content hash>, and
+such responses are served with a year-long immutable Cache-Control.
+"""
+import functools
+import hashlib
+import inspect
+import os
+import secrets
+import tempfile
+import threading
+from datetime import datetime
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+
+from models import db, Score
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+SUBMISSION_MARK = "_scores_version"
+SUBMISSION_PENDING = "_scores_pending"  # [quiz id, timestamp] of queued submissions
+
+
+class CatalogVersion:
+    def __init__(self, app=None):
+        self.path = None
+        self._stat = None
+        self._token = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.path = app.config.get("CATALOG_VERSION_FILE") or os.path.join(app.instance_path, "catalog_version")
+        self._stat = self._token = None
+        app.extensions["catalog_version"] = self
+
+    def current(self):
+        """The version token; one stat() per call, a read only when the file changed."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return self.bump()
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if stamp != self._stat:
+                with open(self.path) as fh:
+                    self._token = fh.read().strip()
+                self._stat = stamp
+            return self._token
+
+    def bump(self):
+        token = secrets.token_hex(8)
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, "w") as fh:
+            fh.write(token)
+        os.replace(tmp, self.path)  # atomic, so readers never see a partial token
+        return token
+
+
+catalog_version = CatalogVersion()
+
+
+def mark_submission(pending=None):
+    """Records in the session that the user's scores changed (per-user ETags depend on it).
+
+    `pending` is the (quiz id, timestamp) of a score that is still queued
+    rather than written.
+    """
+    session[SUBMISSION_MARK] = secrets.token_hex(4)
+    if pending is not None:
+        quiz_id, timestamp = pending
+        session[SUBMISSION_PENDING] = session.get(SUBMISSION_PENDING, []) + [[quiz_id, timestamp.isoformat()]]
+
+
+def scores_written():
+    """True unless one of the user's queued submissions has no Score row yet."""
+    pending = session.get(SUBMISSION_PENDING)
+    if not pending:
+        return True
+    remaining = [
+        [quiz_id, timestamp] for quiz_id, timestamp in pending
+        if db.session.query(Score.id).filter_by(user_id=current_user.id, quiz_id=quiz_id,
+                                                timestamp=datetime.fromisoformat(timestamp)).first() is None
+    ]
+    if remaining:
+        session[SUBMISSION_PENDING] = remaining
+        return False
+    del session[SUBMISSION_PENDING]
+    session[SUBMISSION_MARK] = secrets.token_hex(4)  # pages rendered while it was queued are stale
+    return True
+
+
+def catalog_etag(scope, per_user=False):
+    """The ETag for the current request, or None if it mustn't be revalidated."""
+    parts = [catalog_version.current(), scope, request.full_path]
+    if per_user and current_user.is_authenticated:
+        if not scores_written():
+            return None
+        parts += [current_user.get_id(), session.get(SUBMISSION_MARK, "")]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def conditional(scope, per_user=False):
+    """Answers If-None-Match for a catalog view from the catalog version alone."""
+    cache_control = "private, no-cache" if per_user else "no-cache"
+
+    def decorator(view):
+        def not_modified(etag):
+            # Pending flash messages must reach the page, so those requests always render
+            if etag is not None and etag in request.if_none_match and "_flashes" not in session:
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = cache_control
+                return response
+            return None
+
+        def finish(response, etag):
+            response = make_response(response)
+            if response.status_code == 200:
+                if etag is not None:
+                    response.set_etag(etag)
+                response.headers["Cache-Control"] = cache_control
+            return response
+
+        if inspect.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(*args, **kwargs):
+                etag = catalog_etag(scope, per_user)
+                response = not_modified(etag)
+                if response is None:
+                    response = finish(await view(*args, **kwargs), etag)
+                return response
+        else:
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                etag = catalog_etag(scope, per_user)
+                response = not_modified(etag)
+                if response is None:
+                    response = finish(view(*args, **kwargs), etag)
+                return response
+        return wrapper
+    return decorator
+
+
+def bump_on_write(response):
+    """after_request hook for blueprints whose writes change the catalog."""
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        catalog_version.bump()
+    return response
+
+
+# -- static fingerprinting ----------------------------------------------------
+
+_static_hashes = {}
+
+
+def static_hash(filename):
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _static_hashes.get(path)
+    if cached is None or cached[0] != stamp:
+        with open(path, "rb") as fh:
+            cached = _static_hashes[path] = (stamp, hashlib.md5(fh.read()).hexdigest()[:12])
+    return cached[1]
+
+
+def init_app(app):
+    catalog_version.init_app(app)
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == "static" and "filename" in values and "v" not in values:
+            digest = static_hash(values["filename"])
+            if digest:
+                values["v"] = digest
+
+    @app.after_request
+    def immutable_static(response):
+        if request.endpoint == "static" and request.args.get("v") and response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE
+        return response
@@ -0,0 +1,199 @@
+"""Per-endpoint request instrumentation.
+
+Records wall time, SQL statement count and SQL time (from SQLAlchemy engine
+events) and template render time for every request, aggregated per endpoint
+and served by /admin/metrics. Requests slower than SLOW_REQUEST_MS are
+logged; a PROFILE_SAMPLE_RATE fraction of requests run under cProfile and
+slow ones get their profile dumped to PROFILE_DIR for later inspection.
+"""
+import cProfile
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+RECENT_SAMPLES = 256
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class EndpointStats:
+    __slots__ = ("count", "total_ms", "max_ms", "sql_count", "max_sql_count", "sql_ms", "render_ms", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = self.max_ms = self.sql_ms = self.render_ms = 0.0
+        self.sql_count = self.max_sql_count = 0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def add(self, wall_ms, sql_count, sql_ms, render_ms):
+        self.count += 1
+        self.total_ms += wall_ms
+        self.max_ms = max(self.max_ms, wall_ms)
+        self.sql_count += sql_count
+        self.max_sql_count = max(self.max_sql_count, sql_count)
+        self.sql_ms += sql_ms
+        self.render_ms += render_ms
+        self.recent.append(wall_ms)
+
+    def as_dict(self):
+        count = self.count or 1
+        recent = list(self.recent)
+        return {
+            "requests": self.count,
+            "avg_ms": round(self.total_ms / count, 2),
+            "p50_ms": round(_percentile(recent, 0.50), 2),
+            "p95_ms": round(_percentile(recent, 0.95), 2),
+            "max_ms": round(self.max_ms, 2),
+            "avg_sql_count": round(self.sql_count / count, 2),
+            "max_sql_count": self.max_sql_count,
+            "avg_sql_ms": round(self.sql_ms / count, 2),
+            "avg_render_ms": round(self.render_ms / count, 2),
+        }
+
+
+class RequestTimings:
+    __slots__ = ("started", "sql_count", "sql_ms", "render_ms", "render_started", "profiler")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.render_ms = 0.0
+        self.render_started = []
+        self.profiler = None
+
+
+class Instrumentation:
+    def __init__(self, app=None, db=None):
+        self.app = None
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.app = app
+        app.extensions["instrumentation"] = self
+        self.enabled = app.config.get("INSTRUMENTATION_ENABLED", True)
+        if not self.enabled:
+            return
+        self.slow_ms = app.config.get("SLOW_REQUEST_MS", 500)
+        self.sample_rate = app.config.get("PROFILE_SAMPLE_RATE", 0.0)
+        self.profile_dir = app.config.get("PROFILE_DIR") or os.path.join(app.instance_path, "profiles")
+        self.server_timing = app.config.get("SERVER_TIMING_HEADER", False)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        with app.app_context():
+            self.instrument_engine(db.engine)
+
+    def instrument_engine(self, engine):
+        """Counts and times the statements `engine` runs during requests."""
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+    # -- request lifecycle --------------------------------------------------
+
+    def _before_request(self):
+        timings = g._timings = RequestTimings()
+        if self.sample_rate and random.random() < self.sample_rate:
+            timings.profiler = cProfile.Profile()
+            timings.profiler.enable()
+
+    def _after_request(self, response):
+        timings = g.get("_timings")
+        if timings is not None and self.server_timing:
+            wall_ms = (time.perf_counter() - timings.started) * 1000
+            response.headers["Server-Timing"] = (
+                f'app;dur={wall_ms:.1f}, sql;dur={timings.sql_ms:.1f};desc="{timings.sql_count} queries", '
+                f"render;dur={timings.render_ms:.1f}"
+            )
+        return response
+
+    def _teardown_request(self, exc):
+        timings = g.pop("_timings", None)
+        if timings is None:
+            return
+        wall_ms = (time.perf_counter() - timings.started) * 1000
+        if timings.profiler is not None:
+            timings.profiler.disable()
+        endpoint = request.endpoint or "<unmatched>"
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.add(wall_ms, timings.sql_count, timings.sql_ms, timings.render_ms)
+
+        if wall_ms >= self.slow_ms:
+            self.app.logger.warning(
+                "Slow request %s %s (%s): %.1f ms, %d SQL statements in %.1f ms, render %.1f ms",
+                request.method, request.path, endpoint, wall_ms, timings.sql_count, timings.sql_ms, timings.render_ms,
+            )
+            if timings.profiler is not None:
+                self._dump_profile(timings.profiler, endpoint)
+
+    def _dump_profile(self, profiler, endpoint):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = f"{endpoint.replace('.', '_')}-{int(time.time() * 1000)}.prof"
+        path = os.path.join(self.profile_dir, name)
+        profiler.dump_stats(path)
+        self.app.logger.warning("Profile written to %s", path)
+
+    # -- SQL and template hooks ---------------------------------------------
+
+    @staticmethod
+    def _current():
+        return g.get("_timings") if has_request_context() else None
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        timings = self._current()
+        if timings is not None:
+            timings.sql_count += 1
+            timings.sql_ms += (time.perf_counter() - started) * 1000
+
+    def _handle_error(self, exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+    def _before_render(self, sender, template, context, **extra):
+        timings = self._current()
+        if timings is not None:
+            timings.render_started.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        timings = self._current()
+        if timings is not None and timings.render_started:
+            timings.render_ms += (time.perf_counter() - timings.render_started.pop()) * 1000
+
+    # -- reporting ----------------------------------------------------------
+
+    def metrics(self):
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in sorted(self._endpoints.items())}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,184 @@
+"""Per-question item analysis from stored answers.
+
+Every Score keeps the question ids and chosen options of its attempt (one
+byte per question, like grading.read_answers()). For a quiz, the scores are
+grouped by question layout and each group's answer vectors are laid end to
+end in one buffer, so a question's column is a strided slice and counting
+how often each option was picked is a C-level bytes.count(); the Python work
+is per question per layout, not per answer. An unsampled quiz has one layout
+(two or three after edits), so the cost barely grows with attempts. Drawn
+quizzes give every attempt its own layout and cost O(sample size) each.
+
+For each question:
+
+* p-value - the share of attempts that got it right under the current key
+* discrimination - upper-minus-lower index: the p-value among the top 27%
+  of attempts by score minus that among the bottom 27%
+* choices - how often each option (and no answer) was picked
+
+Results are cached under the quiz's QuizStat attempt count and a digest of
+its answer key (question ids and correct options), so they are recomputed
+once new attempts arrive or the questions or their keys change. Scores written before answers were stored are skipped.
+"""
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from attempts import key_digest
+from extension import cache
+from grading import get_answer_key
+from models import db, Score, QuizStat
+
+GROUP_SHARE = 0.27  # of attempts in each of the upper and lower groups
+MIN_ATTEMPTS = 10  # below this a question is not flagged
+EASY, HARD = 0.9, 0.2  # p-values
+WEAK_DISCRIMINATION = 0.2
+OPTIONS = 5  # 0 (no answer) and 1-4
+
+ItemStat = namedtuple("ItemStat", "question_id correct_option attempts p_value discrimination choices flags")
+QuizItems = namedtuple("QuizItems", "attempts items")
+
+
+def items_key(quiz_id, attempts, digest):
+    return f"quiz:{quiz_id}:items:{attempts}:{digest}"
+
+
+def answer_key_digest(key):
+    # attempts.key_digest() covers the question ids only; a fixed correct_option must change the key too
+    return zlib.crc32(key.correct, key_digest(key))
+
+
+def flags(correct_option, attempts, p_value, discrimination, choices):
+    if attempts < MIN_ATTEMPTS:
+        return []
+    found = []
+    if p_value >= EASY:
+        found.append("too easy")
+    elif p_value <= HARD:
+        found.append("too hard")
+    if discrimination is not None:
+        if discrimination < 0:
+            found.append("negative discrimination: check the key")
+        elif discrimination < WEAK_DISCRIMINATION:
+            found.append("weak discrimination")
+    if 1 <= correct_option <= 4 and any(
+        choices[option] > choices[correct_option] for option in range(1, OPTIONS) if option != correct_option
+    ):
+        found.append("a distractor beats the key")
+    return found
+
+
+def _load(quiz_id):
+    """Score rows grouped by layout: {question_ids blob: [(fraction, answers), ...]}."""
+    layouts = {}
+    for question_ids, answers, total in db.session.execute(
+        db.select(Score.question_ids, Score.answers, Score.total_scored)
+        .where(Score.quiz_id == quiz_id, Score.answers.isnot(None))
+    ):
+        if answers and question_ids and len(question_ids) == 8 * len(answers):
+            layouts.setdefault(question_ids, []).append((total / len(answers), answers))
+    return layouts
+
+
+def _groups(layouts):
+    """(lower, upper) sets of (layout, row index) for the bottom and top GROUP_SHARE by score."""
+    ranked = sorted(
+        ((fraction, layout, i) for layout, rows in layouts.items() for i, (fraction, _) in enumerate(rows)),
+        key=lambda row: row[0],
+    )
+    size = int(len(ranked) * GROUP_SHARE)
+    if not size:
+        return set(), set()
+    return {row[1:] for row in ranked[:size]}, {row[1:] for row in ranked[-size:]}
+
+
+def analyze(quiz_id, key):
+    """Item statistics for every question in `key` from the quiz's stored answers."""
+    layouts = _load(quiz_id)
+    lower, upper = _groups(layouts)
+    count = len(key)
+    seen, right = array("l", bytes(8 * count)), array("l", bytes(8 * count))
+    upper_seen, upper_right = array("l", bytes(8 * count)), array("l", bytes(8 * count))
+    lower_seen, lower_right = array("l", bytes(8 * count)), array("l", bytes(8 * count))
+    picks = array("l", bytes(8 * count * OPTIONS))
+
+    ids = key.question_ids
+    for blob, rows in layouts.items():
+        layout = array("q")
+        layout.frombytes(blob)
+        width = len(layout)
+        every = b"".join(answers for _, answers in rows)
+        top = b"".join(answers for i, (_, answers) in enumerate(rows) if (blob, i) in upper)
+        bottom = b"".join(answers for i, (_, answers) in enumerate(rows) if (blob, i) in lower)
+        for column, question_id in enumerate(layout):
+            index = bisect_left(ids, question_id)
+            if index == count or ids[index] != question_id:
+                continue  # deleted since
+            correct = key.correct[index]
+            answers = every[column::width]
+            seen[index] += len(answers)
+            for option in range(OPTIONS):
+                picks[index * OPTIONS + option] += answers.count(option)
+            right[index] += answers.count(correct)
+            answers = top[column::width]
+            upper_seen[index] += len(answers)
+            upper_right[index] += answers.count(correct)
+            answers = bottom[column::width]
+            lower_seen[index] += len(answers)
+            lower_right[index] += answers.count(correct)
+
+    items = []
+    for index in range(count):
+        attempts = seen[index]
+        correct = key.correct[index]
+        choices = tuple(
+            round(picks[index * OPTIONS + option] / attempts, 3) if attempts else 0.0 for option in range(OPTIONS)
+        )
+        p_value = round(right[index] / attempts, 3) if attempts else None
+        discrimination = None
+        if upper_seen[index] and lower_seen[index]:
+            discrimination = round(
+                upper_right[index] / upper_seen[index] - lower_right[index] / lower_seen[index], 3
+            )
+        items.append(ItemStat(
+            ids[index], correct, attempts, p_value, discrimination, choices,
+            flags(correct, attempts, p_value, discrimination, choices) if attempts else [],
+        ))
+    return QuizItems(sum(len(rows) for rows in layouts.values()), items)
+
+
+def quiz_items(quiz_id):
+    """The cached item analysis of a quiz, or None if it doesn't exist."""
+    key = get_answer_key(quiz_id)
+    if key is None:
+        return None
+    attempts = db.session.execute(db.select(QuizStat.attempts).where(QuizStat.quiz_id == quiz_id)).scalar() or 0
+    return cache.get_or_set(
+        items_key(quiz_id, attempts, answer_key_digest(key)), lambda: analyze(quiz_id, key),
+        ttl=current_app.config.get("ITEM_ANALYSIS_CACHE_TTL", 86400),
+    )
+
+
+items_cli = AppGroup("items", help="Per-question item analysis.")
+
+
+@items_cli.command("report")
+@click.argument("quiz_id", type=int)
+def report_command(quiz_id):
+    """Print each question's p-value, discrimination and option choices."""
+    report = quiz_items(quiz_id)
+    if report is None:
+        raise click.ClickException(f"No quiz {quiz_id}.")
+    click.echo(f"{report.attempts} attempts with stored answers.")
+    click.echo(f"{'question':>9} {'key':>4} {'n':>6} {'p':>6} {'D':>6}  none/A/B/C/D picked")
+    for item in report.items:
+        p_value = "-" if item.p_value is None else f"{item.p_value:.2f}"
+        discrimination = "-" if item.discrimination is None else f"{item.discrimination:+.2f}"
+        choices = "/".join(f"{share:.0%}" for share in item.choices)
+        click.echo(f"{item.question_id:>9} {item.correct_option:>4} {item.attempts:>6} {p_value:>6} "
+                   f"{discrimination:>6}  {choices}  {'; '.join(item.flags)}")
@@ -0,0 +1,259 @@
+"""Background jobs for heavy admin operations (bulk deletes).
+
+Deleting a subject, quiz or user used to run in the request and lean on ORM
+cascades that loaded every child row. Now the request only inserts a Job
+row; a worker thread claims it and deletes children bottom-up with
+set-based DELETEs in chunks of JOBS_CHUNK_SIZE rows, one short transaction
+per chunk so quiz submissions are never blocked for long. Each chunk of
+Score rows is subtracted from the rollups and leaderboards in the same
+transaction that deletes it, so only the entries those scores touched are
+recomputed. Progress and a heartbeat are written to the job row with every
+chunk, and the caches are invalidated at the end.
+
+The job table is shared by every process. A worker claims a job with a
+conditional UPDATE, and a job whose heartbeat is older than
+JOBS_STALE_SECONDS (its process died) can be claimed again; every step is
+idempotent, so it simply carries on. Worker threads start when a job is
+enqueued or the jobs page is opened and exit once the queue is empty.
+"""
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+
+import leaderboard
+import stats
+from http_cache import catalog_version
+from models import db, Job, Subject, Chapter, Quiz, Question, Score, QuizAttempt, User
+from quiz_cache import invalidate_quizzes
+from user_cache import user_cache
+
+# Delete `model` rows whose `column` is in `ids`
+Step = namedtuple("Step", "model column ids")
+ID_GROUP = 500  # ids per IN list
+
+
+def _groups(ids):
+    for start in range(0, len(ids), ID_GROUP):
+        yield ids[start:start + ID_GROUP]
+
+
+def quiz_steps(quiz_ids):
+    steps = []
+    for ids in _groups(quiz_ids):
+        steps += [
+            Step(QuizAttempt, QuizAttempt.quiz_id, ids),
+            Step(Score, Score.quiz_id, ids),
+            Step(Question, Question.quiz_id, ids),
+            Step(Quiz, Quiz.id, ids),
+            # Submissions that raced the deletes above
+            Step(QuizAttempt, QuizAttempt.quiz_id, ids),
+            Step(Score, Score.quiz_id, ids),
+        ]
+    return steps
+
+
+def plan_subject(subject_id):
+    quiz_ids = db.session.scalars(db.select(Quiz.id).where(Quiz.subject_id == subject_id)).all()
+    steps = quiz_steps(quiz_ids) + [
+        Step(Chapter, Chapter.subject_id, [subject_id]),
+        Step(Subject, Subject.id, [subject_id]),
+    ]
+    return steps, lambda: invalidate_quizzes(quiz_ids)
+
+
+def plan_quiz(quiz_id):
+    return quiz_steps([quiz_id]), lambda: invalidate_quizzes([quiz_id])
+
+
+def plan_user(user_id):
+    steps = [
+        Step(QuizAttempt, QuizAttempt.user_id, [user_id]),
+        Step(Score, Score.user_id, [user_id]),
+        Step(User, User.id, [user_id]),
+    ]
+    return steps, lambda: user_cache.invalidate(user_id)
+
+
+PLANS = {
+    "delete_subject": plan_subject,
+    "delete_quiz": plan_quiz,
+    "delete_user": plan_user,
+}
+
+
+def count_rows(step):
+    return db.session.scalar(db.select(db.func.count()).select_from(step.model).where(step.column.in_(step.ids)))
+
+
+def job_json(job):
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "target_id": job.target_id,
+        "label": job.label,
+        "status": job.status,
+        "done": job.done,
+        "total": job.total,
+        "percent": 100 if job.status == "done" else min(99, job.done * 100 // job.total) if job.total else 0,
+        "message": job.message,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class JobRunner:
+    def __init__(self, app=None):
+        self.app = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()  # set when jobs may have been queued since the last claim
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.chunk_size = app.config.get("JOBS_CHUNK_SIZE", 1000)
+        self.stale_after = timedelta(seconds=app.config.get("JOBS_STALE_SECONDS", 300))
+        self.run_inline = app.config.get("JOBS_RUN_INLINE", False)
+        app.extensions["jobs"] = self
+
+    def enqueue(self, kind, target_id, label="", created_by=None):
+        """Queues a job (or returns the pending one for the same target) and wakes a worker."""
+        if kind not in PLANS:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        job = db.session.scalars(
+            db.select(Job).where(Job.kind == kind, Job.target_id == target_id,
+                                 Job.status.in_(("queued", "running")))
+        ).first()
+        if job is None:
+            job = Job(kind=kind, target_id=target_id, label=label, created_by=created_by, created_at=datetime.now())
+            db.session.add(job)
+            db.session.commit()
+        if self.run_inline:
+            self.run_pending()
+        else:
+            self.ensure_worker()
+        return job
+
+    def ensure_worker(self):
+        # Threads don't survive fork, so each worker process starts its own
+        with self._lock:
+            self._wake.set()
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="job-runner", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        with self.app.app_context():
+            try:
+                while True:
+                    self._wake.clear()
+                    self.run_pending()
+                    # A job queued after the last claim found nothing has set the event; exiting
+                    # here would strand it, since ensure_worker() saw this thread still alive
+                    with self._lock:
+                        if not self._wake.is_set():
+                            self._thread = None
+                            return
+            finally:
+                db.session.remove()
+
+    def run_pending(self):
+        """Runs claimable jobs one after another until none are left; returns how many ran."""
+        ran = 0
+        while True:
+            job = self.claim()
+            if job is None:
+                return ran
+            self.run(job)
+            ran += 1
+
+    def _claimable(self, now):
+        return db.or_(
+            Job.status == "queued",
+            db.and_(Job.status == "running", Job.heartbeat_at < now - self.stale_after),
+        )
+
+    def claim(self):
+        now = datetime.now()
+        job_id = db.session.scalar(db.select(Job.id).where(self._claimable(now)).order_by(Job.id).limit(1))
+        if job_id is None:
+            return None
+        claimed = db.session.execute(
+            db.update(Job)
+            .where(Job.id == job_id, self._claimable(now))
+            .values(status="running", started_at=db.func.coalesce(Job.started_at, now), heartbeat_at=now)
+        ).rowcount
+        db.session.commit()
+        if not claimed:  # another process got there first
+            return self.claim()
+        return db.session.get(Job, job_id, populate_existing=True)
+
+    def run(self, job):
+        try:
+            steps, invalidate = PLANS[job.kind](job.target_id)
+            # Sweep steps repeat earlier ones; count each set of rows once
+            distinct = {(step.model, step.column.key, tuple(step.ids)): step for step in steps}
+            job.total = job.done + sum(count_rows(step) for step in distinct.values())
+            db.session.commit()
+            for step in steps:
+                self._delete(job, step)
+
+            job.status = "done"
+            job.finished_at = datetime.now()
+            db.session.commit()
+            invalidate()
+            leaderboard.leaderboards.clear()
+            catalog_version.bump()
+        except Exception as exc:
+            db.session.rollback()
+            self.app.logger.exception("Job %s (%s %s) failed", job.id, job.kind, job.target_id)
+            job.status = "failed"
+            job.message = str(exc)[:1000]
+            job.finished_at = datetime.now()
+            db.session.commit()
+
+    def _delete(self, job, step):
+        pk = step.model.id
+        while True:
+            ids = db.session.scalars(
+                db.select(pk).where(step.column.in_(step.ids)).limit(self.chunk_size)
+            ).all()
+            if not ids:
+                return
+            if step.model is Score:
+                for stmt in stats.removal_statements(ids) + leaderboard.removal_statements(ids):
+                    db.session.execute(stmt)
+            deleted = db.session.execute(db.delete(step.model).where(pk.in_(ids))).rowcount
+            job.done += deleted
+            job.heartbeat_at = datetime.now()
+            db.session.commit()
+
+
+jobs = JobRunner()
+
+
+jobs_cli = AppGroup("jobs", help="Inspect and run background jobs.")
+
+
+@jobs_cli.command("run")
+def run_command():
+    """Run every queued (or stalled) job in this process."""
+    click.echo(f"Ran {jobs.run_pending()} jobs.")
+
+
+@jobs_cli.command("list")
+@click.option("--limit", default=20, show_default=True)
+def list_command(limit):
+    """Show the most recent jobs."""
+    for job in db.session.scalars(db.select(Job).order_by(Job.id.desc()).limit(limit)):
+        info = job_json(job)
+        click.echo(f"#{job.id} {job.status:<8} {info['percent']:>3}% {job.kind} {job.label}"
+                   + (f" — {job.message}" if job.message else ""))
@@ -0,0 +1,224 @@
+"""Per-quiz and per-subject leaderboards.
+
+QuizLeaderboard keeps each user's best score on a quiz and SubjectLeaderboard
+the sum of their per-quiz bests in a subject. Both are upserted in the same
+transaction as the Score row, so nothing ever rescans attempts.
+
+Each process also keeps a sorted (score, user) list per board it has served,
+so rank and percentile lookups are a bisect instead of a COUNT over the
+table. A board is tagged with the QuizStat/SubjectStat attempt count it was
+loaded at; local writes advance it in place and a mismatch (another worker
+wrote, or the stats were rebuilt) reloads the board from its table.
+"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, Quiz, Score, QuizStat, SubjectStat, QuizLeaderboard, SubjectLeaderboard
+
+KINDS = {
+    "quiz": (QuizLeaderboard, QuizLeaderboard.quiz_id, QuizStat, QuizStat.quiz_id),
+    "subject": (SubjectLeaderboard, SubjectLeaderboard.subject_id, SubjectStat, SubjectStat.subject_id),
+}
+
+
+def attempt_statements(user_id, quiz_id, subject_id, total_scored):
+    """The leaderboard upserts for one new attempt, for any session to execute.
+
+    The subject statement must run first: it adds how much the attempt beats
+    the user's previous best on the quiz, which the second statement raises.
+    """
+    previous = (
+        db.select(QuizLeaderboard.score)
+        .where(QuizLeaderboard.quiz_id == quiz_id, QuizLeaderboard.user_id == user_id)
+        .scalar_subquery()
+    )
+    gain = db.func.max(0, total_scored - db.func.coalesce(previous, 0))
+    subject = insert(SubjectLeaderboard).values(subject_id=subject_id, user_id=user_id, score=gain)
+    subject = subject.on_conflict_do_update(
+        index_elements=["subject_id", "user_id"],
+        set_={"score": SubjectLeaderboard.score + subject.excluded.score},
+    )
+    quiz = insert(QuizLeaderboard).values(quiz_id=quiz_id, user_id=user_id, score=total_scored)
+    quiz = quiz.on_conflict_do_update(
+        index_elements=["quiz_id", "user_id"],
+        set_={"score": db.func.max(QuizLeaderboard.score, quiz.excluded.score)},
+    )
+    return [subject, quiz]
+
+
+def record_attempt(user_id, quiz_id, subject_id, total_scored):
+    """Applies one attempt to the leaderboard tables; the caller commits."""
+    for stmt in attempt_statements(user_id, quiz_id, subject_id, total_scored):
+        db.session.execute(stmt)
+
+
+def rebuild():
+    """Recomputes both leaderboard tables from Score; the caller commits."""
+    db.session.execute(db.delete(QuizLeaderboard))
+    db.session.execute(db.delete(SubjectLeaderboard))
+    best = (
+        db.select(Score.quiz_id, Score.user_id, db.func.max(Score.total_scored))
+        .join(Quiz, Quiz.id == Score.quiz_id)
+        .group_by(Score.quiz_id, Score.user_id)
+    )
+    db.session.execute(db.insert(QuizLeaderboard).from_select(["quiz_id", "user_id", "score"], best))
+    per_subject = (
+        db.select(Quiz.subject_id, QuizLeaderboard.user_id, db.func.sum(QuizLeaderboard.score))
+        .join(Quiz, Quiz.id == QuizLeaderboard.quiz_id)
+        .group_by(Quiz.subject_id, QuizLeaderboard.user_id)
+    )
+    db.session.execute(db.insert(SubjectLeaderboard).from_select(["subject_id", "user_id", "score"], per_subject))
+    leaderboards.clear()
+
+
+def removal_statements(score_ids):
+    """Statements that take the Score rows `score_ids` out of both leaderboards.
+
+    Run them before deleting those rows, in the same transaction. Only the
+    (quiz, user) and (subject, user) entries those scores belong to are
+    recomputed, from the scores that remain.
+    """
+    quiz_pairs = db.select(Score.quiz_id, Score.user_id).where(Score.id.in_(score_ids)).distinct().subquery()
+    subject_pairs = (
+        db.select(Quiz.subject_id, Score.user_id)
+        .join(Quiz, Quiz.id == Score.quiz_id)
+        .where(Score.id.in_(score_ids))
+        .distinct()
+        .subquery()
+    )
+    best = (
+        db.select(Score.quiz_id, Score.user_id, db.func.max(Score.total_scored))
+        .join(Quiz, Quiz.id == Score.quiz_id)
+        .join(quiz_pairs, db.and_(quiz_pairs.c.quiz_id == Score.quiz_id, quiz_pairs.c.user_id == Score.user_id))
+        .where(Score.id.not_in(score_ids))
+        .group_by(Score.quiz_id, Score.user_id)
+    )
+    per_subject = (
+        db.select(Quiz.subject_id, QuizLeaderboard.user_id, db.func.sum(QuizLeaderboard.score))
+        .join(Quiz, Quiz.id == QuizLeaderboard.quiz_id)
+        .join(subject_pairs, db.and_(subject_pairs.c.subject_id == Quiz.subject_id,
+                                     subject_pairs.c.user_id == QuizLeaderboard.user_id))
+        .group_by(Quiz.subject_id, QuizLeaderboard.user_id)
+    )
+    return [
+        db.delete(QuizLeaderboard).where(
+            db.tuple_(QuizLeaderboard.quiz_id, QuizLeaderboard.user_id).in_(db.select(quiz_pairs))),
+        db.insert(QuizLeaderboard).from_select(["quiz_id", "user_id", "score"], best),
+        db.delete(SubjectLeaderboard).where(
+            db.tuple_(SubjectLeaderboard.subject_id, SubjectLeaderboard.user_id).in_(db.select(subject_pairs))),
+        db.insert(SubjectLeaderboard).from_select(["subject_id", "user_id", "score"], per_subject),
+    ]
+
+
+class Board:
+    """One leaderboard as a list of (-score, user_id) kept sorted."""
+
+    __slots__ = ("version", "entries", "scores")
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.scores = dict(rows)
+        self.entries = sorted((-score, user_id) for user_id, score in self.scores.items())
+
+    def __len__(self):
+        return len(self.entries)
+
+    def update(self, user_id, score):
+        old = self.scores.get(user_id)
+        if old is not None:
+            del self.entries[bisect_left(self.entries, (-old, user_id))]
+        self.scores[user_id] = score
+        insort(self.entries, (-score, user_id))
+
+    def rank(self, score):
+        """1 + the number of users strictly ahead; ties share a rank."""
+        return bisect_left(self.entries, (-score,)) + 1
+
+    def percentile(self, score):
+        """Percentile rank: users below plus half of those tied, out of everyone."""
+        ahead = bisect_left(self.entries, (-score,))
+        tied = bisect_right(self.entries, (-score, float("inf"))) - ahead
+        below = len(self.entries) - ahead - tied
+        return round(100.0 * (below + tied / 2) / len(self.entries), 1)
+
+    def top(self, limit):
+        return [(self.rank(-neg), user_id, -neg) for neg, user_id in self.entries[:limit]]
+
+
+class Leaderboards:
+    def __init__(self, app=None):
+        self.app = None
+        self.max_boards = 256
+        self._boards = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_boards = app.config.get("LEADERBOARD_MAX_BOARDS", 256)
+        app.extensions["leaderboards"] = self
+
+    def board(self, kind, board_id):
+        """The up-to-date Board for a quiz or subject (one PK lookup when cached)."""
+        model, key, stat, stat_key = KINDS[kind]
+        version = db.session.query(stat.attempts).filter(stat_key == board_id).scalar() or 0
+        with self._lock:
+            board = self._boards.get((kind, board_id))
+            if board is not None and board.version == version:
+                self._boards.move_to_end((kind, board_id))
+                return board
+        rows = db.session.query(model.user_id, model.score).filter(key == board_id).all()
+        board = Board(version, rows)
+        with self._lock:
+            self._boards[(kind, board_id)] = board
+            while len(self._boards) > self.max_boards:
+                self._boards.popitem(last=False)
+        return board
+
+    def record(self, submissions):
+        """Advances cached boards after `submissions` were committed."""
+        with self._lock:
+            for s in submissions:
+                quiz = self._boards.get(("quiz", s.quiz_id))
+                previous = None
+                if quiz is not None:
+                    previous = quiz.scores.get(s.user_id)
+                    if previous is None or s.total_scored > previous:
+                        quiz.update(s.user_id, s.total_scored)
+                    quiz.version += 1
+                subject_key = ("subject", s.subject_id)
+                subject = self._boards.get(subject_key)
+                if subject is None:
+                    continue
+                if quiz is None:
+                    # The gain depends on the old quiz best, which isn't cached here
+                    del self._boards[subject_key]
+                    continue
+                gain = max(0, s.total_scored - (previous or 0))
+                if gain or s.user_id not in subject.scores:
+                    subject.update(s.user_id, subject.scores.get(s.user_id, 0) + gain)
+                subject.version += 1
+
+    def clear(self):
+        with self._lock:
+            self._boards.clear()
+
+
+leaderboards = Leaderboards()
+
+
+leaderboard_cli = AppGroup("leaderboard", help="Maintain the quiz and subject leaderboards.")
+
+
+@leaderboard_cli.command("rebuild")
+def rebuild_command():
+    """Recompute the leaderboards from the Score table."""
+    rebuild()
+    db.session.commit()
+    click.echo("Leaderboards rebuilt.")
@@ -0,0 +1,39 @@
+"""Index the foreign-key and ordering columns used by the list pages
+
+Revision ID: 0001_hot_path_indexes
+Revises:
+Create Date: 2026-10-18
+
+Databases created by db.create_all() before these indexes existed only get
+them through this migration; fresh databases already have them, hence
+if_not_exists.
+"""
+from alembic import op
+
+
+revision = '0001_hot_path_indexes'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_chapter_subject_id', 'chapter', ['subject_id']),
+    ('ix_quiz_date_of_quiz', 'quiz', ['date_of_quiz']),
+    ('ix_quiz_subject_id', 'quiz', ['subject_id']),
+    ('ix_quiz_chapter_id', 'quiz', ['chapter_id']),
+    ('ix_question_quiz_id', 'question', ['quiz_id']),
+    ('ix_score_user_id_timestamp', 'score', ['user_id', 'timestamp']),
+    ('ix_score_quiz_id', 'score', ['quiz_id']),
+    ('ix_score_timestamp', 'score', ['timestamp']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,53 @@
+"""Add the quiz and subject leaderboard tables
+
+Revision ID: 0002_leaderboards
+Revises: 0001_hot_path_indexes
+Create Date: 2026-10-18
+
+Both boards are filled from the existing scores, the same as `flask
+leaderboard rebuild`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002_leaderboards'
+down_revision = '0001_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'quiz_leaderboard',
+        sa.Column('quiz_id', sa.Integer(), sa.ForeignKey('quiz.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('score', sa.Integer(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index('ix_quiz_leaderboard_quiz_id_score', 'quiz_leaderboard', ['quiz_id', 'score'], if_not_exists=True)
+    op.create_table(
+        'subject_leaderboard',
+        sa.Column('subject_id', sa.Integer(), sa.ForeignKey('subject.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('score', sa.Integer(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index('ix_subject_leaderboard_subject_id_score', 'subject_leaderboard', ['subject_id', 'score'],
+                    if_not_exists=True)
+    op.execute("DELETE FROM quiz_leaderboard")
+    op.execute("INSERT INTO quiz_leaderboard (quiz_id, user_id, score) "
+               "SELECT score.quiz_id, score.user_id, max(score.total_scored) "
+               "FROM score JOIN quiz ON quiz.id = score.quiz_id GROUP BY score.quiz_id, score.user_id")
+    op.execute("DELETE FROM subject_leaderboard")
+    op.execute("INSERT INTO subject_leaderboard (subject_id, user_id, score) "
+               "SELECT quiz.subject_id, quiz_leaderboard.user_id, sum(quiz_leaderboard.score) "
+               "FROM quiz_leaderboard JOIN quiz ON quiz.id = quiz_leaderboard.quiz_id "
+               "GROUP BY quiz.subject_id, quiz_leaderboard.user_id")
+
+
+def downgrade():
+    op.drop_index('ix_subject_leaderboard_subject_id_score', table_name='subject_leaderboard', if_exists=True)
+    op.drop_table('subject_leaderboard')
+    op.drop_index('ix_quiz_leaderboard_quiz_id_score', table_name='quiz_leaderboard', if_exists=True)
+    op.drop_table('quiz_leaderboard')
@@ -0,0 +1,37 @@
+"""Add quiz_attempt for server-side, resumable quiz attempts
+
+Revision ID: 0003_quiz_attempts
+Revises: 0002_leaderboards
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003_quiz_attempts'
+down_revision = '0002_leaderboards'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'quiz_attempt',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('quiz_id', sa.Integer(), sa.ForeignKey('quiz.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('deadline', sa.DateTime(), nullable=False),
+        sa.Column('answers', sa.LargeBinary(), nullable=False),
+        sa.Column('key_digest', sa.Integer(), nullable=False),
+        sa.Column('saved_at', sa.DateTime(), nullable=True),
+        sa.Column('submitted_at', sa.DateTime(), nullable=True),
+        if_not_exists=True,
+    )
+    op.create_index('ix_quiz_attempt_user_id_quiz_id_submitted_at', 'quiz_attempt',
+                    ['user_id', 'quiz_id', 'submitted_at'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_quiz_attempt_user_id_quiz_id_submitted_at', table_name='quiz_attempt', if_exists=True)
+    op.drop_table('quiz_attempt')
@@ -0,0 +1,42 @@
+"""Add job for background bulk deletes, and index quiz_attempt by quiz
+
+Revision ID: 0004_jobs
+Revises: 0003_quiz_attempts
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004_jobs'
+down_revision = '0003_quiz_attempts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'job',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(length=32), nullable=False),
+        sa.Column('target_id', sa.Integer(), nullable=False),
+        sa.Column('label', sa.String(length=200), nullable=False),
+        sa.Column('status', sa.String(length=10), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('done', sa.Integer(), nullable=False),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        if_not_exists=True,
+    )
+    op.create_index('ix_job_status_id', 'job', ['status', 'id'], if_not_exists=True)
+    op.create_index('ix_quiz_attempt_quiz_id', 'quiz_attempt', ['quiz_id'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_quiz_attempt_quiz_id', table_name='quiz_attempt', if_exists=True)
+    op.drop_index('ix_job_status_id', table_name='job', if_exists=True)
+    op.drop_table('job')
@@ -0,0 +1,40 @@
+"""Add the question_fts full-text index and the triggers that maintain it
+
+Revision ID: 0005_question_fts
+Revises: 0004_jobs
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = '0005_question_fts'
+down_revision = '0004_jobs'
+branch_labels = None
+depends_on = None
+
+COLUMNS = "question_statement, option1, option2, option3, option4"
+NEW = ", ".join(f"new.{c}" for c in COLUMNS.split(", "))
+OLD = ", ".join(f"old.{c}" for c in COLUMNS.split(", "))
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS question_fts USING fts5({COLUMNS}, "
+               f"content='question', content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+    op.execute(f"CREATE TRIGGER IF NOT EXISTS question_fts_ai AFTER INSERT ON question BEGIN "
+               f"INSERT INTO question_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW}); END")
+    op.execute(f"CREATE TRIGGER IF NOT EXISTS question_fts_ad AFTER DELETE ON question BEGIN "
+               f"INSERT INTO question_fts(question_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD}); END")
+    op.execute(f"CREATE TRIGGER IF NOT EXISTS question_fts_au AFTER UPDATE ON question BEGIN "
+               f"INSERT INTO question_fts(question_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD}); "
+               f"INSERT INTO question_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW}); END")
+    op.execute("INSERT INTO question_fts(question_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for trigger in ('question_fts_ai', 'question_fts_ad', 'question_fts_au'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS question_fts")
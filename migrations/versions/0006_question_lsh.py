@@ -0,0 +1,37 @@
+"""Add question_lsh (MinHash LSH buckets for near-duplicate detection)
+
+Populate it afterwards with `flask dedup rebuild`.
+
+Revision ID: 0006_question_lsh
+Revises: 0005_question_fts
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006_question_lsh'
+down_revision = '0005_question_fts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'question_lsh',
+        sa.Column('band', sa.SmallInteger(), primary_key=True),
+        sa.Column('bucket', sa.BigInteger(), primary_key=True),
+        sa.Column('question_id', sa.Integer(), sa.ForeignKey('question.id', ondelete='CASCADE'), primary_key=True),
+        if_not_exists=True,
+    )
+    op.create_index('ix_question_lsh_question_id', 'question_lsh', ['question_id'], if_not_exists=True)
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("CREATE TRIGGER IF NOT EXISTS question_lsh_ad AFTER DELETE ON question BEGIN "
+                   "DELETE FROM question_lsh WHERE question_id = old.id; END")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS question_lsh_ad")
+    op.drop_index('ix_question_lsh_question_id', table_name='question_lsh', if_exists=True)
+    op.drop_table('question_lsh')
@@ -0,0 +1,28 @@
+"""Add quiz.sample_size and the drawn question set of an attempt
+
+Revision ID: 0007_quiz_sampling
+Revises: 0006_question_lsh
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007_quiz_sampling'
+down_revision = '0006_question_lsh'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('quiz', sa.Column('sample_size', sa.Integer(), nullable=True))
+    op.add_column('quiz_attempt', sa.Column('question_ids', sa.LargeBinary(), nullable=True))
+    op.add_column('quiz_attempt', sa.Column('seed', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('quiz_attempt') as batch:
+        batch.drop_column('seed')
+        batch.drop_column('question_ids')
+    with op.batch_alter_table('quiz') as batch:
+        batch.drop_column('sample_size')
@@ -0,0 +1,25 @@
+"""Keep each score's question ids and chosen options for item analysis
+
+Revision ID: 0008_score_answers
+Revises: 0007_quiz_sampling
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008_score_answers'
+down_revision = '0007_quiz_sampling'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('score', sa.Column('question_ids', sa.LargeBinary(), nullable=True))
+    op.add_column('score', sa.Column('answers', sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('score') as batch:
+        batch.drop_column('answers')
+        batch.drop_column('question_ids')
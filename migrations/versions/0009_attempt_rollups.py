@@ -0,0 +1,73 @@
+"""Add the attempt rollup tables and fill them from score
+
+Revision ID: 0009_attempt_rollups
+Revises: 0008_score_answers
+Create Date: 2026-10-18
+
+The rollups (see stats.py) are recomputed from every existing score, the
+same as `flask stats rebuild`, so a database that already has them from
+db.create_all() ends up with the same rows.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0009_attempt_rollups'
+down_revision = '0008_score_answers'
+branch_labels = None
+depends_on = None
+
+TOTALS = "count(score.id), sum(score.total_scored), max(score.total_scored)"
+SCORES = "FROM score JOIN quiz ON quiz.id = score.quiz_id WHERE score.timestamp IS NOT NULL"
+BACKFILL = [
+    ('subject_stat', 'subject_id', 'quiz.subject_id'),
+    ('quiz_stat', 'quiz_id', 'score.quiz_id'),
+    ('user_subject_stat', 'user_id, subject_id', 'score.user_id, quiz.subject_id'),
+    ('user_month_stat', 'user_id, month', "score.user_id, strftime('%Y-%m', score.timestamp)"),
+]
+
+
+def totals():
+    return [
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('total_score', sa.Integer(), nullable=False),
+        sa.Column('max_score', sa.Integer(), nullable=False),
+    ]
+
+
+def upgrade():
+    op.create_table(
+        'subject_stat',
+        sa.Column('subject_id', sa.Integer(), sa.ForeignKey('subject.id', ondelete='CASCADE'), primary_key=True),
+        *totals(),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'quiz_stat',
+        sa.Column('quiz_id', sa.Integer(), sa.ForeignKey('quiz.id', ondelete='CASCADE'), primary_key=True),
+        *totals(),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'user_subject_stat',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('subject_id', sa.Integer(), sa.ForeignKey('subject.id', ondelete='CASCADE'), primary_key=True),
+        *totals(),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'user_month_stat',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('month', sa.String(length=7), primary_key=True),
+        *totals(),
+        if_not_exists=True,
+    )
+    for table, keys, columns in BACKFILL:
+        op.execute(f"DELETE FROM {table}")
+        op.execute(f"INSERT INTO {table} ({keys}, attempts, total_score, max_score) "
+                   f"SELECT {columns}, {TOTALS} {SCORES} GROUP BY {columns}")
+
+
+def downgrade():
+    for table, _, _ in reversed(BACKFILL):
+        op.drop_table(table)
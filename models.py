@@ -35,15 +35,25 @@ class Chapter(db.Model):
     description = db.Column(db.Text)
     quizzes = db.relationship('Quiz', backref='chapter', lazy='dynamic')
 
+    __table_args__ = (
+        db.Index('ix_chapter_subject_id', 'subject_id'),
+    )
+
 class Quiz(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
     chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
     date_of_quiz = db.Column(db.Date, nullable=False)
     time_duration = db.Column(db.String(5), nullable=False)
+    sample_size = db.Column(db.Integer, nullable=True)  # questions drawn per attempt (attempts.py); None = all
     questions = db.relationship('Question', backref='quiz', cascade="all, delete-orphan", lazy=True)
-    
-    
+
+    __table_args__ = (
+        # Dashboard ordering (date_of_quiz DESC, id DESC); id rides along as the rowid
+        db.Index('ix_quiz_date_of_quiz', 'date_of_quiz'),
+        db.Index('ix_quiz_subject_id', 'subject_id'),
+        db.Index('ix_quiz_chapter_id', 'chapter_id'),
+    )
 
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -55,11 +65,138 @@ class Question(db.Model):
     option4 = db.Column(db.String(100), nullable=False)
     correct_option = db.Column(db.Integer, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_question_quiz_id', 'quiz_id'),
+    )
+
 class Score(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete="CASCADE"), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     total_scored = db.Column(db.Integer, nullable=False)
+    # The graded attempt, for item analysis: question ids (packed int64) and the
+    # chosen option per question (one byte, 0 unanswered) in the order shown
+    question_ids = db.Column(db.LargeBinary, nullable=True)
+    answers = db.Column(db.LargeBinary, nullable=True)
     date_attempted = db.Column(db.Date, default=datetime.utcnow().date())
     quiz = db.relationship('Quiz', backref='scores', lazy=True)
+
+    __table_args__ = (
+        # A user's attempts newest first (scores, summary, dashboard badges)
+        db.Index('ix_score_user_id_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_score_quiz_id', 'quiz_id'),
+        db.Index('ix_score_timestamp', 'timestamp'),
+    )
+
+
+# Rollups maintained by stats.py; they let the summary pages read one row per
+# subject/month instead of scanning every Score.
+class SubjectStat(db.Model):
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id', ondelete="CASCADE"), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    total_score = db.Column(db.Integer, nullable=False, default=0)
+    max_score = db.Column(db.Integer, nullable=False, default=0)
+
+class QuizStat(db.Model):
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete="CASCADE"), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    total_score = db.Column(db.Integer, nullable=False, default=0)
+    max_score = db.Column(db.Integer, nullable=False, default=0)
+
+class UserSubjectStat(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id', ondelete="CASCADE"), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    total_score = db.Column(db.Integer, nullable=False, default=0)
+    max_score = db.Column(db.Integer, nullable=False, default=0)
+
+class UserMonthStat(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # "YYYY-MM"
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    total_score = db.Column(db.Integer, nullable=False, default=0)
+    max_score = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Best results maintained by leaderboard.py: a user's best score per quiz and
+# the sum of their per-quiz bests per subject.
+class QuizLeaderboard(db.Model):
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete="CASCADE"), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), primary_key=True)
+    score = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_quiz_leaderboard_quiz_id_score', 'quiz_id', 'score'),
+    )
+
+class SubjectLeaderboard(db.Model):
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id', ondelete="CASCADE"), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), primary_key=True)
+    score = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_subject_leaderboard_subject_id_score', 'subject_id', 'score'),
+    )
+
+
+# A quiz in progress (see attempts.py). `answers` holds one byte per question in
+# answer-key order (chosen option, 0 = unanswered); `key_digest` identifies the
+# question set they line up with. For quizzes with a sample_size, `question_ids`
+# records the drawn questions (packed int64, in the order shown) and `seed`
+# the draw, which also fixes each question's option order.
+class QuizAttempt(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete="CASCADE"), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+    deadline = db.Column(db.DateTime, nullable=False)
+    answers = db.Column(db.LargeBinary, nullable=False, default=b"")
+    key_digest = db.Column(db.Integer, nullable=False, default=0)
+    question_ids = db.Column(db.LargeBinary, nullable=True)
+    seed = db.Column(db.Integer, nullable=True)
+    saved_at = db.Column(db.DateTime, nullable=True)
+    submitted_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # The open attempt for a user and quiz
+        db.Index('ix_quiz_attempt_user_id_quiz_id_submitted_at', 'user_id', 'quiz_id', 'submitted_at'),
+        # Bulk deletes of a quiz's attempts (jobs.py)
+        db.Index('ix_quiz_attempt_quiz_id', 'quiz_id'),
+    )
+
+
+# A background job run by jobs.py (bulk deletes). `done`/`total` count rows
+# processed; `heartbeat_at` lets another process take over a job whose
+# worker died.
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    label = db.Column(db.String(200), nullable=False, default="")
+    status = db.Column(db.String(10), nullable=False, default="queued")  # queued, running, done, failed
+    total = db.Column(db.Integer, nullable=False, default=0)
+    done = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_job_status_id', 'status', 'id'),
+    )
+
+
+# MinHash LSH buckets of each question's text, maintained by dedup.py: one row
+# per band, so near-duplicates of a question share at least one (band, bucket).
+class QuestionLSH(db.Model):
+    __tablename__ = 'question_lsh'
+    band = db.Column(db.SmallInteger, primary_key=True)
+    bucket = db.Column(db.BigInteger, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id', ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_question_lsh_question_id', 'question_id'),
+    )
@@ -0,0 +1,132 @@
+"""Keyset (cursor) pagination for list pages and JSON endpoints.
+
+Pages are addressed by an opaque cursor holding the ordering values of the
+last row shown, so fetching page N costs the same as fetching page 1.
+"""
+import base64
+import bisect
+import json
+from datetime import date, datetime
+
+from flask import current_app, request
+from models import db
+
+
+class Page:
+    def __init__(self, items, next_cursor, cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return not self.cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _load(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_dump(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Returns the cursor values, or None for a missing/garbled cursor."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        return [_load(v) for v in json.loads(raw)]
+    except (ValueError, TypeError):
+        return None
+
+
+def page_args():
+    """Reads ?cursor= and ?per_page= from the current request."""
+    default = current_app.config.get("ITEMS_PER_PAGE", 25)
+    limit = current_app.config.get("MAX_ITEMS_PER_PAGE", 100)
+    per_page = request.args.get("per_page", default, type=int)
+    return request.args.get("cursor"), max(1, min(per_page or default, limit))
+
+
+def apply_keyset(query, columns, cursor=None, descending=False):
+    """Orders `query` by `columns` and filters it to rows after the cursor.
+
+    Returns (query, cursor values or None). Split out of paginate() so the
+    async API can run the same statement on its own session.
+    """
+    values = decode_cursor(cursor)
+    if values is not None and len(values) != len(columns):
+        values = None
+
+    query = query.order_by(*[c.desc() if descending else c.asc() for c in columns])
+    if values is not None:
+        key = db.tuple_(*columns)
+        after = db.tuple_(*[db.literal(v, type_=c.type) for c, v in zip(columns, values)])
+        query = query.filter(key < after if descending else key > after)
+    return query, values
+
+
+def make_page(rows, columns, per_page, cursor=None):
+    """Builds a Page from up to per_page + 1 fetched rows."""
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor([getattr(rows[-1], c.key) for c in columns])
+    return Page(rows, next_cursor, cursor)
+
+
+def paginate(query, columns, cursor=None, per_page=25, descending=False):
+    """Applies keyset ordering/filtering to `query` and fetches one page.
+
+    `columns` are the ordering columns; the last one must be unique (normally
+    the primary key) so the ordering is total. Rows must expose each column
+    under its key, which holds for both ORM entities and column queries.
+    """
+    query, values = apply_keyset(query, columns, cursor, descending)
+    rows = query.limit(per_page + 1).all()
+    return make_page(rows, columns, per_page, cursor if values is not None else None)
+
+
+def paginate_items(items, cursor=None, per_page=25):
+    """paginate() over an in-memory sequence ordered by a unique `id`.
+
+    Cursors are interchangeable with paginate(query, [Model.id], ...).
+    """
+    values = decode_cursor(cursor)
+    start = 0
+    if values is not None and len(values) == 1:
+        start = bisect.bisect_right(items, values[0], key=lambda item: item.id)
+    else:
+        values = None
+    rows = list(items[start:start + per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor([rows[-1].id])
+    return Page(rows, next_cursor, cursor if values is not None else None)
@@ -0,0 +1,96 @@
+"""Read-side queries for the list pages.
+
+Each helper returns flat rows carrying everything its template needs (subject
+and chapter names, question counts), so a page costs a fixed number of SQL
+statements no matter how many quizzes or attempts there are.
+"""
+from models import db, Subject, Chapter, Quiz, Question, Score
+from pagination import paginate
+
+
+def question_count_column():
+    # Correlated COUNT so each row gets its question count in the same statement;
+    # a quiz with a sample_size counts the questions an attempt is dealt
+    pool = (
+        db.select(db.func.count(Question.id))
+        .where(Question.quiz_id == Quiz.id)
+        .correlate(Quiz)
+        .scalar_subquery()
+    )
+    return db.case(
+        (db.and_(Quiz.sample_size.is_not(None), Quiz.sample_size < pool), Quiz.sample_size), else_=pool
+    ).label("question_count")
+
+
+def quiz_rows():
+    """Quizzes joined with their subject/chapter names and question count."""
+    return (
+        db.session.query(
+            Quiz.id,
+            Quiz.subject_id,
+            Quiz.chapter_id,
+            Quiz.date_of_quiz,
+            Quiz.time_duration,
+            Quiz.sample_size,
+            Subject.name.label("subject_name"),
+            Chapter.name.label("chapter_name"),
+            question_count_column(),
+        )
+        .join(Subject, Subject.id == Quiz.subject_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+    )
+
+
+def score_rows(user_id):
+    """A user's attempts joined with the quiz details shown on the scores page."""
+    return (
+        db.session.query(
+            Score.id,
+            Score.user_id,
+            Score.quiz_id,
+            Score.timestamp,
+            Score.total_scored,
+            Subject.name.label("subject_name"),
+            Chapter.name.label("chapter_name"),
+            question_count_column(),
+        )
+        .join(Quiz, Quiz.id == Score.quiz_id)
+        .join(Subject, Subject.id == Quiz.subject_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .filter(Score.user_id == user_id)
+    )
+
+
+def subject_rows():
+    """Subjects with their chapter count, for the admin dashboard cards."""
+    chapter_count = (
+        db.select(db.func.count(Chapter.id))
+        .where(Chapter.subject_id == Subject.id)
+        .correlate(Subject)
+        .scalar_subquery()
+        .label("chapter_count")
+    )
+    return db.session.query(Subject.id, Subject.name, chapter_count)
+
+
+def dashboard_quizzes(cursor=None, per_page=25):
+    return paginate(quiz_rows(), [Quiz.date_of_quiz, Quiz.id], cursor, per_page, descending=True)
+
+
+def attempted_quiz_ids(user_id, quiz_ids=None):
+    rows = db.session.query(Score.quiz_id).filter(Score.user_id == user_id)
+    if quiz_ids is not None:
+        rows = rows.filter(Score.quiz_id.in_(quiz_ids))
+    return {row.quiz_id for row in rows.distinct()}
+
+
+def user_scores(user_id, cursor=None, per_page=25):
+    return paginate(score_rows(user_id), [Score.timestamp, Score.id], cursor, per_page, descending=True)
+
+
+def admin_quizzes(cursor=None, per_page=25):
+    return paginate(quiz_rows(), [Quiz.id], cursor, per_page)
+
+
+def admin_subjects(cursor=None, per_page=25):
+    return paginate(subject_rows(), [Subject.id], cursor, per_page)
@@ -0,0 +1,68 @@
+"""EXPLAIN QUERY PLAN checks for the hot route queries.
+
+`flask check-query-plans` prints SQLite's plan for each query the list pages
+run and exits non-zero if any of them falls back to a full table scan or a
+temporary sort, so a dropped or mis-shaped index is caught before it ships.
+"""
+import sys
+from datetime import date, datetime
+
+import click
+from flask.cli import with_appcontext
+
+from models import db, Chapter, Quiz, Question, Score, UserSubjectStat, UserMonthStat
+import queries
+
+
+def route_queries():
+    """(name, query) pairs mirroring what the routes execute, with sample keys."""
+    return [
+        ("dashboard quizzes",
+         queries.quiz_rows()
+         .filter(db.tuple_(Quiz.date_of_quiz, Quiz.id) < db.tuple_(db.literal(date.today(), type_=Quiz.date_of_quiz.type), db.literal(1)))
+         .order_by(Quiz.date_of_quiz.desc(), Quiz.id.desc()).limit(26)),
+        ("dashboard attempted ids",
+         db.session.query(Score.quiz_id).filter(Score.user_id == 1, Score.quiz_id.in_([1, 2])).distinct()),
+        ("user scores",
+         queries.score_rows(1)
+         .filter(db.tuple_(Score.timestamp, Score.id) < db.tuple_(db.literal(datetime.now(), type_=Score.timestamp.type), db.literal(1)))
+         .order_by(Score.timestamp.desc(), Score.id.desc()).limit(26)),
+        ("user subject stats", db.session.query(UserSubjectStat).filter_by(user_id=1)),
+        ("user month stats", db.session.query(UserMonthStat).filter_by(user_id=1).order_by(UserMonthStat.month)),
+        ("quiz questions", db.session.query(Question).filter_by(quiz_id=1)),
+        ("subject chapters", db.session.query(Chapter).filter_by(subject_id=1)),
+        ("chapter quizzes", db.session.query(Quiz).filter_by(chapter_id=1)),
+    ]
+
+
+def explain(query):
+    compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    connection = db.session.connection()
+    return [row[3] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params)]
+
+
+def problems(plan):
+    bad = []
+    for detail in plan:
+        if detail.startswith("SCAN ") and "USING" not in detail:
+            bad.append(detail)
+        elif detail.startswith("USE TEMP B-TREE"):
+            bad.append(detail)
+    return bad
+
+
+@click.command("check-query-plans")
+@with_appcontext
+def check_query_plans_command():
+    """Fail if a hot route query scans a whole table."""
+    failed = False
+    for name, query in route_queries():
+        plan = explain(query)
+        bad = problems(plan)
+        failed = failed or bool(bad)
+        click.echo(f"{'FAIL' if bad else 'ok  '} {name}")
+        for detail in plan:
+            click.echo(f"       {detail}")
+    if failed:
+        sys.exit(1)
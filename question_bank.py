@@ -0,0 +1,181 @@
+"""Bulk question import/export (CSV and JSON Lines).
+
+Imports parse the upload incrementally, validate every row with the same
+rules as the single-question form, and insert valid rows with executemany in
+batched transactions. Exports stream rows straight from a cursor, so neither
+direction holds a whole question bank in memory.
+"""
+import csv
+import io
+import json
+
+import click
+from flask.cli import AppGroup
+
+import dedup
+from models import db, Quiz, Question
+
+FIELDS = ("question_statement", "option1", "option2", "option3", "option4", "correct_option")
+FORMATS = ("csv", "jsonl")
+MAX_REPORTED_ERRORS = 100
+
+
+def validate_question(data):
+    """Returns (clean_row, None) or (None, error message) for one question."""
+    statement = str(data.get("question_statement") or "").strip()
+    options = [str(data.get(f"option{i}") or "").strip() for i in range(1, 5)]
+    correct_option = str(data.get("correct_option") or "").strip()
+
+    if not all([statement, *options, correct_option]):
+        return None, "All fields are required!"
+    try:
+        correct_option = int(correct_option)
+        if correct_option not in [1, 2, 3, 4]:
+            raise ValueError("Invalid correct option")
+    except ValueError:
+        return None, "Correct option must be between 1 and 4."
+    return {
+        "question_statement": statement,
+        "option1": options[0], "option2": options[1],
+        "option3": options[2], "option4": options[3],
+        "correct_option": correct_option,
+    }, None
+
+
+def format_for(filename, default="csv"):
+    ext = filename.rsplit(".", 1)[-1].lower() if filename and "." in filename else ""
+    if ext in ("jsonl", "ndjson"):
+        return "jsonl"
+    if ext == "csv":
+        return "csv"
+    return default
+
+
+def iter_rows(stream, fmt):
+    """Yields (line_number, dict) from a binary stream, one row at a time."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, ValueError(f"Invalid JSON: {e}")
+                continue
+            yield number, row if isinstance(row, dict) else ValueError("Expected a JSON object")
+    else:
+        raise ValueError(f"Unsupported format {fmt!r}")
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.near_duplicates = 0  # inserted questions close to an existing one (dedup.py)
+        self.errors = []  # (line number, message), capped at MAX_REPORTED_ERRORS
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def as_dict(self):
+        return {"inserted": self.inserted, "failed": self.failed, "near_duplicates": self.near_duplicates,
+                "errors": [{"line": line, "error": message} for line, message in self.errors]}
+
+
+def import_questions(quiz_id, rows, batch_size=500):
+    """Validates and inserts `rows` from iter_rows() into a quiz."""
+    report = ImportReport()
+    batch = []
+    for line, row in rows:
+        if isinstance(row, Exception):
+            report.add_error(line, str(row))
+            continue
+        clean, error = validate_question(row)
+        if error:
+            report.add_error(line, error)
+            continue
+        clean["quiz_id"] = quiz_id
+        batch.append(clean)
+        if len(batch) >= batch_size:
+            _insert(batch, report)
+            batch = []
+    if batch:
+        _insert(batch, report)
+    report.near_duplicates = len(dedup.index_missing(quiz_id))
+    return report
+
+
+def _insert(batch, report):
+    db.session.execute(db.insert(Question), batch)  # executemany
+    db.session.commit()
+    report.inserted += len(batch)
+
+
+def export_rows(quiz_id):
+    return (
+        db.session.query(*[getattr(Question, field) for field in FIELDS])
+        .filter(Question.quiz_id == quiz_id)
+        .order_by(Question.id)
+        .yield_per(1000)
+    )
+
+
+def iter_export(quiz_id, fmt):
+    """Yields the quiz's questions as CSV or JSON Lines text chunks."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(FIELDS)
+        for row in export_rows(quiz_id):
+            writer.writerow(row)
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == "jsonl":
+        for row in export_rows(quiz_id):
+            yield json.dumps(dict(zip(FIELDS, row))) + "\n"
+    else:
+        raise ValueError(f"Unsupported format {fmt!r}")
+
+
+questions_cli = AppGroup("questions", help="Bulk import/export quiz questions.")
+
+
+@questions_cli.command("import")
+@click.argument("quiz_id", type=int)
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(FORMATS), help="Defaults to the file extension.")
+@click.option("--batch-size", default=500, show_default=True)
+def import_command(quiz_id, path, fmt, batch_size):
+    """Import questions from a CSV or JSON Lines file."""
+    from quiz_cache import invalidate_quiz
+    from http_cache import catalog_version
+
+    if db.session.get(Quiz, quiz_id) is None:
+        raise click.ClickException(f"Quiz {quiz_id} does not exist.")
+    with open(path, "rb") as fh:
+        report = import_questions(quiz_id, iter_rows(fh, fmt or format_for(path)), batch_size)
+    invalidate_quiz(quiz_id)
+    catalog_version.bump()
+    for line, message in report.errors:
+        click.echo(f"line {line}: {message}", err=True)
+    click.echo(f"Imported {report.inserted} questions, {report.failed} rows rejected.")
+
+
+@questions_cli.command("export")
+@click.argument("quiz_id", type=int)
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default="csv", show_default=True)
+@click.option("--output", "-o", type=click.File("w"), default="-")
+def export_command(quiz_id, fmt, output):
+    """Export a quiz's questions as CSV or JSON Lines."""
+    for chunk in iter_export(quiz_id, fmt):
+        output.write(chunk)
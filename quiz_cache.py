@@ -0,0 +1,96 @@
+"""Cached, precompiled quiz payloads for the quiz-taking pages.
+
+When a quiz opens, every student requests the same quiz within seconds. The
+quiz, its subject/chapter names and its questions are loaded once into a plain
+dict and served from the cache. Entries are keyed on the catalog version
+(http_cache.py), which every admin write bumps host-wide, so an edit reaches
+every worker process, not only the one whose entries invalidate_quiz()
+dropped. A quiz with a sample_size deals each attempt its own questions
+(attempts.py), so its payload leaves the pool out and only the drawn rows
+are fetched.
+"""
+from extension import cache
+from grading import answer_key_key
+from http_cache import catalog_version
+from models import db, Subject, Chapter, Quiz, Question
+
+QUESTION_FIELDS = ("id", "question_statement", "option1", "option2", "option3", "option4")
+
+
+def payload_key(quiz_id, version):
+    return f"quiz:{quiz_id}:payload:{version}"
+
+
+def payload_statements(quiz_id):
+    """(quiz with subject/chapter names statement, questions statement) for a quiz."""
+    return (
+        db.select(Quiz, Subject.name, Chapter.name)
+        .join(Subject, Subject.id == Quiz.subject_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .where(Quiz.id == quiz_id),
+        db.select(*[getattr(Question, field) for field in QUESTION_FIELDS])
+        .where(Question.quiz_id == quiz_id)
+        .order_by(Question.id),
+    )
+
+
+def build_payload(row, questions):
+    quiz, subject_name, chapter_name = row
+    return {
+        "id": quiz.id,
+        "subject_id": quiz.subject_id,
+        "chapter_id": quiz.chapter_id,
+        "subject": {"id": quiz.subject_id, "name": subject_name},
+        "chapter": {"id": quiz.chapter_id, "name": chapter_name},
+        "date_of_quiz": quiz.date_of_quiz,
+        "time_duration": quiz.time_duration,
+        "sample_size": quiz.sample_size,
+        "questions": None if questions is None else [dict(zip(QUESTION_FIELDS, question)) for question in questions],
+    }
+
+
+def is_sampled(row):
+    """Whether the quiz row of payload_statements() draws questions per attempt."""
+    return bool(row[0].sample_size)
+
+
+def load_payload(quiz_id):
+    quiz_stmt, questions_stmt = payload_statements(quiz_id)
+    row = db.session.execute(quiz_stmt).first()
+    if row is None:
+        return None
+    return build_payload(row, None if is_sampled(row) else db.session.execute(questions_stmt).all())
+
+
+def get_quiz_payload(quiz_id):
+    """The quiz as a dict, or None if it doesn't exist.
+
+    `questions` lists every question, or is None for a quiz with a sample_size.
+    """
+    return cache.get_or_set(payload_key(quiz_id, catalog_version.current()), lambda: load_payload(quiz_id))
+
+
+def questions_statement(question_ids):
+    return db.select(*[getattr(Question, field) for field in QUESTION_FIELDS]).where(Question.id.in_(question_ids))
+
+
+def order_questions(rows, question_ids):
+    by_id = {row.id: dict(zip(QUESTION_FIELDS, row)) for row in rows}
+    return [by_id[question_id] for question_id in question_ids if question_id in by_id]
+
+
+def load_questions(question_ids):
+    """The given questions as dicts, in the given order (the questions dealt to an attempt)."""
+    question_ids = list(question_ids)
+    return order_questions(db.session.execute(questions_statement(question_ids)).all(), question_ids)
+
+
+def invalidate_quiz(quiz_id):
+    version = catalog_version.current()
+    cache.delete(payload_key(quiz_id, version))
+    cache.delete(answer_key_key(quiz_id, version))
+
+
+def invalidate_quizzes(quiz_ids):
+    for quiz_id in quiz_ids:
+        invalidate_quiz(quiz_id)
@@ -0,0 +1,205 @@
+"""Streaming exports of scores and quiz attempts for reporting.
+
+Rows are read with a server-side cursor (yield_per, stream_results), joined
+with user, quiz, subject and chapter, and written out as they arrive: CSV in
+64 KB chunks, Parquet one row group per fetched batch. Memory stays flat no
+matter how many attempts are exported. Parquet needs pyarrow, which is
+optional and only imported when a Parquet export runs.
+"""
+import csv
+import importlib.util
+import io
+import os
+import tempfile
+from datetime import date, datetime, time, timedelta
+
+import click
+from flask.cli import AppGroup
+
+import queries
+from models import db, User, Subject, Chapter, Quiz, Score, QuizAttempt
+
+
+DATASETS = ("scores", "attempts")
+FORMATS = ("csv", "parquet")
+BATCH_SIZE = 2000
+
+COLUMNS = {
+    "scores": (
+        "score_id", "timestamp", "user_id", "email", "full_name", "quiz_id", "date_of_quiz",
+        "subject_id", "subject", "chapter_id", "chapter", "total_scored", "question_count",
+    ),
+    "attempts": (
+        "attempt_id", "user_id", "email", "full_name", "quiz_id", "date_of_quiz", "subject_id",
+        "subject", "chapter_id", "chapter", "started_at", "deadline", "saved_at", "submitted_at",
+    ),
+}
+COLUMN_TYPES = {  # for the Parquet schema; anything else is an integer
+    "timestamp": "datetime", "started_at": "datetime", "deadline": "datetime",
+    "saved_at": "datetime", "submitted_at": "datetime", "date_of_quiz": "date",
+    "email": "string", "full_name": "string", "subject": "string", "chapter": "string",
+}
+
+
+class ExportFilters:
+    def __init__(self, start=None, end=None, subject_id=None):
+        self.start = start  # dates, both inclusive
+        self.end = end
+        self.subject_id = subject_id
+
+    @classmethod
+    def from_args(cls, args):
+        """Reads ?start=YYYY-MM-DD&end=YYYY-MM-DD&subject_id=; raises ValueError on bad input."""
+        def parse(name):
+            value = args.get(name)
+            return date.fromisoformat(value) if value else None
+
+        subject_id = args.get("subject_id")
+        return cls(parse("start"), parse("end"), int(subject_id) if subject_id else None)
+
+    def apply(self, query, column):
+        if self.start:
+            query = query.filter(column >= datetime.combine(self.start, time.min))
+        if self.end:
+            query = query.filter(column < datetime.combine(self.end + timedelta(days=1), time.min))
+        if self.subject_id:
+            query = query.filter(Quiz.subject_id == self.subject_id)
+        return query
+
+
+def export_query(dataset, filters):
+    if dataset == "scores":
+        query = (
+            db.select(
+                Score.id, Score.timestamp, User.id, User.email, User.full_name, Quiz.id, Quiz.date_of_quiz,
+                Subject.id, Subject.name, Chapter.id, Chapter.name, Score.total_scored,
+            )
+            .join(User, User.id == Score.user_id)
+            .join(Quiz, Quiz.id == Score.quiz_id)
+        )
+        column = Score.timestamp
+        order = Score.id
+    elif dataset == "attempts":
+        query = (
+            db.select(
+                QuizAttempt.id, User.id, User.email, User.full_name, Quiz.id, Quiz.date_of_quiz,
+                Subject.id, Subject.name, Chapter.id, Chapter.name,
+                QuizAttempt.started_at, QuizAttempt.deadline, QuizAttempt.saved_at, QuizAttempt.submitted_at,
+            )
+            .join(User, User.id == QuizAttempt.user_id)
+            .join(Quiz, Quiz.id == QuizAttempt.quiz_id)
+        )
+        column = QuizAttempt.started_at
+        order = QuizAttempt.id
+    else:
+        raise ValueError(f"Unknown dataset {dataset!r}")
+
+    query = query.join(Subject, Subject.id == Quiz.subject_id).join(Chapter, Chapter.id == Quiz.chapter_id)
+    return filters.apply(query, column).order_by(order)
+
+
+def iter_batches(dataset, filters, batch_size=BATCH_SIZE):
+    """Yields lists of export rows (tuples in COLUMNS[dataset] order)."""
+    question_counts = None
+    if dataset == "scores":
+        # One small per-quiz query instead of a correlated count per row
+        question_counts = dict(db.session.execute(db.select(Quiz.id, queries.question_count_column())).all())
+    result = db.session.execute(
+        export_query(dataset, filters), execution_options={"yield_per": batch_size, "stream_results": True}
+    )
+    for partition in result.partitions():
+        if question_counts is None:
+            yield [tuple(row) for row in partition]
+        else:
+            yield [(*row, question_counts.get(row[5], 0)) for row in partition]
+
+
+def iter_csv(dataset, filters):
+    """Yields the export as CSV text chunks."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS[dataset])
+    for batch in iter_batches(dataset, filters):
+        writer.writerows(batch)
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def load_pyarrow():
+    """The pyarrow module (with pyarrow.parquet), imported on first use so app startup doesn't pay for it."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).")
+    return pyarrow
+
+
+def parquet_schema(dataset):
+    pyarrow = load_pyarrow()
+    types = {
+        "datetime": pyarrow.timestamp("us"),
+        "date": pyarrow.date32(),
+        "string": pyarrow.string(),
+        "int": pyarrow.int64(),
+    }
+    return pyarrow.schema([(name, types[COLUMN_TYPES.get(name, "int")]) for name in COLUMNS[dataset]])
+
+
+def write_parquet(dataset, filters, path):
+    """Writes the export to a Parquet file, one row group per batch; returns the row count."""
+    pyarrow = load_pyarrow()
+    schema = parquet_schema(dataset)
+    rows = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for batch in iter_batches(dataset, filters):
+            writer.write_table(pyarrow.table(
+                {name: list(values) for name, values in zip(schema.names, zip(*batch))}, schema=schema))
+            rows += len(batch)
+    return rows
+
+
+def parquet_tempfile(dataset, filters):
+    """Writes the export to a temporary Parquet file and returns its path (the caller removes it)."""
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    try:
+        write_parquet(dataset, filters, path)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+reports_cli = AppGroup("reports", help="Export scores and attempts for reporting.")
+
+
+@reports_cli.command("export")
+@click.argument("dataset", type=click.Choice(DATASETS))
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default="csv", show_default=True)
+@click.option("--output", "-o", default="-", help="File to write; '-' (CSV only) writes to stdout.")
+@click.option("--start", type=click.DateTime(["%Y-%m-%d"]), help="First day to include.")
+@click.option("--end", type=click.DateTime(["%Y-%m-%d"]), help="Last day to include.")
+@click.option("--subject-id", type=int, help="Only quizzes of this subject.")
+def export_command(dataset, fmt, output, start, end, subject_id):
+    """Export all scores or attempts as CSV or Parquet."""
+    filters = ExportFilters(start and start.date(), end and end.date(), subject_id)
+    if fmt == "parquet":
+        if output == "-":
+            raise click.UsageError("Parquet export needs --output FILE.")
+        try:
+            rows = write_parquet(dataset, filters, output)
+        except RuntimeError as exc:
+            raise click.ClickException(str(exc))
+        click.echo(f"Wrote {rows} rows to {output}.", err=True)
+        return
+    with click.open_file(output, "w", encoding="utf-8", lazy=False) as fh:
+        for chunk in iter_csv(dataset, filters):
+            fh.write(chunk)
@@ -1,58 +1,116 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
-from flask_login import login_user, logout_user, login_required, current_user,LoginManager
-from werkzeug.security import generate_password_hash, check_password_hash
-from models import db, User, Subject, Chapter, Quiz, Question, Score
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort, current_app
+from flask.views import MethodView
+from flask_login import login_user, logout_user, login_required, current_user
+from security import passwords, login_throttle, PasswordHasherBusy
+from models import db, User, Subject, Chapter, Quiz, Question, Score, UserSubjectStat, UserMonthStat
 from form import LoginForm, RegistrationForm
-from flask_restful import Resource, Api
+import queries
+from quiz_cache import get_quiz_payload, load_questions
+from grading import get_answer_key, read_answers
+import attempts
+from leaderboard import leaderboards
+from pagination import paginate_items, page_args
+from catalog import catalog
+from http_cache import conditional
 from datetime import datetime
 from collections import defaultdict
 
 
 main = Blueprint("main", __name__)
-login_manager = LoginManager()
-login_manager.login_view = "main.login"
 
 
-api = Api(main)
+def page_response(page, serialize):
+    return jsonify({"items": [serialize(item) for item in page.items], "next_cursor": page.next_cursor})
 
-class SubjectAPI(Resource):
-    def get(self):
-        subjects = Subject.query.all()
-        return jsonify([{"id": sub.id, "name": sub.name} for sub in subjects])
+class SubjectAPI(MethodView):
+    decorators = [conditional("api")]
 
-class ChapterAPI(Resource):
-    def get(self, subject_id):
-        chapters = Chapter.query.filter_by(subject_id=subject_id).all()
-        return jsonify([{"id": chap.id, "name": chap.name} for chap in chapters])
+    def get(self):
+        cursor, per_page = page_args()
+        page = paginate_items(catalog.tree().subjects, cursor, per_page)
+        return page_response(page, lambda sub: {"id": sub.id, "name": sub.name})
 
-class QuizAPI(Resource):
-    def get(self, chapter_id):
-        quizzes = Quiz.query.filter_by(chapter_id=chapter_id).all()
-        return jsonify([{"id": quiz.id, "title": quiz.title} for quiz in quizzes])
+class ChapterAPI(MethodView):
+    decorators = [conditional("api")]
 
-api.add_resource(SubjectAPI, '/api/subjects')
-api.add_resource(ChapterAPI, '/api/subjects/<int:subject_id>/chapters')
-api.add_resource(QuizAPI, '/api/chapters/<int:chapter_id>/quizzes')
+    def get(self, subject_id):
+        cursor, per_page = page_args()
+        page = paginate_items(catalog.tree().chapters_of(subject_id), cursor, per_page)
+        return page_response(page, lambda chap: {"id": chap.id, "name": chap.name})
 
+class QuizAPI(MethodView):
+    decorators = [conditional("api")]
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+    def get(self, chapter_id):
+        cursor, per_page = page_args()
+        page = paginate_items(catalog.tree().quizzes_of(chapter_id), cursor, per_page)
+        return page_response(page, lambda quiz: {
+            "id": quiz.id,
+            "date_of_quiz": quiz.date_of_quiz.isoformat(),
+            "time_duration": quiz.time_duration,
+        })
+
+class LeaderboardAPI(MethodView):
+    decorators = [login_required]
+
+    def get(self, kind, board_id):
+        limit = request.args.get("limit", current_app.config.get("LEADERBOARD_TOP_N", 10), type=int)
+        limit = max(1, min(limit, current_app.config.get("MAX_ITEMS_PER_PAGE", 100)))
+        board = leaderboards.board(kind, board_id)
+        top = board.top(limit)
+        names = dict(db.session.query(User.id, User.full_name).filter(User.id.in_([user_id for _, user_id, _ in top])))
+        me = None
+        score = board.scores.get(current_user.id)
+        if score is not None:
+            me = {"rank": board.rank(score), "score": score, "percentile": board.percentile(score)}
+        return jsonify({
+            "kind": kind,
+            "id": board_id,
+            "participants": len(board),
+            "top": [
+                {"rank": rank, "user_id": user_id, "full_name": names.get(user_id), "score": score}
+                for rank, user_id, score in top
+            ],
+            "me": me,
+        })
+
+main.add_url_rule('/api/subjects', view_func=SubjectAPI.as_view('subjectapi'))
+main.add_url_rule('/api/subjects/<int:subject_id>/chapters', view_func=ChapterAPI.as_view('chapterapi'))
+main.add_url_rule('/api/chapters/<int:chapter_id>/quizzes', view_func=QuizAPI.as_view('quizapi'))
+main.add_url_rule('/api/leaderboard/<any(quiz, subject):kind>/<int:board_id>',
+                  view_func=LeaderboardAPI.as_view('leaderboardapi'))
 
 @main.route("/")
 def home():
     return render_template("index.html")
 
+def throttled(account=None):
+    """None if this login/registration attempt may proceed, else a message to flash."""
+    retry_after = login_throttle.check(request.remote_addr or "", account)
+    if retry_after:
+        return f"Too many attempts. Please try again in {retry_after} seconds."
+    return None
+
+
 @main.route("/register", methods=["GET", "POST"])
 def register():
     form = RegistrationForm()
     if form.validate_on_submit():
+        message = throttled()
+        if message:
+            flash(message, "danger")
+            return render_template("register.html", form=form), 429
+
         existing_user = User.query.filter_by(email=form.email.data).first()
         if existing_user:
             flash("Email already registered. Please log in or use a different email.", "warning")
             return redirect(url_for("main.register"))
 
-        hashed_password = generate_password_hash(form.password.data, method="pbkdf2:sha256")
+        try:
+            hashed_password = passwords.hash(form.password.data)
+        except PasswordHasherBusy:
+            flash("The server is busy. Please try again in a moment.", "danger")
+            return render_template("register.html", form=form), 503
 
         # Fix: Use `form.email.data` for correct comparison
         role = "admin" if form.email.data == "admin@gmail.com" else "user"
@@ -77,8 +135,22 @@ def register():
 def login():
     form = LoginForm()
     if form.validate_on_submit():
+        message = throttled(form.email.data)
+        if message:
+            flash(message, "danger")
+            return render_template("login.html", form=form), 429
+
         user = User.query.filter_by(email=form.email.data).first()
-        if user and check_password_hash(user.password, form.password.data):
+        try:
+            valid = user is not None and passwords.verify(user.password, form.password.data)
+            if valid and passwords.needs_rehash(user.password):
+                user.password = passwords.hash(form.password.data)
+                db.session.commit()
+        except PasswordHasherBusy:
+            flash("The server is busy. Please try again in a moment.", "danger")
+            return render_template("login.html", form=form), 503
+
+        if valid:
             login_user(user)
             
             # Redirect based on role
@@ -101,33 +173,67 @@ def logout():
 
 @main.route("/dashboard")
 @login_required
+@conditional("dashboard", per_user=True)
 def dashboard():
-    quizzes = Quiz.query.order_by(Quiz.date_of_quiz.desc()).all()  # Sorting in descending order
-    attempted_quiz_ids = {score.quiz_id for score in Score.query.filter_by(user_id=current_user.id).all()}
+    cursor, per_page = page_args()
+    page = queries.dashboard_quizzes(cursor, per_page)  # Sorting in descending order
+    attempted_quiz_ids = queries.attempted_quiz_ids(current_user.id, [quiz.id for quiz in page])
 
-    return render_template("dashboard.html", user=current_user, quizzes=quizzes, attempted_quiz_ids=attempted_quiz_ids)
+    return render_template("dashboard.html", user=current_user, quizzes=page.items, page=page, attempted_quiz_ids=attempted_quiz_ids)
 
 
 @main.route("/quiz/<int:quiz_id>", methods=["GET", "POST"])
 @login_required
 def attempt_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
-
     if request.method == "POST":
-        total_score = 0
-        for question in questions:
-            selected_option = request.form.get(f"question-{question.id}")
-            if selected_option and int(selected_option) == question.correct_option:
-                total_score += 1
-
-        score_entry = Score(quiz_id=quiz_id, user_id=current_user.id, total_scored=total_score)
-        db.session.add(score_entry)
-        db.session.commit()
-        
-        return redirect(url_for("main.dashboard"))
-
-    return render_template("quiz_attempt.html", quiz=quiz, questions=questions)
+        return submit_attempt(quiz_id, "main.dashboard")
+
+    quiz = get_quiz_payload(quiz_id)
+    key = get_answer_key(quiz_id)
+    if quiz is None or key is None:
+        abort(404)
+    attempt = attempts.start(current_user.id, quiz, key)
+    dealt = attempts.attempt_key(attempt, key)
+    return render_template("quiz_attempt.html", quiz=quiz, questions=attempt_questions(quiz, attempt, dealt),
+                           **attempt_context(attempt, dealt))
+
+
+def attempt_questions(quiz, attempt, key):
+    """The questions dealt to `attempt` in order, each with its options in display order.
+
+    A drawn attempt fetches only its own questions rather than the quiz's pool.
+    """
+    if attempt.question_ids is None and quiz["questions"] is not None:
+        questions = quiz["questions"]
+    else:
+        questions = load_questions(key.question_ids)
+    return attempts.dealt_questions(attempt, questions)
+
+
+def attempt_context(attempt, key):
+    """Template variables for resuming `attempt`: saved answers and time left."""
+    return {
+        "saved": dict(zip(key.question_ids, attempts.saved_answers(attempt, key))),
+        "remaining": attempts.remaining_seconds(attempt),
+        "autosave_interval": current_app.config.get("ATTEMPT_AUTOSAVE_SECONDS", 15),
+    }
+
+
+def submit_attempt(quiz_id, next_endpoint):
+    key = get_answer_key(quiz_id)
+    if key is None:
+        abort(404)
+    attempt = attempts.current_attempt(current_user.id, quiz_id)
+    if attempt is None:
+        result, late = None, False
+    else:
+        dealt = attempts.attempt_key(attempt, key)
+        result, late = attempts.submit(attempt, dealt, read_answers(request.form, dealt))
+    if result is None:
+        flash("This quiz attempt has already been submitted.", "warning")
+    elif late:
+        flash("Time was up, so your last saved answers were submitted.", "warning")
+    return redirect(url_for(next_endpoint))
 
 
 
@@ -137,29 +243,26 @@ from collections import defaultdict
 @main.route('/summary')
 @login_required
 def summary():
-    latest_attempt = Score.query.filter_by(user_id=current_user.id).order_by(Score.timestamp.desc()).first()
+    # Latest attempt plus the three before it
+    previous_attempts = queries.user_scores(current_user.id, per_page=4).items
+    latest_attempt = previous_attempts[0] if previous_attempts else None
 
     if not latest_attempt:
         return render_template("summary.html", latest_attempt=None, previous_attempts=[], subject_attempts=[], monthly_attempts=[])
 
-    previous_attempts = Score.query.filter(Score.user_id == current_user.id).order_by(Score.timestamp.desc()).all()
-
-   
-    subject_attempts = defaultdict(int)
-    for attempt in previous_attempts:
-        if attempt.quiz and attempt.quiz.subject:
-            subject_attempts[attempt.quiz.subject.name] += 1
-
-    subject_attempts_data = [{"subject": sub, "count": count} for sub, count in subject_attempts.items()]
-
-    #
-    monthly_attempts = defaultdict(int)
-    for attempt in previous_attempts:
-        if attempt.timestamp:
-            month_year = attempt.timestamp.strftime("%b %Y")  
-            monthly_attempts[month_year] += 1
+    subject_rows = (
+        db.session.query(Subject.name, UserSubjectStat.attempts)
+        .join(UserSubjectStat, UserSubjectStat.subject_id == Subject.id)
+        .filter(UserSubjectStat.user_id == current_user.id)
+        .all()
+    )
+    subject_attempts_data = [{"subject": name, "count": count} for name, count in subject_rows]
 
-    monthly_attempts_data = [{"month": month, "count": count} for month, count in monthly_attempts.items()]
+    month_rows = UserMonthStat.query.filter_by(user_id=current_user.id).order_by(UserMonthStat.month).all()
+    monthly_attempts_data = [
+        {"month": datetime.strptime(row.month, "%Y-%m").strftime("%b %Y"), "count": row.attempts}
+        for row in month_rows
+    ]
 
     return render_template(
         "summary.html", 
@@ -188,45 +291,51 @@ def quiz():
 @main.route("/quiz/<int:quiz_id>/view")
 @login_required
 def view_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
-    return render_template("quiz.html", quiz=quiz)
+    quiz = get_quiz_payload(quiz_id)
+    key = get_answer_key(quiz_id)
+    if quiz is None or key is None:
+        abort(404)
+    return render_template("quiz.html", quiz=quiz, question_count=attempts.dealt_count(quiz, key))
 
 @main.route("/quiz/<int:quiz_id>/start")
 @login_required
 def start_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
-    
-    questions = quiz.questions  
-    if len(questions) == 0:
+    quiz = get_quiz_payload(quiz_id)
+    key = get_answer_key(quiz_id)
+    if quiz is None or key is None:
+        abort(404)
+
+    if len(key) == 0:
        flash("This quiz has no questions. You cannot attempt it.", "danger")
        return redirect(url_for("main.dashboard"))
-    return render_template("start_quiz.html", quiz=quiz, questions=questions)
+    attempt = attempts.start(current_user.id, quiz, key)
+    dealt = attempts.attempt_key(attempt, key)
+    return render_template("start_quiz.html", quiz=quiz, questions=attempt_questions(quiz, attempt, dealt),
+                           **attempt_context(attempt, dealt))
 
 
-from datetime import datetime
+@main.route("/quiz/<int:quiz_id>/autosave", methods=["POST"])
+@login_required
+def autosave_quiz(quiz_id):
+    key = get_answer_key(quiz_id)
+    if key is None:
+        abort(404)
+    attempt = attempts.current_attempt(current_user.id, quiz_id)
+    if attempt is None:
+        return jsonify({"error": "No open attempt for this quiz"}), 404
+    if attempts.is_expired(attempt):
+        return jsonify({"error": "Time is up", "remaining": 0}), 409
+    data = request.get_json(silent=True)
+    form = {name: str(value) for name, value in data.items()} if isinstance(data, dict) else request.form
+    dealt = attempts.attempt_key(attempt, key)
+    attempts.autosave(attempt, dealt, read_answers(form, dealt))
+    return jsonify({"saved": True, "remaining": attempts.remaining_seconds(attempt)})
+
 
 @main.route('/submit_quiz/<int:quiz_id>', methods=['POST'])
 @login_required
 def submit_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
-
-   
-    score = 0
-    for question in quiz.questions:
-        selected = request.form.get(f'question_{question.id}')
-        if selected and selected.strip().isdigit():
-            selected = int(selected)
-
-        if selected == question.correct_option:
-            score += 1
-
-   
-    new_attempt = Score(user_id=current_user.id, quiz_id=quiz.id, total_scored=score, timestamp=datetime.now())
-    db.session.add(new_attempt)
-    db.session.commit()
-
-    
-    return redirect(url_for('main.scores'))
+    return submit_attempt(quiz_id, 'main.scores')
 
 
 @main.route('/score_summary/<int:score_id>')
@@ -244,15 +353,15 @@ def score_summary(score_id):
 @main.route('/scores')
 @login_required
 def scores():
-    user_scores = Score.query.filter_by(user_id=current_user.id).order_by(Score.timestamp.desc()).all()
-    user_score = Score.query.filter_by(user_id=current_user.id).all()
+    cursor, per_page = page_args()
+    page = queries.user_scores(current_user.id, cursor, per_page)
 
     score_trend = [
         {"date": score.timestamp.strftime('%Y-%m-%d'), "score": score.total_scored}
-        for score in user_score
+        for score in reversed(page.items)
     ]
 
-    return render_template("score.html", scores=user_scores, score_trend=score_trend)
+    return render_template("score.html", scores=page.items, page=page, score_trend=score_trend)
 
 
 
@@ -0,0 +1,122 @@
+"""Full-text search over the question bank (SQLite FTS5).
+
+`question_fts` is an external-content FTS5 index over the question text and
+its four options; triggers on `question` keep it in step with every insert,
+edit and delete, including bulk imports and background deletes. Searches
+are ranked with bm25 (the statement weighs more than the options) and can be
+narrowed to a subject or chapter. The index is created with the question
+table (create_all) or by migration 0005; `flask search rebuild` repopulates it.
+"""
+import html
+import re
+from collections import namedtuple
+
+import click
+from flask.cli import AppGroup
+
+from models import db, Question, Quiz, Subject, Chapter
+
+COLUMNS = ("question_statement", "option1", "option2", "option3", "option4")
+WEIGHTS = (10.0, 1.0, 1.0, 1.0, 1.0)  # bm25 column weights, in COLUMNS order
+MARK_OPEN, MARK_CLOSE = "\x02", "\x03"  # snippet markers, swapped for <mark> after escaping
+
+_cols = ", ".join(COLUMNS)
+_new = ", ".join(f"new.{c}" for c in COLUMNS)
+_old = ", ".join(f"old.{c}" for c in COLUMNS)
+DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS question_fts USING fts5({_cols}, "
+    f"content='question', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS question_fts_ai AFTER INSERT ON question BEGIN "
+    f"INSERT INTO question_fts(rowid, {_cols}) VALUES (new.id, {_new}); END",
+    f"CREATE TRIGGER IF NOT EXISTS question_fts_ad AFTER DELETE ON question BEGIN "
+    f"INSERT INTO question_fts(question_fts, rowid, {_cols}) VALUES ('delete', old.id, {_old}); END",
+    f"CREATE TRIGGER IF NOT EXISTS question_fts_au AFTER UPDATE ON question BEGIN "
+    f"INSERT INTO question_fts(question_fts, rowid, {_cols}) VALUES ('delete', old.id, {_old}); "
+    f"INSERT INTO question_fts(rowid, {_cols}) VALUES (new.id, {_new}); END",
+]
+
+for statement in DDL:
+    db.event.listen(Question.__table__, "after_create", db.DDL(statement).execute_if(dialect="sqlite"))
+
+SearchHit = namedtuple(
+    "SearchHit", "id quiz_id subject_id subject chapter_id chapter date_of_quiz question_statement snippet rank"
+)
+
+
+class SearchUnavailable(Exception):
+    """The database has no FTS5 index (not SQLite)."""
+
+
+def available():
+    return db.engine.dialect.name == "sqlite"
+
+
+def match_expression(text):
+    """Turns free text into an FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def highlight(snippet):
+    return html.escape(snippet).replace(MARK_OPEN, "<mark>").replace(MARK_CLOSE, "</mark>")
+
+
+def search(text, subject_id=None, chapter_id=None, limit=20, offset=0):
+    """Best-matching questions for `text`, as SearchHits (snippet is safe HTML)."""
+    if not available():
+        raise SearchUnavailable("Question search needs SQLite with FTS5.")
+    expression = match_expression(text)
+    if expression is None:
+        return []
+
+    fts = db.table("question_fts", db.column("rowid"))
+    rank = db.func.bm25(db.literal_column("question_fts"), *WEIGHTS).label("rank")
+    snippet = db.func.snippet(db.literal_column("question_fts"), 0, MARK_OPEN, MARK_CLOSE, "…", 16).label("snippet")
+    query = (
+        db.select(
+            Question.id, Question.quiz_id, Quiz.subject_id, Subject.name, Quiz.chapter_id, Chapter.name,
+            Quiz.date_of_quiz, Question.question_statement, snippet, rank,
+        )
+        .select_from(fts)
+        .join(Question, Question.id == fts.c.rowid)
+        .join(Quiz, Quiz.id == Question.quiz_id)
+        .join(Subject, Subject.id == Quiz.subject_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .where(db.literal_column("question_fts").op("MATCH")(expression))
+        .order_by(rank)
+        .limit(limit)
+        .offset(offset)
+    )
+    if subject_id:
+        query = query.where(Quiz.subject_id == subject_id)
+    if chapter_id:
+        query = query.where(Quiz.chapter_id == chapter_id)
+    return [SearchHit(*row[:8], highlight(row.snippet), row.rank) for row in db.session.execute(query)]
+
+
+def rebuild():
+    """Creates the index and triggers if missing and repopulates it from `question`."""
+    if not available():
+        raise SearchUnavailable("Question search needs SQLite with FTS5.")
+    for statement in DDL:
+        db.session.execute(db.text(statement))
+    db.session.execute(db.text("INSERT INTO question_fts(question_fts) VALUES ('rebuild')"))
+    db.session.execute(db.text("INSERT INTO question_fts(question_fts) VALUES ('optimize')"))
+
+
+search_cli = AppGroup("search", help="Maintain the question search index.")
+
+
+@search_cli.command("rebuild")
+def rebuild_command():
+    """Rebuild the full-text index from the question table."""
+    try:
+        rebuild()
+    except SearchUnavailable as exc:
+        raise click.ClickException(str(exc))
+    db.session.commit()
+    click.echo("Question search index rebuilt.")
@@ -0,0 +1,194 @@
+"""Password hashing with a host-wide concurrency limit, and login throttling.
+
+hashlib's pbkdf2/scrypt keep a core busy for the whole hash, so at most
+PASSWORD_HASH_WORKERS hashes run at once across every worker process on the
+host. The limit is a set of slot files locked with flock(): gunicorn's sync
+workers each handle one request at a time, so a per-process limit would let a
+sign-in burst take every core. The kernel drops a slot's lock when its
+process exits, so a worker killed mid-hash doesn't leak it.
+
+A caller waiting for a slot ties up its whole worker, so waiting is capped
+host-wide too: a caller first takes one of PASSWORD_HASH_BACKLOG waiting
+slots without blocking, then waits up to PASSWORD_HASH_WAIT seconds for a
+hashing slot. When either runs out it gets PasswordHasherBusy at once, so a
+sign-in burst holds at most WORKERS + BACKLOG gunicorn workers and the rest
+keep serving quizzes. Without fcntl (Windows) the slots only limit hashing
+within one process.
+
+The hash method comes from PASSWORD_HASH_METHOD; a user whose stored hash
+uses other parameters is rehashed the next time they log in.
+
+Login and registration are also throttled per client IP and per account
+with in-memory token buckets, checked before any hashing happens.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class PasswordHasherBusy(Exception):
+    """Too many password hashes are queued; the caller should ask the user to retry."""
+
+
+class HashSlots:
+    """`count` slots shared by every process using `directory`, one flock()ed file each."""
+
+    POLL = 0.01  # seconds between sweeps while every slot is taken
+
+    def __init__(self, directory, count, name="slot"):
+        self.directory = directory
+        self.count = count
+        self.name = name
+        self._local = threading.BoundedSemaphore(count) if fcntl is None else None
+        if fcntl is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def acquire(self, timeout):
+        """A held slot to pass to release(), or None if none came free within `timeout` seconds."""
+        if fcntl is None:
+            return True if self._local.acquire(timeout=timeout) else None
+        deadline = time.monotonic() + timeout
+        first = os.getpid() % self.count  # spread processes over the slots
+        while True:
+            for n in range(self.count):
+                path = os.path.join(self.directory, f"{self.name}-{(first + n) % self.count}")
+                # A descriptor of our own, so threads of one process exclude each other too
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except BlockingIOError:
+                    os.close(fd)
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return None
+            time.sleep(min(self.POLL, left))
+
+    def release(self, slot):
+        if fcntl is None:
+            self._local.release()
+        else:
+            os.close(slot)  # drops the lock
+
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.app = None
+        self.method = "pbkdf2:sha256"
+        self.salt_length = 16
+        self.wait = 5.0
+        self._slots = None
+        self._waiting = None
+        self._canonical_method = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.method = app.config.get("PASSWORD_HASH_METHOD", "pbkdf2:sha256")
+        self.salt_length = app.config.get("PASSWORD_HASH_SALT_LENGTH", 16)
+        self.wait = app.config.get("PASSWORD_HASH_WAIT", 5.0)
+        directory = app.config.get("PASSWORD_HASH_LOCK_DIR") or os.path.join(app.instance_path, "locks")
+        self._slots = HashSlots(directory, max(1, app.config.get("PASSWORD_HASH_WORKERS", 2)))
+        self._waiting = HashSlots(directory, max(1, app.config.get("PASSWORD_HASH_BACKLOG", 2)), name="wait")
+        self._canonical_method = None
+        app.extensions["password_hasher"] = self
+
+    def _run(self, fn, *args):
+        slot = self._slots.acquire(0)
+        if slot is None:
+            ticket = self._waiting.acquire(0)
+            if ticket is None:
+                raise PasswordHasherBusy()  # enough workers are already waiting
+            try:
+                slot = self._slots.acquire(self.wait)
+            finally:
+                self._waiting.release(ticket)
+            if slot is None:
+                raise PasswordHasherBusy()
+        try:
+            return fn(*args)
+        finally:
+            self._slots.release(slot)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, stored_hash, password):
+        return self._run(check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        """True if `stored_hash` wasn't made with the configured method and parameters."""
+        if self._canonical_method is None:
+            # werkzeug fills in default parameters (e.g. pbkdf2 iterations); let it
+            # spell out the configured method once instead of duplicating its defaults
+            self._canonical_method = self._run(generate_password_hash, "", self.method, 1).split("$", 1)[0]
+        return stored_hash.split("$", 1)[0] != self._canonical_method
+
+
+class TokenBucket:
+    """`capacity` requests at once, refilled at `rate` per second, per key."""
+
+    def __init__(self, capacity, rate, max_keys=10000):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, last refill)
+        self._lock = threading.Lock()
+
+    def allow(self, key, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)  # least recently seen
+            return allowed
+
+    def retry_after(self, key, cost=1):
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.capacity, time.monotonic()))
+        missing = cost - min(self.capacity, tokens + (time.monotonic() - last) * self.rate)
+        return int(missing / self.rate) + 1 if missing > 0 else 0
+
+
+class LoginThrottle:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.by_ip = None
+        self.by_account = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("LOGIN_THROTTLE_ENABLED", True)
+        self.by_ip = TokenBucket(app.config.get("LOGIN_IP_BURST", 60), app.config.get("LOGIN_IP_PER_MINUTE", 60) / 60.0)
+        self.by_account = TokenBucket(app.config.get("LOGIN_ACCOUNT_BURST", 5),
+                                      app.config.get("LOGIN_ACCOUNT_PER_MINUTE", 5) / 60.0)
+        app.extensions["login_throttle"] = self
+
+    def check(self, ip, account=None):
+        """Returns 0 if the attempt may proceed, otherwise seconds until it may be retried."""
+        if not self.enabled:
+            return 0
+        if not self.by_ip.allow(ip):
+            return self.by_ip.retry_after(ip)
+        if account is not None and not self.by_account.allow(account.strip().lower()):
+            return self.by_account.retry_after(account.strip().lower())
+        return 0
+
+
+passwords = PasswordHasher()
+login_throttle = LoginThrottle()
@@ -0,0 +1,132 @@
+"""Pre-aggregated attempt statistics.
+
+Every Score write also upserts the per-subject, per-quiz, per-user-subject and
+per-user-month rollups in the same transaction, so the summary pages read a
+handful of rollup rows instead of scanning all attempts. Deleting scores
+applies the removed rows as a delta (removal_statements()), and `flask stats
+rebuild` recomputes everything from the Score table.
+"""
+import click
+from flask.cli import AppGroup
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, Quiz, Score, SubjectStat, QuizStat, UserSubjectStat, UserMonthStat
+
+ROLLUPS = (SubjectStat, QuizStat, UserSubjectStat, UserMonthStat)
+STALE_MAX = -1  # marks a max_score to recompute in removal_statements()
+
+
+def month_key(timestamp):
+    return timestamp.strftime("%Y-%m")
+
+
+def _upsert(model, keys, value):
+    stmt = insert(model).values(**keys, attempts=1, total_score=value, max_score=value)
+    return stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={
+            "attempts": model.attempts + 1,
+            "total_score": model.total_score + value,
+            "max_score": db.func.max(model.max_score, value),
+        },
+    )
+
+
+def attempt_statements(user_id, quiz_id, subject_id, total_scored, timestamp):
+    """The rollup upserts for one new attempt, for any session to execute."""
+    return [
+        _upsert(SubjectStat, {"subject_id": subject_id}, total_scored),
+        _upsert(QuizStat, {"quiz_id": quiz_id}, total_scored),
+        _upsert(UserSubjectStat, {"user_id": user_id, "subject_id": subject_id}, total_scored),
+        _upsert(UserMonthStat, {"user_id": user_id, "month": month_key(timestamp)}, total_scored),
+    ]
+
+
+def record_attempt(score, subject_id):
+    """Adds `score` to the rollups; the caller commits."""
+    for stmt in attempt_statements(score.user_id, score.quiz_id, subject_id, score.total_scored, score.timestamp):
+        db.session.execute(stmt)
+
+
+def _aggregates():
+    return [
+        db.func.count(Score.id),
+        db.func.sum(Score.total_scored),
+        db.func.max(Score.total_scored),
+    ]
+
+
+def _sources():
+    """(rollup model, key names, Score/Quiz expressions for those keys) for every rollup."""
+    month = db.func.strftime("%Y-%m", Score.timestamp)
+    return [
+        (SubjectStat, ["subject_id"], [Quiz.subject_id]),
+        (QuizStat, ["quiz_id"], [Score.quiz_id]),
+        (UserSubjectStat, ["user_id", "subject_id"], [Score.user_id, Quiz.subject_id]),
+        (UserMonthStat, ["user_id", "month"], [Score.user_id, month]),
+    ]
+
+
+def _scores(*where):
+    return db.select().select_from(Score).join(Quiz, Quiz.id == Score.quiz_id).where(Score.timestamp.isnot(None), *where)
+
+
+def rebuild():
+    """Recomputes every rollup from Score; the caller commits."""
+    for model in ROLLUPS:
+        db.session.execute(db.delete(model))
+
+    columns = ["attempts", "total_score", "max_score"]
+    for model, keys, key_columns in _sources():
+        select = _scores().add_columns(*key_columns, *_aggregates()).group_by(*key_columns)
+        db.session.execute(db.insert(model).from_select(keys + columns, select))
+
+
+def removal_statements(score_ids):
+    """Statements that take the Score rows `score_ids` out of the rollups.
+
+    Run them before deleting those rows, in the same transaction. Attempts and
+    totals are decremented by the removed rows' aggregates. A maximum can only
+    fall if a removed score reached it, so only those rows recompute it from
+    the scores that remain, and rollups left without attempts are deleted.
+    """
+    statements = []
+    for model, keys, key_columns in _sources():
+        removed = (
+            _scores(Score.id.in_(score_ids))
+            .add_columns(*(column.label(key) for key, column in zip(keys, key_columns)),
+                         *(aggregate.label(name) for aggregate, name in zip(_aggregates(), ("n", "total", "best"))))
+            .group_by(*key_columns)
+            .subquery()
+        )
+        matches = [getattr(model, key) == removed.c[key] for key in keys]
+        remaining_best = (
+            _scores(Score.id.not_in(score_ids), *(column == getattr(model, key) for key, column in zip(keys, key_columns)))
+            .add_columns(db.func.max(Score.total_scored))
+            .scalar_subquery()
+        )
+        statements += [
+            db.update(model).where(*matches).values(
+                attempts=model.attempts - removed.c.n,
+                total_score=model.total_score - removed.c.total,
+                max_score=db.case((removed.c.best >= model.max_score, STALE_MAX), else_=model.max_score),
+            ),
+            db.update(model).where(*matches, model.max_score == STALE_MAX)
+            .values(max_score=db.func.coalesce(remaining_best, 0)),
+            db.delete(model).where(
+                model.attempts <= 0,
+                db.tuple_(*(getattr(model, key) for key in keys)).in_(db.select(*(removed.c[key] for key in keys))),
+            ),
+        ]
+    return statements
+
+
+stats_cli = AppGroup("stats", help="Maintain the attempt statistics rollups.")
+
+
+@stats_cli.command("rebuild")
+def rebuild_command():
+    """Recompute all rollups from the Score table."""
+    rebuild()
+    db.session.commit()
+    click.echo("Statistics rebuilt.")
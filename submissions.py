@@ -0,0 +1,198 @@
+"""Score persistence with an optional write-behind queue.
+
+By default every submission is written synchronously in the request. With
+SUBMISSION_QUEUE_ENABLED the request only enqueues the graded result and a
+background thread writes queued Score rows (and their rollups) in batched
+transactions, flushing when a batch fills or the flush interval passes. A
+full queue falls back to a synchronous write, and whatever is still queued at
+interpreter exit is flushed before the process goes away.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from models import db, Score
+import stats
+import leaderboard
+
+# question_ids (packed int64) and answers (one byte each) line up, as on a QuizAttempt
+Submission = namedtuple("Submission", "user_id quiz_id subject_id total_scored timestamp question_ids answers")
+WAKE = object()  # queued by shutdown() so the writer stops waiting for a full batch
+
+
+def save_submissions(batch):
+    """Writes Score rows plus their rollups and leaderboard entries in one transaction."""
+    scores = [
+        Score(user_id=s.user_id, quiz_id=s.quiz_id, total_scored=s.total_scored, timestamp=s.timestamp,
+              question_ids=s.question_ids, answers=s.answers)
+        for s in batch
+    ]
+    db.session.add_all(scores)
+    for score, submission in zip(scores, batch):
+        stats.record_attempt(score, submission.subject_id)
+        leaderboard.record_attempt(submission.user_id, submission.quiz_id, submission.subject_id,
+                                   submission.total_scored)
+    db.session.commit()
+    leaderboard.leaderboards.record(batch)
+    return scores
+
+
+class SubmissionQueue:
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._lock = threading.Lock()  # the writer thread and the counters
+        self._reset_counters()
+        if app is not None:
+            self.init_app(app)
+
+    def _reset_counters(self):
+        self._counters = {
+            "enqueued": 0, "written": 0, "sync_writes": 0, "fallbacks": 0,
+            "batches": 0, "errors": 0,
+        }
+        self._flush_ms = {"last": 0.0, "max": 0.0, "total": 0.0}
+
+    def init_app(self, app):
+        self.app = app
+        self._reset_counters()
+        self.enabled = app.config.get("SUBMISSION_QUEUE_ENABLED", False)
+        self.batch_size = app.config.get("SUBMISSION_BATCH_SIZE", 50)
+        self.flush_interval = app.config.get("SUBMISSION_FLUSH_INTERVAL", 0.5)
+        self._queue = queue.Queue(maxsize=app.config.get("SUBMISSION_QUEUE_MAXSIZE", 10000))
+        app.extensions["submission_queue"] = self
+        if self.enabled:
+            atexit.register(self.shutdown)
+
+    def submit(self, submission):
+        """Persists `submission`, now or via the background writer; True if it was queued."""
+        if not self.enabled:
+            self._count(sync_writes=1)
+            save_submissions([submission])
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(submission)
+            self._count(enqueued=1)
+            return True
+        except queue.Full:
+            self._count(fallbacks=1)
+            save_submissions([submission])
+            return False
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self._counters[name] += value
+
+    def _ensure_worker(self):
+        # Threads don't survive fork, so each worker process starts its own
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="submission-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+
+    def _take_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                submission = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if submission is WAKE:
+                break
+            batch.append(submission)
+        return batch
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        failed = 0
+        with self._flush_lock, self.app.app_context():
+            try:
+                save_submissions(batch)
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception("Batched score write failed; retrying rows one by one")
+                for submission in batch:
+                    try:
+                        save_submissions([submission])
+                    except Exception:
+                        db.session.rollback()
+                        failed += 1
+                        self.app.logger.exception("Dropped score submission %r", submission)
+            finally:
+                db.session.remove()
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._counters["written"] += len(batch) - failed
+            self._counters["errors"] += failed
+            self._counters["batches"] += 1
+            self._flush_ms["last"] = elapsed
+            self._flush_ms["max"] = max(self._flush_ms["max"], elapsed)
+            self._flush_ms["total"] += elapsed
+
+    def flush(self):
+        """Writes everything currently queued, from the calling thread."""
+        batch = []
+        while True:
+            try:
+                submission = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if submission is WAKE:
+                continue
+            batch.append(submission)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            try:
+                self._queue.put_nowait(WAKE)
+            except queue.Full:
+                pass  # the writer isn't waiting for a batch to fill
+            self._thread.join(timeout=self.flush_interval * 2 + 5)
+        if self._queue is not None:
+            self.flush()
+
+    def metrics(self):
+        with self._lock:
+            counters, flush_ms = dict(self._counters), dict(self._flush_ms)
+        batches = counters["batches"]
+        return {
+            "enabled": self.enabled,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_capacity": self._queue.maxsize if self._queue is not None else 0,
+            **counters,
+            "last_flush_ms": round(flush_ms["last"], 2),
+            "max_flush_ms": round(flush_ms["max"], 2),
+            "avg_flush_ms": round(flush_ms["total"] / batches, 2) if batches else 0.0,
+        }
+
+
+submission_queue = SubmissionQueue()
@@ -0,0 +1,89 @@
+import contextlib
+from datetime import date
+
+import pytest
+
+from app import create_app, create_admin
+from extension import cache
+from models import db, User, Subject, Chapter, Quiz, Question
+from security import passwords
+
+USER_EMAIL, USER_PASSWORD = "student@example.com", "secret1"
+ADMIN_EMAIL, ADMIN_PASSWORD = "admin@gmail.com", "admin123"
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + str(tmp_path / "test.db"),
+        "CATALOG_VERSION_FILE": str(tmp_path / "catalog_version"),
+        "WTF_CSRF_ENABLED": False,
+        "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+        "PASSWORD_HASH_LOCK_DIR": str(tmp_path / "locks"),
+        "LOGIN_THROTTLE_ENABLED": False,
+        "INSTRUMENTATION_ENABLED": False,
+        "JOBS_RUN_INLINE": True,
+    })
+    with app.app_context():
+        db.create_all()
+        create_admin()
+        db.session.add(User(email=USER_EMAIL, password=passwords.hash(USER_PASSWORD), full_name="Student", role="user"))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, email=USER_EMAIL, password=USER_PASSWORD):
+    response = client.post("/login", data={"email": email, "password": password})
+    assert response.status_code == 302, response.data
+    return response
+
+
+def seed_quizzes(count, questions=4, subject_name="Math"):
+    """`count` quizzes in one subject and chapter, each with `questions` questions; returns their ids."""
+    subject = Subject(name=subject_name, description="")
+    db.session.add(subject)
+    db.session.flush()
+    chapter = Chapter(subject_id=subject.id, name="Algebra", description="")
+    db.session.add(chapter)
+    db.session.flush()
+    quiz_ids = []
+    for n in range(count):
+        quiz = Quiz(subject_id=subject.id, chapter_id=chapter.id, date_of_quiz=date(2024, 1, 1 + n % 28),
+                    time_duration="10")
+        db.session.add(quiz)
+        db.session.flush()
+        for i in range(questions):
+            db.session.add(Question(quiz_id=quiz.id, question_statement=f"Question {i} of quiz {quiz.id}",
+                                    option1="a", option2="b", option3="c", option4="d", correct_option=1 + i % 4))
+        quiz_ids.append(quiz.id)
+    db.session.commit()
+    return quiz_ids
+
+
+@contextlib.contextmanager
+def count_queries(engine):
+    """Collects the SQL statements `engine` executes inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db.event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        db.event.remove(engine, "before_cursor_execute", record)
+
+
+def user_id(email=USER_EMAIL):
+    return db.session.scalar(db.select(User.id).where(User.email == email))
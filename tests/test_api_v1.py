@@ -0,0 +1,132 @@
+"""The /api/v1 JSON API."""
+from conftest import login, seed_quizzes
+
+
+def test_catalog_is_conditional(app, client):
+    with app.app_context():
+        seed_quizzes(2)
+    response = client.get("/api/v1/catalog")
+    assert response.status_code == 200
+    chapter = response.get_json()["subjects"][0]["chapters"][0]
+    assert [quiz["question_count"] for quiz in chapter["quizzes"]] == [4, 4]
+    assert client.get("/api/v1/catalog", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+
+def test_take_quiz_and_list_scores(app, client):
+    with app.app_context():
+        quiz_id = seed_quizzes(1)[0]
+    login(client)
+
+    quiz = client.get(f"/api/v1/quizzes/{quiz_id}").get_json()
+    question_ids = [question["id"] for question in quiz["questions"]]
+    assert len(question_ids) == 4 and quiz["attempt"]["answers"] == {}
+    assert client.get(f"/api/v1/quizzes/{quiz_id}").get_json()["attempt"]["id"] == quiz["attempt"]["id"]
+
+    response = client.post(f"/api/v1/quizzes/{quiz_id}/submissions",
+                           json={"answers": {str(question_ids[0]): 1, str(question_ids[1]): 1}})
+    assert response.status_code == 201
+    result = response.get_json()
+    assert result["total_scored"] == 1 and [r["correct"] for r in result["results"]] == [True, False, False, False]
+    assert client.post(f"/api/v1/quizzes/{quiz_id}/submissions", json={"answers": {}}).status_code == 409
+    assert client.post(f"/api/v1/quizzes/{quiz_id}/submissions", data="x").status_code == 400
+    assert client.get("/api/v1/quizzes/999").status_code == 404
+
+    client.get(f"/api/v1/quizzes/{quiz_id}")
+    client.post(f"/api/v1/quizzes/{quiz_id}/submissions", json={"answers": {str(question_ids[0]): 1}})
+    first = client.get("/api/v1/scores?per_page=1").get_json()
+    assert [item["total_scored"] for item in first["items"]] == [1]
+    second = client.get(f"/api/v1/scores?per_page=1&cursor={first['next_cursor']}").get_json()
+    assert len(second["items"]) == 1 and second["items"][0]["id"] != first["items"][0]["id"]
+
+
+def test_api_views_share_one_loop_and_a_pooled_engine(app, client):
+    from sqlalchemy import event
+    from api_v1 import async_db
+
+    with app.app_context():
+        quiz_id = seed_quizzes(1)[0]
+    login(client)
+    assert client.get("/api/v1/scores").status_code == 200
+    loop = async_db.loop()
+    engine = async_db._engines[loop][0]
+    connects = []
+    event.listen(engine.sync_engine, "connect", lambda *args: connects.append(1))
+
+    client.get(f"/api/v1/quizzes/{quiz_id}")
+    client.post(f"/api/v1/quizzes/{quiz_id}/submissions", json={"answers": {}})
+    for _ in range(5):
+        assert client.get("/api/v1/scores").status_code == 200
+    assert async_db.loop() is loop and list(async_db._engines) == [loop]
+    assert connects == []  # every request reused the pooled connection
+
+
+ASGI_SCRIPT = """
+import asyncio, json
+import asgi
+from api_v1 import async_db
+from models import db, User, Subject, Chapter, Quiz
+from security import passwords
+from datetime import date
+
+flask_app = asgi.app.wsgi_application
+flask_app.config["WTF_CSRF_ENABLED"] = False
+with flask_app.app_context():
+    db.create_all()
+    db.session.add(User(email="s@example.com", password=passwords.hash("secret1"), full_name="S", role="user"))
+    db.session.add(Subject(id=1, name="Math", description=""))
+    db.session.add(Chapter(id=1, subject_id=1, name="Algebra", description=""))
+    db.session.add(Quiz(id=1, subject_id=1, chapter_id=1, date_of_quiz=date(2024, 1, 1), time_duration="10"))
+    db.session.commit()
+client = flask_app.test_client()
+client.post("/login", data={"email": "s@example.com", "password": "secret1"})
+cookie = b"session=" + client.get_cookie("session").value.encode()
+
+
+async def get(path):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "path": path,
+             "root_path": "", "query_string": b"", "headers": [(b"cookie", cookie)], "server": ("test", 80)}
+    await asgi.app(scope, receive, send)
+    return messages[0]["status"], json.loads(b"".join(m.get("body", b"") for m in messages[1:]))
+
+
+async def main():
+    events, sent = asyncio.Queue(), []
+
+    async def send(message):
+        sent.append(message["type"])
+
+    await events.put({"type": "lifespan.startup"})
+    lifespan = asyncio.create_task(asgi.app({"type": "lifespan"}, events.get, send))
+    while not sent:
+        await asyncio.sleep(0.01)
+    responses = await asyncio.gather(*[get(path) for path in ["/api/v1/catalog", "/api/v1/scores"] * 4])
+    on_server_loop = async_db.loop() is asyncio.get_running_loop()
+    engines = len(async_db._engines)
+    await events.put({"type": "lifespan.shutdown"})
+    await lifespan
+    return {"statuses": [status for status, _ in responses],
+            "quizzes": len(responses[0][1]["subjects"][0]["chapters"][0]["quizzes"]),
+            "on_server_loop": on_server_loop, "engines": engines, "after_shutdown": len(async_db._engines), "lifespan": sent}
+
+print(json.dumps(asyncio.run(main())))
+"""
+
+
+def test_asgi_entry_point_runs_api_views_on_the_server_loop(tmp_path):
+    import json
+    from benchmarks import startup
+
+    env = startup.environment(str(tmp_path / "asgi.db"))
+    env["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:1000"
+    result = json.loads(startup.run_python(["-c", ASGI_SCRIPT], env).stdout.splitlines()[-1])
+    assert result["statuses"] == [200] * 8 and result["quizzes"] == 1
+    assert result["on_server_loop"] and result["engines"] == 1 and result["after_shutdown"] == 0
+    assert result["lifespan"] == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
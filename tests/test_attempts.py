@@ -0,0 +1,171 @@
+"""Server-side attempts: deadlines, autosave, resuming, submitting once and drawn question subsets."""
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+import attempts
+from conftest import login, seed_quizzes, user_id
+from grading import get_answer_key
+from models import db, Quiz, Question, Score, QuizAttempt
+from quiz_cache import get_quiz_payload
+
+T0 = datetime(2024, 1, 1, 9, 0)
+
+
+@pytest.fixture
+def quiz(app):
+    """(quiz payload, answer key, student id) for a 10-minute quiz keyed 1, 2, 3, 4, in a request context."""
+    with app.app_context():
+        quiz_id = seed_quizzes(1)[0]
+    with app.test_request_context():
+        yield get_quiz_payload(quiz_id), get_answer_key(quiz_id), user_id()
+
+
+def scores():
+    return db.session.scalars(db.select(Score.total_scored).order_by(Score.id)).all()
+
+
+def test_deadline_comes_from_the_quiz_plus_grace(quiz):
+    payload, key, student = quiz
+    attempt = attempts.start(student, payload, key, now=T0)
+    assert attempt.deadline == T0 + timedelta(minutes=10)
+    grace = timedelta(seconds=30)
+    assert not attempts.is_expired(attempt, T0 + timedelta(minutes=10) + grace)
+    assert attempts.is_expired(attempt, T0 + timedelta(minutes=10) + grace + timedelta(seconds=1))
+    assert attempts.remaining_seconds(attempt, T0 + timedelta(minutes=4)) == 360
+
+
+def test_submit_in_time_merges_posted_answers_over_the_autosave(quiz):
+    payload, key, student = quiz
+    attempt = attempts.start(student, payload, key, now=T0)
+    attempts.autosave(attempt, key, bytes([1, 0, 0, 0]), now=T0 + timedelta(minutes=1))
+    result, late = attempts.submit(attempt, key, bytes([0, 2, 0, 1]), now=T0 + timedelta(minutes=9))
+    assert not late and result.total == 2
+    assert result.answers == bytes([1, 2, 0, 1])
+    assert scores() == [2]
+
+
+def test_late_submit_grades_the_last_autosave(quiz):
+    payload, key, student = quiz
+    attempt = attempts.start(student, payload, key, now=T0)
+    attempts.autosave(attempt, key, bytes([1, 0, 0, 0]), now=T0 + timedelta(minutes=5))
+    result, late = attempts.submit(attempt, key, bytes([1, 2, 3, 4]), now=T0 + timedelta(minutes=11))
+    assert late and result.total == 1 and result.answers == bytes([1, 0, 0, 0])
+    assert scores() == [1]
+
+
+def test_start_resumes_an_open_attempt_and_replaces_an_expired_one(quiz):
+    payload, key, student = quiz
+    first = attempts.start(student, payload, key, now=T0)
+    attempts.autosave(first, key, bytes([1, 2, 0, 0]), now=T0 + timedelta(minutes=2))
+    resumed = attempts.start(student, payload, key, now=T0 + timedelta(minutes=5))
+    assert resumed.id == first.id
+    assert attempts.saved_answers(resumed, key) == bytes([1, 2, 0, 0])
+    assert scores() == []
+
+    # Time ran out with the page closed: the autosave is submitted and a new attempt begins
+    fresh = attempts.start(student, payload, key, now=T0 + timedelta(minutes=20))
+    assert fresh.id != first.id and fresh.deadline == T0 + timedelta(minutes=30)
+    assert attempts.saved_answers(fresh, key) == bytes(4)
+    assert db.session.get(QuizAttempt, first.id).submitted_at == T0 + timedelta(minutes=20)
+    assert scores() == [2]
+
+
+def test_a_closed_attempt_is_not_graded_again(quiz):
+    payload, key, student = quiz
+    attempt = attempts.start(student, payload, key, now=T0)
+    assert attempts.submit(attempt, key, bytes([1, 2, 3, 4]), now=T0 + timedelta(minutes=1))[0].total == 4
+    assert attempts.submit(attempt, key, bytes([1, 2, 3, 4]), now=T0 + timedelta(minutes=2)) == (None, False)
+    assert scores() == [4]
+
+
+def test_double_submit_on_the_quiz_page_records_one_score(app, client):
+    with app.app_context():
+        quiz_id = seed_quizzes(1)[0]
+    login(client)
+    assert client.get(f"/quiz/{quiz_id}/start").status_code == 200
+    answers = {"question_1": "1", "question_2": "2"}
+    assert client.post(f"/submit_quiz/{quiz_id}", data=answers).status_code == 302
+    response = client.post(f"/submit_quiz/{quiz_id}", data=answers, follow_redirects=True)
+    assert b"already been submitted" in response.data
+    with app.app_context():
+        assert scores() == [2]
+
+
+@pytest.fixture
+def drawn(app):
+    """Like `quiz`, for a 12-question pool dealing 5 per attempt; question n's key is 1 + (n - 1) % 4."""
+    with app.app_context():
+        quiz_id = seed_quizzes(1, questions=12)[0]
+        db.session.get(Quiz, quiz_id).sample_size = 5
+        for question in db.session.scalars(db.select(Question)):
+            for n in range(1, 5):
+                setattr(question, f"option{n}", f"q{question.id} option {n}")
+        db.session.commit()
+    with app.test_request_context():
+        yield get_quiz_payload(quiz_id), get_answer_key(quiz_id), user_id()
+
+
+def correct(question_ids):
+    return bytes(1 + (question_id - 1) % 4 for question_id in question_ids)
+
+
+def test_draw_is_fixed_by_the_attempt_seed(drawn):
+    payload, key, student = drawn
+    attempt = attempts.start(student, payload, key, now=T0)
+    assert attempt.seed == attempts.draw_seed(student, payload["id"], T0)
+    dealt = attempts.dealt_ids(attempt)
+    assert dealt == attempts.draw(key, 5, attempt.seed)
+    assert len(set(dealt)) == 5 and set(dealt) <= set(key.question_ids)
+    orders = {question_id: attempts.option_order(attempt, question_id) for question_id in dealt}
+
+    # Resuming, even from a freshly loaded row, deals the same questions in the same order with the same options
+    db.session.expire_all()
+    resumed = attempts.start(student, payload, key, now=T0 + timedelta(minutes=3))
+    assert resumed.id == attempt.id and attempts.dealt_ids(resumed) == dealt
+    assert {question_id: attempts.option_order(resumed, question_id) for question_id in dealt} == orders
+    # Another start time draws afresh
+    seeds = {attempts.draw_seed(student, payload["id"], T0 + timedelta(minutes=m)) for m in range(5)}
+    assert len({tuple(attempts.draw(key, 5, seed)) for seed in seeds}) > 1
+
+
+def test_only_the_drawn_questions_are_graded(drawn):
+    payload, key, student = drawn
+    attempt = attempts.start(student, payload, key, now=T0)
+    dealt = attempts.attempt_key(attempt, key)
+    assert list(dealt.question_ids) == list(attempts.dealt_ids(attempt)) and len(attempt.answers) == 5
+    answers = bytearray(correct(dealt.question_ids))
+    answers[0] = answers[0] % 4 + 1  # one wrong
+    result, late = attempts.submit(attempt, dealt, bytes(answers), now=T0 + timedelta(minutes=1))
+    assert not late and result.total == 4 and len(result.matches) == 5
+    score = db.session.scalars(db.select(Score)).one()
+    assert (score.total_scored, score.question_ids, score.answers) == (4, attempt.question_ids, bytes(answers))
+
+
+def test_shuffled_options_map_back_to_the_right_answers(app, client, drawn):
+    payload, key, student = drawn
+    login(client)
+    page = client.get(f"/quiz/{payload['id']}/start").get_data(as_text=True)
+    shown = {}  # question id -> [(submitted value, label)] in display order
+    for question_id, value, label in re.findall(
+            r'name="question_(\d+)" value="(\d)"[^>]*>\s*<label class="form-check-label">([^<]+)</label>', page):
+        shown.setdefault(int(question_id), []).append((int(value), label))
+    with app.app_context():
+        attempt = db.session.scalars(db.select(QuizAttempt)).one()
+        dealt = list(attempts.dealt_ids(attempt))
+        orders = [attempts.option_order(attempt, question_id) for question_id in dealt]
+    assert list(shown) == dealt
+    assert any(order != (1, 2, 3, 4) for order in orders)
+    for (question_id, options), order in zip(shown.items(), orders):
+        # Each position shows the option its value names, in the attempt's shuffled order
+        assert options == [(n, f"q{question_id} option {n}") for n in order]
+
+    # Picking each right answer by its text, wherever it was shown, scores full marks
+    answers = {}
+    for question_id, options in shown.items():
+        right = f"q{question_id} option {correct([question_id])[0]}"
+        answers[f"question_{question_id}"] = str(next(value for value, label in options if label == right))
+    assert client.post(f"/submit_quiz/{payload['id']}", data=answers).status_code == 302
+    with app.app_context():
+        assert scores() == [5]
@@ -0,0 +1,50 @@
+"""Answer keys and grading."""
+from cache import LRUCache
+from conftest import ADMIN_EMAIL, ADMIN_PASSWORD, login, seed_quizzes
+from extension import cache
+from grading import NO_OPTION, get_answer_key, grade
+from models import db, Question
+from quiz_cache import get_quiz_payload
+
+
+def test_invalid_stored_key_does_not_break_the_quiz(app, client):
+    with app.app_context():
+        quiz_id = seed_quizzes(1)[0]
+        # Saved before edits were validated
+        db.session.execute(db.update(Question).where(Question.id == 1).values(correct_option="abc"))
+        db.session.execute(db.update(Question).where(Question.id == 2).values(correct_option=7))
+        db.session.commit()
+        key = get_answer_key(quiz_id)
+        assert list(key.correct) == [NO_OPTION, NO_OPTION, 3, 4]
+        assert grade(key, bytes([1, 2, 3, 4])).total == 2
+
+    login(client)
+    assert client.get(f"/quiz/{quiz_id}/start").status_code == 200
+    assert client.post(f"/submit_quiz/{quiz_id}", data={"question_3": "3"}).status_code == 302
+
+
+def test_key_fix_reaches_other_workers_caches(app, client):
+    """Each worker process has its own memory cache; an edit in one must not leave the others grading stale."""
+    with app.app_context():
+        quiz_id = seed_quizzes(1)[0]
+    editor, other = LRUCache(), LRUCache()
+    try:
+        cache.backend = other
+        with app.app_context():
+            assert list(get_answer_key(quiz_id).correct) == [1, 2, 3, 4]
+            assert get_quiz_payload(quiz_id)["questions"][0]["question_statement"] == "Question 0 of quiz 1"
+
+        cache.backend = editor
+        login(client, ADMIN_EMAIL, ADMIN_PASSWORD)
+        response = client.post("/admin/edit_question/1", data={
+            "question_statement": "Fixed", "option1": "a", "option2": "b", "option3": "c", "option4": "d",
+            "correct_option": "4",
+        })
+        assert response.status_code == 302
+
+        cache.backend = other
+        with app.app_context():
+            assert list(get_answer_key(quiz_id).correct) == [4, 2, 3, 4]
+            assert get_quiz_payload(quiz_id)["questions"][0]["question_statement"] == "Fixed"
+    finally:
+        cache.backend = LRUCache()
@@ -0,0 +1,57 @@
+"""Item analysis from stored answers."""
+from array import array
+
+import item_analysis
+from conftest import ADMIN_EMAIL, ADMIN_PASSWORD, login, seed_quizzes, user_id
+from grading import get_answer_key
+from models import db, Question, QuizStat, Score
+
+
+def add_attempts(quiz_id, answer_rows):
+    key = get_answer_key(quiz_id)
+    layout = key.question_ids.tobytes()
+    for answers in answer_rows:
+        answers = bytes(answers)
+        total = sum(a == c for a, c in zip(answers, key.correct))
+        db.session.add(Score(user_id=user_id(), quiz_id=quiz_id, total_scored=total,
+                             question_ids=layout, answers=answers))
+    db.session.merge(QuizStat(quiz_id=quiz_id, attempts=len(answer_rows)))
+    db.session.commit()
+
+
+def test_statistics(app):
+    with app.app_context():
+        quiz_id = seed_quizzes(1)[0]  # keys 1, 2, 3, 4
+        add_attempts(quiz_id, [[1, 2, 3, 4]] * 6 + [[1, 1, 0, 4]] * 4 + [[2, 1, 1, 4]] * 2)
+        report = item_analysis.quiz_items(quiz_id)
+
+    assert report.attempts == 12
+    first, second, third, fourth = report.items
+    assert first.p_value == round(10 / 12, 3)
+    assert second.choices == (0.0, 0.5, 0.5, 0.0, 0.0)
+    assert third.choices[0] == round(4 / 12, 3)
+    assert fourth.p_value == 1.0 and "too easy" in fourth.flags
+    # Top 3 attempts (all right) vs bottom 3 (both [2, 1, 1, 4] and one [1, 1, 0, 4]): 3/3 - 1/3
+    assert first.discrimination == round(1 - 1 / 3, 3)
+    assert array("q", [item.question_id for item in report.items]) == get_answer_key(quiz_id).question_ids
+
+
+def test_fixing_a_key_refreshes_the_cached_report(app, client):
+    with app.app_context():
+        quiz_id = seed_quizzes(1)[0]
+        add_attempts(quiz_id, [[2, 2, 3, 4]] * 10 + [[1, 2, 3, 4]] * 2)
+        question_id = item_analysis.quiz_items(quiz_id).items[0].question_id
+        assert "a distractor beats the key" in item_analysis.quiz_items(quiz_id).items[0].flags
+
+    login(client, ADMIN_EMAIL, ADMIN_PASSWORD)
+    response = client.post(f"/admin/edit_question/{question_id}", data={
+        "question_statement": "Fixed", "option1": "a", "option2": "b", "option3": "c", "option4": "d",
+        "correct_option": "2",
+    })
+    assert response.status_code == 302
+    with app.app_context():
+        assert db.session.get(Question, question_id).correct_option == 2
+        first = item_analysis.quiz_items(quiz_id).items[0]
+    assert first.correct_option == 2
+    assert first.p_value == round(10 / 12, 3)
+    assert "a distractor beats the key" not in first.flags
@@ -0,0 +1,109 @@
+"""Background deletes of subjects, quizzes and users."""
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import leaderboard
+import stats
+from conftest import ADMIN_EMAIL, ADMIN_PASSWORD, login, seed_quizzes, user_id
+from jobs import jobs
+from models import db, Job, Subject, Quiz, User, Score, QuizLeaderboard, SubjectLeaderboard
+
+
+@pytest.fixture
+def admin(client):
+    login(client, ADMIN_EMAIL, ADMIN_PASSWORD)
+    return client
+
+
+def test_delete_routes_flash_after_inline_job(app, admin):
+    with app.app_context():
+        quiz_ids = seed_quizzes(2)
+        student = user_id()
+
+    assert admin.post(f"/admin/quiz/{quiz_ids[0]}/delete").status_code == 302
+    assert admin.post("/admin/subject/1/delete").status_code == 302
+    assert admin.post(f"/admin/users/delete/{student}").status_code == 302
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count(Quiz.id))) == 0
+        assert db.session.get(Subject, 1) is None
+        assert db.session.get(User, student) is None
+
+
+def tables(*models):
+    return {
+        model.__name__: sorted(tuple(row) for row in db.session.execute(db.select(*model.__table__.columns)))
+        for model in models
+    }
+
+
+def test_deletes_update_rollups_and_leaderboards_incrementally(app):
+    derived = stats.ROLLUPS + (QuizLeaderboard, SubjectLeaderboard)
+    rng = random.Random(3)
+    app.config["JOBS_CHUNK_SIZE"] = 7  # several chunks per step
+    jobs.init_app(app)
+    with app.app_context():
+        quiz_ids = seed_quizzes(3) + seed_quizzes(2, subject_name="Physics")
+        db.session.add_all(User(email=f"u{n}@example.com", password="x", full_name="U") for n in range(4))
+        db.session.commit()
+        user_ids = db.session.scalars(db.select(User.id).where(User.role == "user")).all()
+        for n in range(120):
+            quiz_id = rng.choice(quiz_ids)
+            score = Score(user_id=rng.choice(user_ids), quiz_id=quiz_id, total_scored=rng.randint(0, 4),
+                          timestamp=datetime(2024, 1, 1) + timedelta(days=n % 60))
+            db.session.add(score)
+            db.session.flush()
+            subject_id = db.session.get(Quiz, quiz_id).subject_id
+            stats.record_attempt(score, subject_id)
+            leaderboard.record_attempt(score.user_id, quiz_id, subject_id, score.total_scored)
+        db.session.commit()
+
+        for kind, target in (("delete_quiz", quiz_ids[0]), ("delete_user", user_ids[0]), ("delete_subject", 2)):
+            job = jobs.enqueue(kind, target)
+            assert job.status == "done", job.message
+            incremental = tables(*derived)
+            stats.rebuild()
+            leaderboard.rebuild()
+            db.session.commit()
+            assert incremental == tables(*derived), kind
+
+
+def test_job_pages_are_admin_only(app, client):
+    with app.app_context():
+        job = Job(kind="delete_user", target_id=user_id(), label="student@example.com", created_at=datetime.now())
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+    login(client)
+    assert client.get("/admin/jobs").status_code == 403
+    assert client.get(f"/admin/jobs/{job_id}").status_code == 403
+
+
+def test_job_queued_as_the_runner_finds_none_left_still_runs(app, monkeypatch):
+    app.config["JOBS_RUN_INLINE"] = False
+    jobs.init_app(app)
+    with app.app_context():
+        quiz_id = seed_quizzes(1)[0]
+    claim, queued = jobs.claim, []
+
+    def claim_then_enqueue():
+        job = claim()
+        if job is None and not queued:
+            # A request commits a job and wakes the runner just before its thread would exit
+            db.session.add(Job(kind="delete_quiz", target_id=quiz_id, label="", created_at=datetime.now()))
+            db.session.commit()
+            queued.append(True)
+            jobs.ensure_worker()
+        return job
+
+    monkeypatch.setattr(jobs, "claim", claim_then_enqueue)
+    jobs.ensure_worker()
+    deadline = time.monotonic() + 10
+    while jobs._thread is not None:  # cleared as the runner exits
+        assert time.monotonic() < deadline, "the runner didn't finish"
+        time.sleep(0.01)
+    with app.app_context():
+        assert db.session.scalars(db.select(Job.status)).all() == ["done"]
+        assert db.session.get(Quiz, quiz_id) is None
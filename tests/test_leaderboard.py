@@ -0,0 +1,78 @@
+"""Cached leaderboards stay equal to a full rebuild as scores are added and removed."""
+import random
+from datetime import datetime
+
+import leaderboard
+import stats
+from conftest import seed_quizzes
+from leaderboard import Board, leaderboards
+from models import db, Score, User, QuizLeaderboard, SubjectLeaderboard
+from submissions import Submission, save_submissions
+
+
+def tables():
+    return {model.__name__: sorted(db.session.execute(db.select(model.__table__)).all())
+            for model in (QuizLeaderboard, SubjectLeaderboard)}
+
+
+def rebuilt_board(kind, board_id):
+    model, key, _, _ = leaderboard.KINDS[kind]
+    return Board(0, db.session.execute(db.select(model.user_id, model.score).where(key == board_id)).all())
+
+
+def assert_boards_match_rebuild(boards):
+    """Cached boards (as served) rank and place every score like boards loaded from rebuilt tables."""
+    served = {board_key: leaderboards.board(*board_key) for board_key in boards}
+    incremental = tables()
+    leaderboard.rebuild()
+    stats.rebuild()
+    assert tables() == incremental
+    for board_key, board in served.items():
+        expected = rebuilt_board(*board_key)
+        assert board.entries == expected.entries, board_key
+        for score in range(6):
+            assert board.rank(score) == expected.rank(score)
+            if len(expected):
+                assert board.percentile(score) == expected.percentile(score)
+
+
+def test_cached_boards_and_deletes_match_rebuild(app):
+    rng = random.Random(12)
+    with app.app_context():
+        maths = seed_quizzes(3)
+        physics = seed_quizzes(3, subject_name="Physics")
+        subject_of = {**{quiz_id: 1 for quiz_id in maths}, **{quiz_id: 2 for quiz_id in physics}}
+        db.session.add_all(User(email=f"u{n}@example.com", password="x", full_name="U") for n in range(8))
+        db.session.commit()
+        user_ids = db.session.scalars(db.select(User.id)).all()
+        boards = [("quiz", quiz_id) for quiz_id in subject_of] + [("subject", 1), ("subject", 2)]
+
+        for round_ in range(30):
+            # Serve a random few boards so later writes hit cached, uncached and partly cached
+            # (subject cached, quiz not) boards
+            for board_key in rng.sample(boards, 3):
+                leaderboards.board(*board_key)
+            if round_ % 7 == 0:
+                leaderboards.clear()
+            batch = []
+            for _ in range(rng.randint(1, 6)):
+                quiz_id = rng.choice(list(subject_of))
+                batch.append(Submission(rng.choice(user_ids), quiz_id, subject_of[quiz_id], rng.randint(0, 4),
+                                        datetime(2024, 1, 1 + rng.randint(0, 27)), None, None))
+            save_submissions(batch)
+            cached = {board_key: board for board_key, board in leaderboards._boards.items()}
+            for board_key, board in cached.items():
+                # In-place updates keep the tag current, so serving a cached board doesn't reload it
+                assert leaderboards.board(*board_key) is board
+                assert board.entries == rebuilt_board(*board_key).entries, board_key
+        assert_boards_match_rebuild(boards)
+
+        for where in (Score.quiz_id == maths[0], Score.user_id == user_ids[-1], Score.total_scored == 4):
+            ids = db.session.scalars(db.select(Score.id).where(where)).all()
+            # As the delete jobs do: both deltas, the delete, then drop the cached boards
+            for statement in stats.removal_statements(ids) + leaderboard.removal_statements(ids):
+                db.session.execute(statement)
+            db.session.execute(db.delete(Score).where(Score.id.in_(ids)))
+            db.session.commit()
+            leaderboards.clear()
+            assert_boards_match_rebuild(boards)
@@ -0,0 +1,93 @@
+"""Upgrading a database created before any migration existed."""
+import os
+import sqlite3
+
+from werkzeug.security import generate_password_hash
+
+import leaderboard
+import stats
+from app import create_app
+from conftest import USER_EMAIL, USER_PASSWORD, login, user_id
+from models import db, Score, SubjectStat, QuizStat, UserSubjectStat, UserMonthStat, QuizLeaderboard, SubjectLeaderboard
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+# The schema db.create_all() made before the first migration
+BASELINE = """
+CREATE TABLE user (id INTEGER PRIMARY KEY, email VARCHAR(150) NOT NULL UNIQUE, password VARCHAR(256) NOT NULL,
+    full_name VARCHAR(150) NOT NULL, qualification VARCHAR(150), dob DATE, role VARCHAR(10) NOT NULL);
+CREATE TABLE subject (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE, description TEXT, date_added DATETIME);
+CREATE TABLE chapter (id INTEGER PRIMARY KEY, subject_id INTEGER NOT NULL REFERENCES subject (id) ON DELETE CASCADE,
+    name VARCHAR(100) NOT NULL, description TEXT);
+CREATE TABLE quiz (id INTEGER PRIMARY KEY, subject_id INTEGER NOT NULL REFERENCES subject (id),
+    chapter_id INTEGER NOT NULL REFERENCES chapter (id), date_of_quiz DATE NOT NULL, time_duration VARCHAR(5) NOT NULL);
+CREATE TABLE question (id INTEGER PRIMARY KEY, quiz_id INTEGER NOT NULL REFERENCES quiz (id) ON DELETE CASCADE,
+    question_statement TEXT NOT NULL, option1 VARCHAR(100) NOT NULL, option2 VARCHAR(100) NOT NULL,
+    option3 VARCHAR(100) NOT NULL, option4 VARCHAR(100) NOT NULL, correct_option INTEGER NOT NULL);
+CREATE TABLE score (id INTEGER PRIMARY KEY, quiz_id INTEGER NOT NULL REFERENCES quiz (id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES user (id) ON DELETE CASCADE, timestamp DATETIME, total_scored INTEGER NOT NULL,
+    date_attempted DATE);
+"""
+
+
+def snapshot():
+    tables = (SubjectStat, QuizStat, UserSubjectStat, UserMonthStat, QuizLeaderboard, SubjectLeaderboard)
+    return {model.__name__: sorted(tuple(row) for row in db.session.execute(db.select(*model.__table__.c)))
+            for model in tables}
+
+
+def test_upgrade_fills_rollups_and_leaderboards_from_existing_scores(tmp_path):
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE)
+        conn.execute("INSERT INTO user VALUES (1, ?, ?, 'Student', NULL, NULL, 'user')",
+                     (USER_EMAIL, generate_password_hash(USER_PASSWORD, "pbkdf2:sha256:1000")))
+        conn.execute("INSERT INTO user VALUES (2, 'other@example.com', 'x', 'Other', NULL, NULL, 'user')")
+        conn.execute("INSERT INTO subject VALUES (1, 'Math', '', '2024-01-01 00:00:00')")
+        conn.execute("INSERT INTO chapter VALUES (1, 1, 'Algebra', '')")
+        for quiz_id in (1, 2):
+            conn.execute("INSERT INTO quiz VALUES (?, 1, 1, '2024-01-01', '10')", (quiz_id,))
+            for i in range(4):
+                conn.execute("INSERT INTO question (quiz_id, question_statement, option1, option2, option3, option4, "
+                             "correct_option) VALUES (?, ?, 'a', 'b', 'c', 'd', ?)", (quiz_id, f"Q{i}", 1 + i))
+        for quiz_id, user, total, timestamp in [(1, 1, 2, "2024-01-05 10:00:00.000000"),
+                                                (1, 1, 3, "2024-02-05 10:00:00.000000"),
+                                                (1, 2, 1, "2024-02-06 10:00:00.000000"),
+                                                (2, 2, 4, "2024-02-07 10:00:00.000000")]:
+            conn.execute("INSERT INTO score (quiz_id, user_id, timestamp, total_scored, date_attempted) "
+                         "VALUES (?, ?, ?, ?, '2024-01-01')", (quiz_id, user, timestamp, total))
+
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + str(path),
+        "CATALOG_VERSION_FILE": str(tmp_path / "catalog_version"),
+        "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+        "PASSWORD_HASH_LOCK_DIR": str(tmp_path / "locks"),
+        "LOGIN_THROTTLE_ENABLED": False,
+        "INSTRUMENTATION_ENABLED": False,
+        "WTF_CSRF_ENABLED": False,
+    })
+    try:
+        result = app.test_cli_runner().invoke(args=["db", "upgrade", "--directory", MIGRATIONS])
+        assert result.exit_code == 0, result.output
+        with app.app_context():
+            upgraded = snapshot()
+            assert upgraded["QuizLeaderboard"] == [(1, 1, 3), (1, 2, 1), (2, 2, 4)]
+            assert upgraded["SubjectLeaderboard"] == [(1, 1, 3), (1, 2, 5)]
+            stats.rebuild()
+            leaderboard.rebuild()
+            assert snapshot() == upgraded
+            db.session.rollback()
+
+        client = app.test_client()
+        login(client)
+        client.get("/quiz/2/start")
+        assert client.post("/submit_quiz/2", data={}).status_code == 302
+        with app.app_context():
+            student = user_id()
+            assert db.session.scalar(db.select(db.func.count(Score.id)).where(Score.user_id == student)) == 3
+            assert db.session.get(QuizStat, 2).attempts == 2
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
@@ -0,0 +1,38 @@
+"""The dashboard and scores pages run a fixed number of statements however many rows they show."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import count_queries, login, seed_quizzes, user_id
+from models import db, Score
+
+MAX_STATEMENTS = {"/dashboard": 2, "/scores": 1}  # after the session user is cached
+
+
+def seed_scores(quiz_ids):
+    student = user_id()
+    started = datetime(2024, 6, 1)
+    db.session.add_all(
+        Score(user_id=student, quiz_id=quiz_id, total_scored=n % 4, timestamp=started + timedelta(minutes=n))
+        for n, quiz_id in enumerate(quiz_ids)
+    )
+    db.session.commit()
+
+
+@pytest.mark.parametrize("path", sorted(MAX_STATEMENTS))
+def test_page_statement_count_is_bounded(app, client, path):
+    counts = []
+    for quizzes in (2, 40):  # 40 spans more than one page
+        with app.app_context():
+            quiz_ids = seed_quizzes(quizzes, subject_name=f"Subject {quizzes}")
+            seed_scores(quiz_ids)
+        login(client)
+        client.get(path)  # warms the session user and catalog caches
+        with app.app_context(), count_queries(db.engine) as statements:
+            response = client.get(path)
+        assert response.status_code == 200
+        counts.append(len(statements))
+        client.get("/logout")
+
+    assert counts[0] == counts[1], f"{path} runs more statements as rows grow: {counts}"
+    assert counts[1] <= MAX_STATEMENTS[path], f"{path} ran {counts[1]} statements"
@@ -0,0 +1,16 @@
+"""No hot route query falls back to a full table scan or a temporary sort."""
+import query_plans
+
+
+def test_route_queries_use_indexes(app):
+    with app.app_context():
+        plans = {name: query_plans.explain(query) for name, query in query_plans.route_queries()}
+    bad = {name: query_plans.problems(plan) for name, plan in plans.items() if query_plans.problems(plan)}
+    assert not bad, f"full scans or temp sorts: {bad}"
+
+
+def test_problems_flags_scans_and_sorts():
+    assert query_plans.problems(["SCAN score", "USE TEMP B-TREE FOR ORDER BY"]) == [
+        "SCAN score", "USE TEMP B-TREE FOR ORDER BY"]
+    assert query_plans.problems(["SEARCH score USING INDEX ix_score_user_id_timestamp (user_id=?)",
+                                 "SCAN quiz USING COVERING INDEX ix_quiz_date_of_quiz"]) == []
@@ -0,0 +1,54 @@
+"""Question editing, import and export."""
+import pytest
+
+from conftest import ADMIN_EMAIL, ADMIN_PASSWORD, login, seed_quizzes
+from models import db, Question
+
+VALID = {"question_statement": "Edited", "option1": "a", "option2": "b", "option3": "c", "option4": "d",
+         "correct_option": "3"}
+
+
+@pytest.fixture
+def quiz_id(app):
+    with app.app_context():
+        return seed_quizzes(1)[0]
+
+
+@pytest.mark.parametrize("correct_option", ["5", "0", "x", ""])
+def test_edit_rejects_invalid_key(app, client, quiz_id, correct_option):
+    login(client, ADMIN_EMAIL, ADMIN_PASSWORD)
+    response = client.post("/admin/edit_question/1", data={**VALID, "correct_option": correct_option},
+                           follow_redirects=True)
+    assert b"Correct option must be between 1 and 4." in response.data or b"All fields are required!" in response.data
+    with app.app_context():
+        question = db.session.get(Question, 1)
+        assert (question.question_statement, question.correct_option) == ("Question 0 of quiz 1", 1)
+    assert client.get(f"/quiz/{quiz_id}/start").status_code == 200
+
+
+def test_edit_saves_clean_values(app, client, quiz_id):
+    login(client, ADMIN_EMAIL, ADMIN_PASSWORD)
+    assert client.post("/admin/edit_question/1", data={**VALID, "option1": "  a  "}).status_code == 302
+    with app.app_context():
+        question = db.session.get(Question, 1)
+        assert (question.question_statement, question.option1, question.correct_option) == ("Edited", "a", 3)
+
+
+def test_import_and_export_are_admin_only(client, quiz_id):
+    login(client)
+    assert client.get(f"/admin/quiz/{quiz_id}/questions/export?format=csv").status_code == 403
+    assert client.post(f"/admin/quiz/{quiz_id}/questions/import").status_code == 403
+
+
+def test_search_is_admin_only(client, quiz_id):
+    login(client)
+    assert client.get("/admin/questions/search?q=Question").status_code == 403
+    login(client, ADMIN_EMAIL, ADMIN_PASSWORD)
+    assert client.get("/admin/questions/search?q=Question").status_code == 200
+
+
+def test_duplicate_report_is_admin_only(client, quiz_id):
+    login(client)
+    assert client.get("/admin/subject/1/duplicates?format=json").status_code == 403
+    login(client, ADMIN_EMAIL, ADMIN_PASSWORD)
+    assert client.get("/admin/subject/1/duplicates?format=json").status_code == 200
@@ -0,0 +1,16 @@
+"""Score and attempt exports."""
+from conftest import ADMIN_EMAIL, ADMIN_PASSWORD, login
+
+
+def test_export_is_admin_only(client):
+    login(client)
+    response = client.get("/admin/reports/export?dataset=scores&format=csv")
+    assert response.status_code == 403
+    assert b"@" not in response.data
+
+
+def test_admin_can_export(client):
+    login(client, ADMIN_EMAIL, ADMIN_PASSWORD)
+    response = client.get("/admin/reports/export?dataset=scores&format=csv")
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
@@ -0,0 +1,125 @@
+"""Password hashing slots shared across worker processes."""
+import multiprocessing
+import time
+
+import pytest
+
+from conftest import USER_EMAIL, USER_PASSWORD
+from security import HashSlots, PasswordHasherBusy, passwords
+
+fork = multiprocessing.get_context("fork")
+
+
+def hold_slot(directory, count, ready):
+    slots = HashSlots(directory, count)
+    assert slots.acquire(1.0) is not None
+    ready.set()
+    time.sleep(60)  # killed by the test
+
+
+def test_slots_are_shared_across_processes_and_freed_when_one_dies(tmp_path):
+    ready = fork.Event()
+    worker = fork.Process(target=hold_slot, args=(str(tmp_path), 1, ready))
+    worker.start()
+    try:
+        assert ready.wait(10)
+        slots = HashSlots(str(tmp_path), 1)
+        assert slots.acquire(0.05) is None
+    finally:
+        worker.kill()
+        worker.join()
+    slot = slots.acquire(1.0)
+    assert slot is not None
+    slots.release(slot)
+
+
+def test_slots_exclude_threads_of_one_process(tmp_path):
+    slots = HashSlots(str(tmp_path), 2)
+    first, second = slots.acquire(0), slots.acquire(0)
+    assert first is not None and second is not None
+    assert slots.acquire(0.05) is None
+    slots.release(first)
+    third = slots.acquire(0)
+    assert third is not None
+    slots.release(second)
+    slots.release(third)
+
+
+@pytest.fixture
+def one_slot(tmp_path):
+    from app import create_app
+
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+        "PASSWORD_HASH_LOCK_DIR": str(tmp_path / "locks"),
+        "PASSWORD_HASH_WORKERS": 1,
+        "PASSWORD_HASH_WAIT": 0.05,
+    })
+    return HashSlots(app.config["PASSWORD_HASH_LOCK_DIR"], 1)
+
+
+def test_hasher_is_busy_while_another_process_holds_every_slot(one_slot):
+    stored = passwords.hash("secret")
+    slot = one_slot.acquire(0)
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            passwords.hash("secret")
+        with pytest.raises(PasswordHasherBusy):
+            passwords.verify(stored, "secret")
+    finally:
+        one_slot.release(slot)
+    assert passwords.verify(stored, "secret")
+
+
+def hash_in_burst(barrier, results):
+    barrier.wait()
+    started = time.monotonic()
+    try:
+        passwords._run(time.sleep, 0.5)  # a slow hash
+        outcome = "hashed"
+    except PasswordHasherBusy:
+        outcome = "busy"
+    results.put((outcome, time.monotonic() - started))
+
+
+def test_burst_ties_up_at_most_workers_plus_backlog_processes(tmp_path):
+    from app import create_app
+
+    create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "PASSWORD_HASH_LOCK_DIR": str(tmp_path / "locks"),
+        "PASSWORD_HASH_WORKERS": 1,
+        "PASSWORD_HASH_BACKLOG": 1,
+        "PASSWORD_HASH_WAIT": 5.0,
+    })
+    # Eight sync workers sign users in at the same moment
+    barrier, results = fork.Barrier(8), fork.Queue()
+    workers = [fork.Process(target=hash_in_burst, args=(barrier, results)) for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get(timeout=15) for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    hashed = [elapsed for outcome, elapsed in outcomes if outcome == "hashed"]
+    busy = [elapsed for outcome, elapsed in outcomes if outcome == "busy"]
+    # One hashes, one waits for it and hashes next; the rest are turned away instead of blocking their worker
+    assert len(hashed) == 2 and len(busy) == 6
+    assert max(busy) < 0.3
+    assert 0.9 < max(hashed) < 2
+
+
+def test_login_reports_busy_when_no_slot_frees_up(app, client):
+    slots = HashSlots(app.config["PASSWORD_HASH_LOCK_DIR"], app.config["PASSWORD_HASH_WORKERS"])
+    passwords.wait = 0.05
+    held = [slots.acquire(0) for _ in range(slots.count)]
+    try:
+        response = client.post("/login", data={"email": USER_EMAIL, "password": USER_PASSWORD})
+        assert response.status_code == 503
+    finally:
+        for slot in held:
+            slots.release(slot)
+    assert client.post("/login", data={"email": USER_EMAIL, "password": USER_PASSWORD}).status_code == 302
@@ -0,0 +1,24 @@
+"""Startup stays fast and keeps CLI-only tooling off the serving import path."""
+import os
+import statistics
+
+from benchmarks import startup
+
+# Generous so slow CI machines pass; `python benchmarks/startup.py --baseline` tracks the real number
+STARTUP_BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", 2000))
+
+
+def test_import_wsgi_is_fast_and_lazy(tmp_path):
+    env = startup.environment(str(tmp_path / "startup.db"))
+    startup.time_startup(env)  # warm the bytecode cache
+    runs = [startup.time_startup(env) for _ in range(3)]
+    median_ms = statistics.median(seconds for seconds, _ in runs) * 1000
+    eager = sorted({name for _, lazy in runs for name in lazy})
+    assert not eager, f"imported at startup: {eager}"
+    assert median_ms < STARTUP_BUDGET_MS, f"import wsgi took {median_ms:.0f} ms"
+
+
+def test_db_commands_load_on_demand(app):
+    result = app.test_cli_runner().invoke(args=["db", "--help"])
+    assert result.exit_code == 0, result.output
+    assert "upgrade" in result.output
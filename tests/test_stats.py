@@ -0,0 +1,54 @@
+"""Rollups stay equal to a full rebuild as scores are added and removed."""
+import random
+from datetime import datetime, timedelta
+
+import stats
+from conftest import seed_quizzes
+from models import db, Score, User, SubjectStat, QuizStat, UserSubjectStat, UserMonthStat
+
+
+def snapshot():
+    return {
+        model.__name__: sorted(tuple(row) for row in db.session.execute(
+            db.select(*(column for column in model.__table__.columns))))
+        for model in stats.ROLLUPS
+    }
+
+
+def add_scores(rng, quiz_ids, user_ids, count):
+    for n in range(count):
+        score = Score(user_id=rng.choice(user_ids), quiz_id=rng.choice(quiz_ids), total_scored=rng.randint(0, 4),
+                      timestamp=datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 90)))
+        db.session.add(score)
+        db.session.flush()
+        stats.record_attempt(score, 1 if score.quiz_id in quiz_ids[:3] else 2)
+    db.session.commit()
+
+
+def test_removal_matches_rebuild(app):
+    rng = random.Random(7)
+    with app.app_context():
+        quiz_ids = seed_quizzes(3) + seed_quizzes(3, subject_name="Physics")
+        db.session.add_all(User(email=f"u{n}@example.com", password="x", full_name="U") for n in range(5))
+        db.session.commit()
+        user_ids = db.session.scalars(db.select(User.id)).all()
+        add_scores(rng, quiz_ids, user_ids, 300)
+
+        for where in (Score.quiz_id == quiz_ids[0], Score.user_id == user_ids[-1], Score.total_scored == 4):
+            ids = db.session.scalars(db.select(Score.id).where(where)).all()
+            for statement in stats.removal_statements(ids):
+                db.session.execute(statement)
+            db.session.execute(db.delete(Score).where(Score.id.in_(ids)))
+            db.session.commit()
+            incremental = snapshot()
+            stats.rebuild()
+            db.session.commit()
+            assert incremental == snapshot()
+
+        # Removing everything leaves no rollup rows behind
+        ids = db.session.scalars(db.select(Score.id)).all()
+        for statement in stats.removal_statements(ids):
+            db.session.execute(statement)
+        db.session.execute(db.delete(Score))
+        db.session.commit()
+        assert all(not rows for rows in snapshot().values())
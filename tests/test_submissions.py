@@ -0,0 +1,100 @@
+"""The write-behind submission queue."""
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from conftest import login, seed_quizzes, user_id
+from models import db, Quiz, Score, QuizStat
+from submissions import Submission, submission_queue
+
+
+@pytest.fixture
+def queued(app):
+    submission_queue.enabled = True
+    submission_queue.batch_size = 5
+    submission_queue.flush_interval = 60  # batches only close when full or on shutdown
+    with app.app_context():
+        quiz_id = seed_quizzes(1)[0]
+        student = user_id()
+    yield lambda total=1: submission_queue.submit(
+        Submission(student, quiz_id, 1, total, datetime(2024, 1, 1), None, None))
+    submission_queue.shutdown()
+    submission_queue.enabled = False
+
+
+def scores(app):
+    with app.app_context():
+        return db.session.scalar(db.select(db.func.count(Score.id))), db.session.get(QuizStat, 1)
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_writes_full_batches_in_the_background(app, queued):
+    for _ in range(10):
+        queued()
+    wait_for(lambda: submission_queue.metrics()["written"] == 10)
+    metrics = submission_queue.metrics()
+    assert metrics["enqueued"] == 10 and metrics["batches"] == 2 and metrics["errors"] == 0
+    count, stat = scores(app)
+    assert count == 10 and stat.attempts == 10
+
+
+def test_failed_batch_is_retried_row_by_row(app, queued):
+    for total in (1, 2, None, 3, 4):  # total_scored is NOT NULL
+        queued(total)
+    wait_for(lambda: submission_queue.metrics()["batches"] == 1)
+    metrics = submission_queue.metrics()
+    assert metrics["written"] == 4 and metrics["errors"] == 1
+    count, stat = scores(app)
+    assert count == 4 and stat.attempts == 4 and stat.total_score == 10
+
+
+def test_shutdown_flushes_a_partial_batch(app, queued):
+    for _ in range(3):
+        queued()
+    started = time.monotonic()
+    submission_queue.shutdown()
+    assert time.monotonic() - started < 5  # woke the writer instead of waiting out the interval
+    assert scores(app)[0] == 3
+    assert submission_queue.metrics()["written"] == 3
+
+
+def test_only_one_writer_starts_under_concurrent_submits(app, queued):
+    threads = [threading.Thread(target=queued) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writers = [thread for thread in threading.enumerate() if thread.name == "submission-writer"]
+    assert len(writers) == 1
+    wait_for(lambda: submission_queue.metrics()["written"] == 20)
+    assert submission_queue.metrics()["enqueued"] == 20
+
+
+def test_dashboard_is_not_revalidated_until_a_queued_score_is_written(app, client, queued):
+    with app.app_context():
+        quiz_id = db.session.scalar(db.select(Quiz.id))
+    login(client)
+    before = client.get("/dashboard").headers["ETag"]
+    client.get(f"/quiz/{quiz_id}/start")
+    assert client.post(f"/submit_quiz/{quiz_id}", data={"question_1": "1"}).status_code == 302
+
+    # The score is still queued, so these renders may miss it and must not be revalidated later
+    for _ in range(2):
+        response = client.get("/dashboard", headers={"If-None-Match": before})
+        assert response.status_code == 200 and "ETag" not in response.headers
+    assert scores(app)[0] == 0
+
+    submission_queue.shutdown()  # the writer writes the batch it holds
+    assert scores(app)[0] == 1
+    response = client.get("/dashboard")
+    after = response.headers["ETag"]
+    assert response.status_code == 200 and after != before
+    assert client.get("/dashboard", headers={"If-None-Match": after}).status_code == 304
@@ -0,0 +1,77 @@
+"""Cached identities for Flask-Login's user_loader.
+
+Every authenticated request rebuilds `current_user`. Instead of loading the
+User row each time, the loader keeps a small slotted snapshot (id, email,
+name, role) in a per-process LRU with a TTL, so steady-state requests add no
+SQL for authentication. Deleting a user invalidates the entry in the process
+that handled the delete; other workers drop it when USER_CACHE_TTL expires.
+"""
+from cache import LRUCache
+from models import db, User
+
+
+class SessionUser:
+    """The parts of a User that requests need, with Flask-Login's user interface."""
+
+    __slots__ = ("id", "email", "full_name", "role")
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, email, full_name, role):
+        self.id = id
+        self.email = email
+        self.full_name = full_name
+        self.role = role
+
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        return hasattr(other, "get_id") and self.get_id() == other.get_id()
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"<SessionUser {self.id} {self.email}>"
+
+
+class UserCache:
+    def __init__(self, app=None):
+        self._users = LRUCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._users = LRUCache(app.config.get("USER_CACHE_MAX_ENTRIES", 10000), app.config.get("USER_CACHE_TTL", 60))
+        app.extensions["user_cache"] = self
+
+    def load(self, user_id):
+        """The SessionUser for a session's user id, or None if there is no such user."""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        user = self._users.get(user_id)
+        if user is None:
+            row = (
+                db.session.query(User.id, User.email, User.full_name, User.role)
+                .filter(User.id == user_id)
+                .first()
+            )
+            if row is None:
+                return None
+            user = SessionUser(*row)
+            self._users.set(user_id, user)
+        return user
+
+    def invalidate(self, user_id):
+        self._users.delete(int(user_id))
+
+    def metrics(self):
+        return {"entries": len(self._users), "hits": self._users.hits, "misses": self._users.misses}
+
+
+user_cache = UserCache()